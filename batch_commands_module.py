@@ -0,0 +1,366 @@
+##
+#  Non-interactive commands for the chore chart, for use from scripts and
+#  cron jobs:
+#
+#  python chore_chart.py import [FILE]          add households to the store
+#  python chore_chart.py log [FILE]             log completed chores
+#  python chore_chart.py leaderboard HOUSEHOLD  print a household's leaderboard
+#  python chore_chart.py export                 print every household
+#  python chore_chart.py compact                rewrite the households file
+#  python chore_chart.py convert Households.txt add a households text file
+#                                               using --workers processes
+#
+#  Input is read from FILE or from stdin when FILE is "-" or missing, as
+#  newline-delimited JSON (the default) or CSV. Results are streamed to
+#  stdout in the same format, and a summary is printed to stderr.
+#
+#  The commands use the same storage as the interactive chart: Households.txt
+#  with the ChoreLog journal unless another backend is chosen with --storage
+#  (or other files with --store and --journal), so households imported and
+#  chores logged by a command are seen by the menu. Each backend has an
+#  index of the households by name, which for the text backend is kept in
+#  Households.txt.idx, so a command reads only the households it needs. The
+#  SQLite backend keeps completed chores in its database.
+#
+#  Record formats:
+#
+#  household   JSON {"household": "House1", "participants": ["fred", "walt"],
+#                    "chores": [["wash up", 4], ["dusting", 1]]}
+#              CSV  House1,fred;walt,wash up:4;dusting:1
+#  completion  JSON {"household": "House1", "name": "fred", "chore": "wash up", "number": 2}
+#              CSV  House1,fred,wash up,2
+
+import csv
+import json
+import sys
+
+from household_module import Household
+from chores_list_module import Chore
+from config_module import limits_for
+from storage_module import DEFAULT_STORAGE, STORAGE_KINDS, open_storage
+from household_file_module import FLUSH_EVERY, FLUSH_POLICIES, DEFAULT_FLUSH_EVERY, \
+    ERROR_MODES, SKIP, QUARANTINE, LoadReport, RecordError
+from parallel_load_module import import_text_file_parallel
+
+JSON_FORMAT = "json"
+CSV_FORMAT = "csv"
+
+# The number of completions read before they are applied. Each household's
+# completions within a batch are applied all together or not at all.
+LOG_BATCH_SIZE = 10000
+
+
+## Opens an input file, or returns stdin for "-".
+#
+def _open_input(file_name) :
+    if file_name is None or file_name == "-" :
+        return sys.stdin
+    return open(file_name, "r", newline = "")
+
+
+## Reads records one at a time.
+#
+# @param input_file a file object
+# @param input_format JSON_FORMAT or CSV_FORMAT
+# @return a generator of (line number, record) tuples, where a record is a
+#         dictionary for JSON and a list of fields for CSV. The record is None
+#         for a line which is not a JSON object.
+#
+def _read_records(input_file, input_format) :
+    if input_format == CSV_FORMAT :
+        for line_number, fields in enumerate(csv.reader(input_file), 1) :
+            if fields :
+                yield line_number, fields
+    else :
+        for line_number, line in enumerate(input_file, 1) :
+            if line.strip() :
+                try :
+                    record = json.loads(line)
+                except ValueError :
+                    record = None
+                yield line_number, record if isinstance(record, dict) else None
+
+
+class _Writer() :
+
+    ## Constructor for the _Writer class, which streams records to a file.
+    #
+    # @param output_file a file object
+    # @param output_format JSON_FORMAT or CSV_FORMAT
+    # @param csv_fields the names of the fields, in the order of the CSV columns
+    #
+    def __init__(self, output_file, output_format, csv_fields) :
+        self.output_file = output_file
+        self.output_format = output_format
+        self.csv_fields = csv_fields
+        if output_format == CSV_FORMAT :
+            self._csv_writer = csv.writer(output_file)
+
+    def write(self, record) :
+        if self.output_format == CSV_FORMAT :
+            self._csv_writer.writerow([record[field] for field in self.csv_fields])
+        else :
+            self.output_file.write(json.dumps(record))
+            self.output_file.write("\n")
+
+
+## Checks that a field of an input record is a string.
+# @exception TypeError raised if it is not
+#
+def _check_string(value, field) :
+    if not isinstance(value, str) :
+        raise TypeError("The {} must be a string.".format(field))
+    return value
+
+
+## Builds a Household from an input record.
+# @exception ValueError or TypeError raised if the record is not a valid household
+#
+def _household_from_input(record, input_format) :
+    if record is None :
+        raise ValueError("The record is not a JSON object.")
+    if input_format == CSV_FORMAT :
+        household_name, participants, chores = record
+        participants = participants.split(";")
+        chores = [chore.rsplit(":", 1) for chore in chores.split(";")]
+    else :
+        household_name = record["household"]
+        participants = record["participants"]
+        chores = record["chores"]
+        if not isinstance(participants, list) or not isinstance(chores, list) :
+            raise TypeError("The participants and chores must be lists.")
+    chores_list = set()
+    for chore in chores :
+        if not isinstance(chore, (list, tuple)) or len(chore) != 2 :
+            raise ValueError("Each chore must be a name and a frequency.")
+        chore_name, frequency = chore
+        Chore.is_valid_frequency(frequency)
+        chores_list.add(Chore(_check_string(chore_name, "chore name").strip(), int(frequency)))
+    household_name = _check_string(household_name, "household name").strip()
+    return Household(household_name,
+                     set(_check_string(name, "participant name").strip() for name in participants),
+                     chores_list, limits_for(household_name))
+
+
+## Adds households to the store.
+#
+# @return the number of households which could not be added
+#
+def import_households(storage, input_file, input_format, output_file) :
+    writer = _Writer(output_file, input_format, ["line", "household", "error"])
+    imported = 0
+    rejected = 0
+    for line_number, record in _read_records(input_file, input_format) :
+        try :
+            storage.add(_household_from_input(record, input_format))
+            imported += 1
+        except (KeyError, TypeError, ValueError) as err :
+            rejected += 1
+            if input_format == CSV_FORMAT :
+                household_name = record[0]
+            else :
+                household_name = None if record is None else record.get("household")
+                if not isinstance(household_name, str) :
+                    household_name = None
+            writer.write({"line" : line_number, "household" : household_name, "error" : str(err).strip()})
+    print("Imported {} households, rejected {}.".format(imported, rejected), file = sys.stderr)
+    return rejected
+
+
+## Reads completions and groups them by household, a batch at a time.
+#
+# @return a generator of dictionaries where the keys are household names and
+#         the values are lists of (name, chore, number) tuples. The rows
+#         whose household is missing or is not a string are kept under None.
+#
+def _completion_batches(input_file, input_format) :
+    batch = {}
+    batch_size = 0
+    for line_number, record in _read_records(input_file, input_format) :
+        # a row with the wrong number of fields is rejected when it is applied
+        if input_format == CSV_FORMAT :
+            household_name, row = record[0], tuple(record[1:])
+        elif record is None :
+            household_name, row = None, ()
+        else :
+            household_name = record.get("household")
+            if not isinstance(household_name, str) :
+                household_name = None
+            row = (record.get("name"), record.get("chore"), record.get("number"))
+        batch.setdefault(household_name, []).append(row)
+        batch_size += 1
+        if batch_size == LOG_BATCH_SIZE :
+            yield batch
+            batch = {}
+            batch_size = 0
+    if batch :
+        yield batch
+
+
+## Logs completed chores. Households are opened from storage with their
+#  chore logs the first time they are needed.
+#
+# @param households a dictionary of the households opened so far, which is
+#        added to
+# @return the number of completions which were rejected
+#
+def log_completions(storage, input_file, input_format, output_file, households = None) :
+    if households is None :
+        households = {}
+    writer = _Writer(output_file, input_format, ["household", "applied", "rejected"])
+    applied = 0
+    rejected = 0
+    for batch in _completion_batches(input_file, input_format) :
+        for household_name, rows in batch.items() :
+            household = households.get(household_name)
+            if household is None and household_name is not None :
+                household = storage.get(household_name)
+                if household is not None :
+                    storage.restore(household)
+                    households[household_name] = household
+            if household is None :
+                household_applied, household_rejected = 0, len(rows)
+            else :
+                household_applied, household_rejected = household.update_log_many(rows)
+                if household_applied > 0 :
+                    storage.record(household_name, rows)
+            applied += household_applied
+            rejected += household_rejected
+            writer.write({"household" : household_name, "applied" : household_applied,
+                          "rejected" : household_rejected})
+    print("Logged {} completions, rejected {}.".format(applied, rejected), file = sys.stderr)
+    return rejected
+
+
+## Writes a household's leaderboard.
+#
+# @return 0 if the household exists and 1 if it does not
+#
+def write_leaderboard(storage, household_name, output_format, output_file, k = None) :
+    leaderboard = storage.leaderboard(household_name, k)
+    if leaderboard is None :
+        print("Household {} does not exist.".format(household_name), file = sys.stderr)
+        return 1
+    writer = _Writer(output_file, output_format, ["rank", "name", "points"])
+    rank = 0
+    for name, points in leaderboard :
+        rank += 1
+        writer.write({"rank" : rank, "name" : name, "points" : points})
+    return 0
+
+
+## Writes every household in the store, one at a time.
+#
+def export_households(storage, output_format, output_file) :
+    exported = 0
+    for household in storage.households() :
+        household_name = household.household_name
+        chores = household.chores
+        participants = sorted(household.participants.participants)
+        if output_format == CSV_FORMAT :
+            csv.writer(output_file).writerow([household_name, ";".join(participants),
+                ";".join("{}:{}".format(name, chores.get(name).frequency) for name in chores.names)])
+        else :
+            output_file.write(json.dumps({"household" : household_name, "participants" : participants,
+                                          "chores" : [[name, chores.get(name).frequency] for name in chores.names]}))
+            output_file.write("\n")
+        exported += 1
+    print("Exported {} households.".format(exported), file = sys.stderr)
+    return 0
+
+
+## Adds the batch subcommands to an argparse parser.
+#
+def add_subcommands(parser) :
+    parser.add_argument("--storage", choices = STORAGE_KINDS, default = DEFAULT_STORAGE,
+                        help = "the storage backend, the same for the menu and the subcommands")
+    parser.add_argument("--store", default = "Households",
+                        help = "the households file, without its extension")
+    parser.add_argument("--journal", default = None,
+                        help = "the chore journal, without its extension")
+    parser.add_argument("--flush", choices = FLUSH_POLICIES, default = None,
+                        help = "when new households are written to a text store: every "
+                               "group of --flush-every for the subcommands and on create "
+                               "for the menu unless it is given")
+    parser.add_argument("--flush-every", type = int, default = DEFAULT_FLUSH_EVERY,
+                        help = "the number of households written together")
+    parser.add_argument("--workers", type = int, default = None,
+                        help = "the number of processes which read a households text file, "
+                               "by default only this one")
+    parser.add_argument("--format", choices = [JSON_FORMAT, CSV_FORMAT], default = JSON_FORMAT,
+                        help = "the format of the input and output records")
+    parser.add_argument("--on-error", choices = ERROR_MODES, default = SKIP,
+                        help = "what to do with a line of a households text file which cannot "
+                               "be loaded: stop, skip it, or skip it and copy it to --quarantine")
+    parser.add_argument("--quarantine", default = None,
+                        help = "the file which rejected lines are copied to, the households "
+                               "file with a .rejected extension by default")
+    subcommands = parser.add_subparsers(dest = "command")
+    import_parser = subcommands.add_parser("import", help = "add households to the store")
+    import_parser.add_argument("file", nargs = "?", default = "-")
+    log_parser = subcommands.add_parser("log", help = "log completed chores")
+    log_parser.add_argument("file", nargs = "?", default = "-")
+    leaderboard_parser = subcommands.add_parser("leaderboard", help = "print a household's leaderboard")
+    leaderboard_parser.add_argument("household")
+    leaderboard_parser.add_argument("-k", type = int, default = None,
+                                    help = "the number of leaders to print")
+    subcommands.add_parser("export", help = "print every household")
+    subcommands.add_parser("compact", help = "remove invalid and repeated households from a text store")
+    convert_parser = subcommands.add_parser("convert", help = "add the households in a households text file")
+    convert_parser.add_argument("text_file")
+
+
+## Return a LoadReport for the --on-error and --quarantine arguments.
+#
+# @param arguments the parsed arguments
+# @param text_file_name the households text file which is being loaded
+#
+def make_load_report(arguments, text_file_name) :
+    quarantine_file_name = arguments.quarantine
+    if arguments.on_error == QUARANTINE and quarantine_file_name is None :
+        quarantine_file_name = text_file_name + ".rejected"
+    return LoadReport(arguments.on_error, quarantine_file_name)
+
+
+## Runs a batch subcommand.
+#
+# @param arguments the parsed arguments
+# @return the exit status
+#
+def run_command(arguments) :
+    output_file = sys.stdout
+    with open_storage(arguments.storage, arguments.store, arguments.journal,
+                      arguments.flush or FLUSH_EVERY, arguments.flush_every) as storage :
+        if arguments.command == "import" :
+            input_file = _open_input(arguments.file)
+            try :
+                return 1 if import_households(storage, input_file, arguments.format, output_file) else 0
+            finally :
+                if input_file is not sys.stdin :
+                    input_file.close()
+        elif arguments.command == "log" :
+            input_file = _open_input(arguments.file)
+            try :
+                return 1 if log_completions(storage, input_file, arguments.format, output_file) else 0
+            finally :
+                if input_file is not sys.stdin :
+                    input_file.close()
+        elif arguments.command == "leaderboard" :
+            return write_leaderboard(storage, arguments.household, arguments.format, output_file, arguments.k)
+        elif arguments.command == "export" :
+            return export_households(storage, arguments.format, output_file)
+        elif arguments.command == "convert" :
+            report = make_load_report(arguments, arguments.text_file)
+            try :
+                import_text_file_parallel(arguments.text_file, storage, arguments.workers, report)
+            except RecordError as err :
+                print(err, file = sys.stderr)
+                return 1
+            finally :
+                report.close()
+            print(report, file = sys.stderr)
+            return 1 if report.rejected else 0
+        elif arguments.command == "compact" :
+            print("Removed {} records.".format(storage.compact()), file = sys.stderr)
+            return 0
+    return 2
@@ -0,0 +1,376 @@
+##
+#  Benchmarks for the chore chart.
+#
+#  Run this module to print the results, for example:
+#
+#  python benchmark_module.py
+#
+#  The suite times the main paths of the chart against generated households
+#  files of each size and can write the results as JSON, to be compared with
+#  the results from another commit:
+#
+#  python benchmark_module.py --suite --sizes 1000 100000 1000000 --json new.json
+#  python benchmark_module.py --suite --json new.json --compare old.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+from household_module import Household
+from chores_list_module import Chore
+from config_module import Limits
+from household_file_module import HouseholdRecord, household_from_record, \
+     format_household_line, parse_household_line, read_households
+from household_store_module import encode_household, decode_household
+from rendering_module import render_participants, render_chores
+from scoring_module import score_households
+from chore_journal_module import SYNC_EVERY_EVENT, SYNC_GROUP, events_per_second
+from household_registry_module import HouseholdRegistry
+from storage_module import TextStorage
+from chore_chart import check_storage, household_exists
+
+SUITE_SIZES = (1000, 100000, 1000000)
+# the most lookups, updates and renders timed at each size
+SUITE_OPERATIONS = 100000
+# the number of times each path is timed, of which the fastest is kept
+SUITE_REPEAT = 3
+# a path is reported as slower or faster when its time changes by more than this
+COMPARE_THRESHOLD = 0.1
+
+CHORE_NAMES = ["wash up", "vacuum stairs", "dusting", "empty bin", "clean bathroom",
+               "mop kitchen", "water plants", "take out recycling"]
+
+
+## Generates household records with names and chores which repeat across
+#  households, as they do in a real households file.
+#
+# @param number_of_households the number of records to generate
+# @param number_of_participants the number of participants in each household
+# @param number_of_chores the number of chores in each household
+# @return a generator of HouseholdRecord objects
+#
+def generate_records(number_of_households, number_of_participants = 3, number_of_chores = 4) :
+    for household_number in range(number_of_households) :
+        participants = tuple("person{}".format((household_number + member) % 100)
+                             for member in range(number_of_participants))
+        chores = tuple((CHORE_NAMES[(household_number + chore) % len(CHORE_NAMES)],
+                        str(1 + (household_number + chore) % 7))
+                       for chore in range(number_of_chores))
+        yield HouseholdRecord("H{:07d}".format(household_number), participants, chores,
+                              household_number + 1)
+
+
+## The layout households had before __slots__ and shared chores: each
+#  object keeps its attributes in a __dict__, and each household has its own
+#  Chore objects and name strings.
+#
+class BaselineChore() :
+
+    def __init__(self, chore_name, frequency) :
+        self._chore_name = chore_name
+        self._frequency = frequency
+
+
+class BaselineContainer() :
+
+    def __init__(self, attribute, items) :
+        setattr(self, attribute, items)
+
+
+class BaselineHousehold() :
+
+    def __init__(self, household_name, participants, chores) :
+        self._household_name = household_name
+        self._participants = BaselineContainer("_participants", participants)
+        self._chores = BaselineContainer("_chores", chores)
+        self._chore_log = {}
+
+
+## Builds a household in the baseline layout from its line, splitting the
+#  line as the chart did before the households file was parsed by
+#  parse_household_line.
+#
+def baseline_household(line) :
+    fields = [field.strip() for field in line.split(",")]
+    number_of_participants = int(fields[1])
+    chores_start = 3 + number_of_participants
+    number_of_chores = int(fields[chores_start - 1])
+    chores = {BaselineChore(fields[position], int(fields[position + 1]))
+              for position in range(chores_start, chores_start + 2 * number_of_chores, 2)}
+    return BaselineHousehold(fields[0], set(fields[2:chores_start - 1]), chores)
+
+
+## Measures the memory used by households built from the lines of a
+#  generated households file.
+#
+# @param number_of_households the number of households to build
+# @param baseline True to build the households in the baseline layout
+# @return the number of bytes allocated per household
+#
+def memory_per_household(number_of_households = 10000, baseline = False) :
+    lines = [format_household_line(household_from_record(record))
+             for record in generate_records(number_of_households)]
+    if baseline :
+        build = baseline_household
+    else :
+        build = lambda line : household_from_record(parse_household_line(line))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    households = [build(line) for line in lines]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(households)
+
+
+## Return the number of seconds taken to call a function.
+#
+def _time(function) :
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+## Times every path through the code for one large household.
+#
+# @param number_of_participants the number of participants in the household
+# @param number_of_chores the number of chores in the household
+# @param number_of_updates the number of completions logged
+# @return a dictionary where the keys are the names of the paths and the
+#         values are the times taken in seconds
+#
+def large_household_timings(number_of_participants = 1000, number_of_chores = 100,
+                            number_of_updates = 100000) :
+    limits = Limits.current().replace(maximum_household_size = number_of_participants,
+                                      maximum_number_of_chores = number_of_chores)
+    participants = {"person{:04d}".format(number) for number in range(number_of_participants)}
+    chores = {Chore("chore {:03d}".format(number), 1 + number % 20) for number in range(number_of_chores)}
+    participant_names = sorted(participants)
+    chore_names = sorted(chore.chore_name for chore in chores)
+    rows = [(participant_names[update % number_of_participants],
+             chore_names[(update * 7) % number_of_chores], 1 + update % 5)
+            for update in range(number_of_updates)]
+
+    timings = {}
+    households = []
+    timings["construct"] = _time(lambda : households.append(Household("Large", participants, chores, limits)))
+    household = households[0]
+
+    def update_log() :
+        for name, chore, number_completed in rows :
+            household.update_log(name, chore, number_completed)
+    timings["update_log"] = _time(update_log)
+    timings["update_log_many"] = _time(lambda : household.update_log_many(rows))
+    timings["leaderboard_top_10"] = _time(lambda : household.leaderboard.top(10))
+    timings["chore_log_string"] = _time(household.chore_log_string)
+    timings["render_participants_and_chores"] = \
+        _time(lambda : (render_participants(participants), render_chores(chores)))
+    timings["score_households"] = _time(lambda : score_households([household]))
+
+    # the household's limits are stored with it, so it is read back with them
+    line = format_household_line(household)
+    timings["text_round_trip"] = _time(lambda : household_from_record(parse_household_line(line)))
+    record = encode_household(household)
+    timings["binary_round_trip"] = _time(lambda : decode_household(record, 0))
+
+    return timings
+
+
+## Writes a households file of generated households.
+#
+# @param text_file_name the name of the file
+# @param number_of_households the number of households to write
+#
+def write_households_file(text_file_name, number_of_households) :
+    with open(text_file_name, "w") as text_file :
+        for record in generate_records(number_of_households) :
+            text_file.write(format_household_line(household_from_record(record)))
+
+
+## Return the least number of seconds taken to call a function.
+#
+def _best_time(function, repeat) :
+    return min(_time(function) for attempt in range(repeat))
+
+
+## Times the paths of the chart against a households file of a given size:
+#  loading the file with check_storage and with read_households alone,
+#  household_exists lookups of names
+#  which exist and which do not, Household construction, update_log, the
+#  leaderboard, the household list shown by view_household and the chore
+#  log table.
+#
+# @param number_of_households the number of households in the file
+# @param directory the directory the file is kept in. An existing file of
+#        the right size is used again.
+# @param repeat the number of times each path is timed
+# @return a list of dictionaries, one for each path, with the keys
+#         "households", "path", "operations", "seconds" and "per_second"
+#
+def suite_timings(number_of_households, directory, repeat = SUITE_REPEAT) :
+    text_file_name = os.path.join(directory, "Households{}.txt".format(number_of_households))
+    if not os.path.exists(text_file_name) :
+        write_households_file(text_file_name, number_of_households)
+    records = list(generate_records(min(number_of_households, SUITE_OPERATIONS)))
+    generator = random.Random(number_of_households)
+    sample = [generator.randrange(number_of_households) for operation in range(SUITE_OPERATIONS)]
+    results = []
+
+    def add_result(path, operations, seconds) :
+        results.append({"households": number_of_households, "path": path, "operations": operations,
+                        "seconds": seconds, "per_second": operations / seconds if seconds else 0.0})
+
+    # the file is loaded once each time, as a large load takes much longer than the other paths
+    registries = []
+    def load() :
+        registries[:] = [HouseholdRegistry()]
+        with TextStorage(text_file_name, os.path.join(directory, "ChoreLog")) as storage, \
+             contextlib.redirect_stdout(io.StringIO()) :
+            check_storage(registries[0], storage)
+    add_result("check_storage", number_of_households, _best_time(load, 1))
+    registry = registries[0]
+    # the file is also read without the registry, chore logs and load report
+    def read() :
+        with open(text_file_name, "r") as text_file :
+            HouseholdRegistry(read_households(text_file))
+    add_result("read_households", number_of_households, _best_time(read, 1))
+
+    names = ["H{:07d}".format(number) for number in sample]
+    missing = ["M{:07d}".format(number) for number in sample]
+    add_result("household_exists", len(names), _best_time(
+        lambda : [household_exists(name, registry) for name in names], repeat))
+    add_result("household_exists_missing", len(missing), _best_time(
+        lambda : [household_exists(name, registry) for name in missing], repeat))
+
+    arguments = [(record.name, set(record.participants),
+                  {Chore(chore_name, int(frequency)) for chore_name, frequency in record.chores})
+                 for record in records]
+    add_result("Household", len(arguments), _best_time(
+        lambda : [Household(*household_arguments) for household_arguments in arguments], repeat))
+
+    households = [registry.get(name) for name in names]
+    updates = [(household, household.chore_log.participant_names[number % 3],
+                household.chore_log.chore_names[number % 4]) for number, household in enumerate(households)]
+    def update_log() :
+        for household, name, chore in updates :
+            household.update_log(name, chore, 1)
+    add_result("update_log", len(updates), _best_time(update_log, repeat))
+
+    add_result("leaderboard_top", len(households), _best_time(
+        lambda : [household.leaderboard.top() for household in households], repeat))
+    add_result("leaderboard_string", len(households), _best_time(
+        lambda : [str(household.leaderboard) for household in households], repeat))
+    add_result("registry_string", len(registry), _best_time(lambda : str(registry), repeat))
+    # each household's table is drawn once and then kept, so only the first time is measured
+    add_result("chore_log_string", len(set(map(id, households))),
+               _best_time(lambda : [household.chore_log_string() for household in households], 1))
+    return results
+
+
+## Runs the suite at each size.
+#
+# @param sizes the numbers of households
+# @param directory the directory the households files are kept in, or None
+#        for a temporary directory
+# @param repeat the number of times each path is timed
+# @return a dictionary which can be written as JSON, describing the machine
+#         and holding the list of results
+#
+def run_suite(sizes = SUITE_SIZES, directory = None, repeat = SUITE_REPEAT) :
+    with contextlib.ExitStack() as stack :
+        if directory is None :
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+        results = []
+        for number_of_households in sizes :
+            results.extend(suite_timings(number_of_households, directory, repeat))
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results}
+
+
+## Compares two sets of suite results.
+#
+# @param old the results from run_suite for the earlier commit
+# @param new the results from run_suite for the later commit
+# @return a list of (households, path, old seconds, new seconds) tuples for
+#         the paths timed in both
+#
+def compare_results(old, new) :
+    old_seconds = {(result["households"], result["path"]) : result["seconds"] for result in old["results"]}
+    return [(result["households"], result["path"], old_seconds[(result["households"], result["path"])],
+             result["seconds"])
+            for result in new["results"] if (result["households"], result["path"]) in old_seconds]
+
+
+def print_suite(suite) :
+    for result in suite["results"] :
+        print("\t{:>8} {:28} {:10.3f} ms {:14.0f} /s".format(result["households"], result["path"],
+                                                           result["seconds"] * 1000, result["per_second"]))
+
+
+def print_comparison(comparison) :
+    for number_of_households, path, old_seconds, new_seconds in comparison :
+        ratio = new_seconds / old_seconds if old_seconds else 1.0
+        change = "slower" if ratio > 1 + COMPARE_THRESHOLD else \
+                 "faster" if ratio < 1 - COMPARE_THRESHOLD else ""
+        print("\t{:>8} {:28} {:10.3f} ms {:10.3f} ms {:6.2f}x {}".format(
+            number_of_households, path, old_seconds * 1000, new_seconds * 1000, ratio, change))
+
+
+## main method
+#
+# Runs the benchmarks and prints the results.
+#
+def main():
+    parser = argparse.ArgumentParser(description = "Chore chart benchmarks")
+    parser.add_argument("--suite", action = "store_true",
+                        help = "time the paths of the chart against generated households files")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = list(SUITE_SIZES),
+                        help = "the numbers of households in the generated files")
+    parser.add_argument("--repeat", type = int, default = SUITE_REPEAT,
+                        help = "the number of times each path is timed")
+    parser.add_argument("--directory", default = None,
+                        help = "keep the generated files in this directory to use them again")
+    parser.add_argument("--json", default = None, help = "write the suite results to this file")
+    parser.add_argument("--compare", default = None,
+                        help = "compare the suite results with those in this file")
+    arguments = parser.parse_args()
+
+    if arguments.suite :
+        suite = run_suite(arguments.sizes, arguments.directory, arguments.repeat)
+        print("Suite:")
+        print_suite(suite)
+        if arguments.json is not None :
+            with open(arguments.json, "w") as json_file :
+                json.dump(suite, json_file, indent = 1)
+        if arguments.compare is not None :
+            with open(arguments.compare) as json_file :
+                print("\nCompared with {}:".format(arguments.compare))
+                print_comparison(compare_results(json.load(json_file), suite))
+        return
+
+    current = memory_per_household()
+    baseline = memory_per_household(baseline = True)
+    print("Memory: {:.0f} bytes per household, {:.0f} in the baseline layout, {:.0f} ({:.0%}) saved"
+          .format(current, baseline, baseline - current, (baseline - current) / baseline))
+
+    print("\nOne household of 1000 participants x 100 chores, 100000 completions:")
+    for name, seconds in large_household_timings().items() :
+        print("\t{:32} {:10.3f} ms".format(name, seconds * 1000))
+
+    print("\nChore journal:")
+    with tempfile.TemporaryDirectory() as directory :
+        journal_name = os.path.join(directory, "ChoreLog")
+        for sync_mode, number_of_events in ((SYNC_EVERY_EVENT, 2000), (SYNC_GROUP, 100000)) :
+            print("\t{:32} {:10.0f} events/s".format("sync " + sync_mode,
+                                                     events_per_second(journal_name, number_of_events, sync_mode)))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,29 @@
 #  Author: Rae Harbird
 #  Date: December 2019
 
+import argparse
+import sys
+import time
+
+import household_file_module
+import instrumentation_module
 from household_module import Household
 from chores_list_module import ChoresList, Chore
 from participants_list_module import Participants
+from household_file_module import LoadStats, LoadReport, RecordError, FLUSH_ON_CREATE
+from household_registry_module import HouseholdRegistry
+from config_module import configure, limits_for
+from storage_module import TextStorage, open_storage
+from parallel_load_module import read_households_parallel
+from lazy_registry_module import LazyHouseholdRegistry, DEFAULT_CACHE_SIZE
+from batch_commands_module import add_subcommands, run_command, make_load_report
+from instrumentation_module import timer, count
 
 ## Constants used for validation
 
 MENU_CHOICES = ['A', 'C', 'V', 'L', 'S', 'Q']
+# the number of household names the user may enter before returning to the menu
+MAXIMUM_LOOKUP_ATTEMPTS = 3
 
 ## Prints the menu for the application. 
 #
@@ -39,50 +55,62 @@ def about() :
 
 
 ##  Creates a new household using the information entered by the user.
-#   @param all_households a list of household objects
+#   @param all_households a HouseholdRegistry containing the household objects
+#   @param storage the Storage object which the household is added to
 #
 #
-def create_household(all_households,participants_each_household,chores_each_household,household_text_file) :
+def create_household(all_households, storage) :
     new_household_name = get_household_name()
-    found = False
     household_obj = household_exists(new_household_name, all_households)
     
     if  household_obj == None:
-        members_set = get_participants_names(new_household_name,participants_each_household)
-        chores_set = get_chores(new_household_name,chores_each_household)
-        household_obj = Household(new_household_name, members_set, chores_set)
-        all_households.append(new_household_name)
-        household_text_file.write(("{}, {}, ").format(household_obj, len(participants_each_household[new_household_name])))
-        for member_of in range(len(participants_each_household[new_household_name])):
-            household_text_file.write(("{}, ").format(participants_each_household[new_household_name][member_of]))
-        household_text_file.write(("{0:.1g}, ").format(len(chores_each_household[new_household_name])/2))
-        chores_in = 0
-        while chores_in < len(chores_each_household[new_household_name]) - 1:
-            household_text_file.write(("{}, ").format(chores_each_household[new_household_name][chores_in]))
-            chores_in += 1
-        household_text_file.write(("{} \n").format(chores_each_household[new_household_name][chores_in]))
-        print(all_households)
+        # a household with a section in the configuration file has its own limits
+        limits = limits_for(new_household_name)
+        members_set = get_participants_names(limits)
+        chores_set = get_chores(limits)
+        # The name, participants and chores were validated as they were entered.
+        with timer("create_household") :
+            household_obj = Household.from_validated(new_household_name, members_set, chores_set, limits)
+            all_households.add(household_obj)
+            storage.add(household_obj)
+        print("\n\tHousehold {} has been created.".format(new_household_name))
     else:
        print("Household {} already exists, returning to the menu."
               .format(new_household_name))
         
     return 
 
-##  Checks whether a household with a given name exists in the list of households.
+##  Checks whether a household with a given name exists in the registry of households.
 #
-#   @param all_households a list of household objects
+#   @param all_households a HouseholdRegistry containing the household objects
 #   @param household_name the household name to check
 #   @return the household object if the household exists and None if it does not.
 #
 #
 def household_exists(new_household_name, all_households) :
-    h_obj = None
+    return all_households.get(new_household_name)
 
-    for household in all_households :
-        if household == new_household_name :
-            h_obj = household
 
-    return h_obj
+##  Prompts the user for the name of a household which exists. When the name
+#   is not found the names most like it are suggested and the user is asked
+#   again, up to a fixed number of times.
+#
+#   @param all_households a registry containing the household objects
+#   @param attempts the number of names the user may enter
+#   @return a tuple containing the household name and the Household object,
+#           which is None if no household was found
+#
+def find_household(all_households, attempts = MAXIMUM_LOOKUP_ATTEMPTS) :
+    for attempt in range(attempts) :
+        household_name = get_household_name()
+        household_obj = household_exists(household_name, all_households)
+        if household_obj != None :
+            return household_name, household_obj
+        print("\n\tThis household does not exist\n\t")
+        suggestions = all_households.suggest(household_name)
+        if suggestions :
+            print("\tDid you mean: {}?".format(", ".join(suggestions)))
+    return household_name, None
         
 
 ##  Prompts the user for a household name and checks that the name is
@@ -135,11 +163,11 @@ def get_chore_frequency() :
 #
 #   Invariants: duplicate names are not allowed
 #
+#   @param limits the household's Limits, or None for the class constants
 #   @return a set containing the names.
 #
-def get_participants_names(new_household_name,participants_each_household):
+def get_participants_names(limits = None):
     household_names = set()
-    participants_each_household[new_household_name] = []
     
     name = "AAA"    # dummy value so that we can start the while loop
     
@@ -149,14 +177,13 @@ def get_participants_names(new_household_name,participants_each_household):
  
         if name == "" :
             try :
-                Participants.is_valid_length(household_names)
+                Participants.is_valid_length(household_names, limits)
             except ValueError as err:
                 print(err)
                 name = "AAA"
         else:
             current_length = len(household_names)
             household_names.add(name)
-            participants_each_household[new_household_name].append(name)
             if current_length < len(household_names) :
                 number_of_people = number_of_people + 1
             else:
@@ -205,12 +232,12 @@ def get_person_name(participant_number) :
 #               chore frequency must be >= the minimum frequency,
 #               chore frequency must be <= the maximum frequency
 #
-#   @return a list containing chore objects.
+#   @param limits the household's Limits, or None for the class constants
+#   @return a set containing chore objects.
 #
-def get_chores(new_household_name,chores_each_household):
+def get_chores(limits = None):
 
     chores_list = set()
-    chores_each_household[new_household_name] = []
     new_chore = "AAA"    # dummy value so that we can start the while loop
     number_of_chores = 0
 
@@ -218,7 +245,7 @@ def get_chores(new_household_name,chores_each_household):
         new_chore = get_chore(number_of_chores + 1)
         if new_chore == "" :
             try :
-                ChoresList.is_valid_length(chores_list)
+                ChoresList.is_valid_length(chores_list, limits)
             except ValueError as err:
                 print(err)
                 new_chore = "AAA"
@@ -228,8 +255,6 @@ def get_chores(new_household_name,chores_each_household):
                 chore_frequency = get_chore_frequency()
                 chore_obj = Chore(new_chore, chore_frequency)
                 chores_list.add(chore_obj)
-                chores_each_household[new_household_name].append(new_chore)
-                chores_each_household[new_household_name].append(chore_frequency)
                 number_of_chores = number_of_chores + 1
                 
             except ValueError as err :
@@ -294,50 +319,83 @@ def is_blank(any_string):
         return False
 
 
-##  View household.
-# @param all_households, a list of household objects
+##  View household. The user is asked again, with suggestions, if the
+#   household does not exist.
+# @param all_households, a HouseholdRegistry containing the household objects
 #
-def view_household(all_households,participants_each_household,chores_each_household):
+def view_household(all_households):
 
-    which_household_view = get_household_name()
-    household_exist_check = household_exists(which_household_view, all_households)
+    which_household_view, household_obj = find_household(all_households)
 
-    if household_exist_check == None:
-        print("\n\tThis household does not exist\n\t")
-        print(all_households)
-        view_household(all_households,participants_each_household,chores_each_household)
+    if household_obj == None:
+        print("\n\tReturning to the menu.")
     else:
-        print(("\n\t{}").format(which_household_view))
-        print("\nParticipants:")
-        members_list = participants_each_household[which_household_view]
-        for member_number in range(len(members_list)):
-            print(("\n\t{}. \t{}").format(member_number + 1, members_list[member_number]))
-        print("\nWeekly Chores:")
-        chores_and_frequencies = chores_each_household[which_household_view]
-        number_for_chore = 0
-        for chore_number in range(0,len(chores_and_frequencies),2):
-            number_for_chore += 1
-            print(("\n\t{}. \t{} ({})").format(number_for_chore, chores_and_frequencies[chore_number],chores_and_frequencies[chore_number + 1]))
+        with timer("view_household"):
+            print(("\n\t{}").format(which_household_view))
+            print("\nParticipants:")
+            members_list = sorted(household_obj.participants.participants)
+            for member_number in range(len(members_list)):
+                print(("\n\t{}. \t{}").format(member_number + 1, members_list[member_number]))
+            print("\nWeekly Chores:")
+            chores_list = sorted(household_obj.chores.chores, key = lambda chore : chore.chore_name)
+            for chore_number in range(len(chores_list)):
+                print(("\n\t{}. \t{}").format(chore_number + 1, chores_list[chore_number]))
+            print("\nChores Done:\n")
+            print(household_obj.chore_log_string())
         
             
     return    
 
 
 ##  Log chores.
-# @param all_households, a list of household objects
+# @param all_households, a HouseholdRegistry containing the household objects
+# @param storage an optional Storage object which the completions are recorded in
 #
-def log_chores(all_households):
+def log_chores(all_households, storage = None):
     
-    print("Not implemented yet.")
+    which_household_log, household_obj = find_household(all_households, attempts = 1)
+
+    if household_obj == None:
+        return
+
+    logged = False
+    while not logged :
+        try :
+            name = input("\n\tEnter the name of the participant (blank to return to the menu): ").strip()
+            if is_blank(name) :
+                return
+            chore = input("\n\tEnter the name of the chore: ").strip()
+            if is_blank(chore) :
+                return
+            number_completed = input("\n\t\tNumber of times done: ")
+        except EOFError :
+            return
+        try :
+            with timer("log") :
+                household_obj.update_log(name, chore, number_completed)
+                logged = True
+                if storage is not None :
+                    storage.record(household_obj.household_name, [(name, chore, number_completed)])
+        except (TypeError, ValueError) as err :
+            count("log errors")
+            print(err)
         
     return    
 
 
 ##  Show the leaderboard for a house.
-# @param all_households, a list of household objects
+# @param all_households, a HouseholdRegistry containing the household objects
 #
 def show_leaderboard(all_households):
-    print("Not implemented yet.")
+    which_household_view, household_obj = find_household(all_households, attempts = 1)
+
+    if household_obj != None:
+        with timer("leaderboard"):
+            print(("\n\tLeaderboard for {}").format(which_household_view))
+            position = 0
+            for name, points in household_obj.leaderboard.top():
+                position += 1
+                print(("\n\t{}. \t{} \t{} points").format(position, name, points))
 
     return 
 
@@ -352,131 +410,149 @@ def get_option():
     
     while is_valid_option(option) == False:
         print_menu()
-        option = input("\nEnter an option: ")
+        try:
+            option = input("\nEnter an option: ")
+        except EOFError:
+            # the end of the input quits, so the storage is closed
+            option = 'Q'
    
     return option.upper()
 
-# in the below function, the text file is opened for reading and split into its individual lines and each line into its words
-# the commas at the end of each word are then removed so that each word/number can be validated correctly
-# each word is then added to the text_file_line list to allow the validation tests to call indiviual words
-def check_text_file(all_households,participants_each_household,chores_each_household):
-    household_text_file = open("Households.txt","r")
-    if household_text_file.mode == "r":
-        contents = household_text_file.readlines()
-        line_count = 0
-        for line in contents:
-            line_count += 1
-            word_count = 0
-            words_in_line = line.split()
-            text_file_line = []
-            for word in words_in_line:
-                word_count += 1
-                word_new = word.replace(',',"")
-                text_file_line.append(word_new)
-            text_file_household_name_validation(text_file_line,all_households,participants_each_household,chores_each_household)
-
-# the first word of each line will be the household name, hence the 0th element of the text_file_line lost will be the household
-# the test then checks whether the household is an appropriate name before appending it to the all_households list
-def text_file_household_name_validation(text_file_line,all_households,participants_each_household,chores_each_household):
+##  Loads the households from storage.
+#   The households are read one at a time and each valid household is added
+#   to the registry with its chore log. The load rate is reported, and the
+#   peak memory use if it is traced.
+#
+#   @param all_households a HouseholdRegistry which the households are added to
+#   @param storage a Storage object
+#   @param workers the number of processes which read a households text file.
+#          The file is read in this process if it is None or 1.
+#   @param report a LoadReport object which the lines that cannot be loaded
+#          are added to. A summary is printed once the load is finished.
+#   @param trace_memory True if the peak memory use should be measured, which
+#          makes the load several times slower
+#   @exception RecordError raised by the report in FAIL_FAST mode
+#
+def check_storage(all_households, storage, workers = None, report = None, trace_memory = False):
+    if report is None:
+        report = LoadReport()
+    stats = LoadStats(trace_memory)
+    stats.start()
+    if workers is not None and workers > 1 and isinstance(storage, TextStorage):
+        households = read_households_parallel(storage.text_file_name, workers, stats, report)
+    else:
+        households = storage.households(stats, report)
     try:
-        Household.is_valid_name(text_file_line[0])
-        valid = True
-        all_households.append(text_file_line[0])
-        text_file_participants_validation(text_file_line,all_households,participants_each_household,chores_each_household)
-    except ValueError as err:
-        print(err)
-        print(("\n\nPlease correct the '{}' Household name the text file, first Quit the application").format(text_file_line[0]))
-    
-# if the household name was valid, the below function is called
-# the first element of the text_file_line list is the number of participants
-# this determines how many times the below for loop will be run.
-# the first household participant name will always be the second element, so the for loop begins here
-# for the stated number of participants in the first element, the for loop will add each of these paricipants to the
-# household_names set and the dictionary, which are then used for validation
-# the variable 'i' is a counter variable, which will keep track of what element number of the text_file_line we are validating
-
-def text_file_participants_validation(text_file_line,all_households,participants_each_household,chores_each_household):
-    number_of_members = int(text_file_line[1])
-    household_names = set()
-    participants_each_household[text_file_line[0]] = []
-    i = 2
-    for household_member in range(2,number_of_members + 2):
-        i+=1
-        household_names.add(text_file_line[household_member])
-        participants_each_household[text_file_line[0]].append(text_file_line[household_member])
-    try :
-        Participants.is_valid_length(household_names)
-        Participants.is_valid_naming(participants_each_household[text_file_line[0]])
-    except ValueError as err:
-        print(err)
-        print(("\n\nPlease correct this on the '{}' Household in the text file, first Quit the application").format(text_file_line[0]))
+        with timer("load"):
+            for household in households:
+                try:
+                    all_households.add(household)
+                except ValueError as err:
+                    report.add_duplicate(household, str(err))
+                    continue
+                try:
+                    storage.restore(household)
+                except ValueError as err:
+                    print(err)
+    finally:
+        report.close()
+    stats.stop()
+    count("households loaded", report.loaded)
+    count("lines rejected", report.rejected)
+    print(stats)
+    print(report)
+
+
+## Turns the instrumentation off, if it is on, and prints the time taken by
+#  each operation.
+#  @param output_file the file the times are printed to
+#
+def print_instruments(output_file):
+    instruments = instrumentation_module.disable()
+    if instruments is not None:
+        print("\n" + str(instruments), file = output_file)
 
-    text_file_chores_validation(text_file_line,all_households,participants_each_household,chores_each_household,i,household_names)
-
-# the value of 'i' will now be such that the ith element of the text_file_line list will be the elemtn containing the number of chores
-# since we want to validate the chore and its frequency, we multiply the value of this element by two, this will give us the number of
-# elements left in the text_file_line that needs to be validated.
-def text_file_chores_validation(text_file_line,all_households,participants_each_household,chores_each_household,i,household_names):
-    number_chores_and_frequencies = int(int((text_file_line[i])) * 2)
-    chores_list = set()
-    chores_each_household[text_file_line[0]] = []
-    # j is another counter variable which, in the below for loop, will isolate the chore frequencies will i isolates the corresponding
-    # chore
-    j = i + 2
-    for household_chore in range(i + 1, number_chores_and_frequencies + i + 1, 2):
-        chores_each_household[text_file_line[0]].append(text_file_line[household_chore])
-        chore_frequency = text_file_line[j]
-        try :
-            Chore.is_valid_frequency(chore_frequency)
-            ChoresList.is_unique(text_file_line[household_chore], chores_list)
-            chores_object = Chore(text_file_line[household_chore], chore_frequency)
-            chores_list.add(chores_object)
-            chores_each_household[text_file_line[0]].append(text_file_line[j])
-            valid = True
-        except (TypeError, ValueError) as err:
-            print(err)
-            print(("\n\tPlease correct the '{}' on the '{}' Household on the text file, first Quit the application").format(chore_frequency, text_file_line[0]))
-        j += 2
-    try :
-        ChoresList.is_valid_length(chores_list)        
-    except ValueError as err:
-        print(err)
-        
-    household_object = Household(text_file_line[0], household_names, chores_list)
-    
-    
 
 ## The menu is displayed until the user quits
 # 
 def main() :
     
-    all_households = []   
+    # the size limits for this deployment and for single households are read
+    # from the configuration file, if there is one
+    try :
+        configure()
+    except ValueError as err :
+        print(err)
+        print("Please correct the configuration file and start the application again.")
+        sys.exit(1)
+    # a subcommand such as "import" or "leaderboard" runs without the menu
+    parser = argparse.ArgumentParser(description = "Household chore chart")
+    parser.add_argument("--lazy", action = "store_true",
+                        help = "read only the household names at startup")
+    parser.add_argument("--cache-size", type = int, default = DEFAULT_CACHE_SIZE,
+                        help = "the number of households kept in memory with --lazy")
+    parser.add_argument("--instrument", action = "store_true",
+                        help = "print the time taken by each operation when the chart quits; "
+                               "the {} environment variable does the same"
+                               .format(instrumentation_module.ENVIRONMENT_VARIABLE))
+    parser.add_argument("--profile", default = None,
+                        help = "run cProfile and write its statistics to this file on quit")
+    parser.add_argument("--trace-memory", default = None,
+                        help = "run tracemalloc and write the largest allocations to this file on quit")
+    add_subcommands(parser)
+    arguments = parser.parse_args()
+    instruments = None
+    if arguments.instrument or arguments.profile or arguments.trace_memory \
+       or instrumentation_module.enabled_by_environment() :
+        instruments = instrumentation_module.enable(arguments.profile, arguments.trace_memory)
+        # every line of a households text file read in this process is validated here
+        instruments.wrap(household_file_module, "validate_record", "validate")
+    if arguments.command is not None :
+        status = run_command(arguments)
+        print_instruments(sys.stderr)
+        sys.exit(status)
+
     option = '*'
-    participants_each_household = {}
-    chores_each_household = {}
-    # the following household is for the purpose of creating a file of there isn't already one so that
-    #the check_text_file function has a file to just read and run validation tests on
-    household_text_file = open("Households.txt","a+")
-    household_text_file.close()
-    check_text_file(all_households,participants_each_household,chores_each_household)
-    household_text_file.close()
-    # now the file is opened so that it can be edited
-    household_text_file = open("Households.txt","a+")
+    # the households are kept in Households.txt unless another storage backend
+    # is chosen, and the storage is created if it does not exist yet
+    storage = open_storage(arguments.storage, arguments.store, arguments.journal,
+                           arguments.flush or FLUSH_ON_CREATE, arguments.flush_every)
+    if arguments.lazy :
+        # each household is loaded when it is first used
+        start = time.perf_counter()
+        all_households = LazyHouseholdRegistry(storage, arguments.cache_size)
+        print("Indexed {} households in {:.3f}s".format(len(all_households), time.perf_counter() - start))
+    else :
+        all_households = HouseholdRegistry()
+        report = make_load_report(arguments, getattr(storage, "text_file_name", arguments.store))
+        try :
+            # the peak memory of the load is only measured when the chart is instrumented
+            check_storage(all_households, storage, arguments.workers, report,
+                          trace_memory = instruments is not None)
+        except RecordError as err :
+            # --on-error fail-fast stops at the first line which cannot be loaded
+            print(err)
+            print("Please correct the text file and start the application again.")
+            storage.close()
+            print_instruments(sys.stdout)
+            sys.exit(1)
     
     while option != 'Q':
         option = get_option()        
         if option == 'A':
             about()
         elif option == 'C':
-            create_household(all_households,participants_each_household,chores_each_household,household_text_file)
+            create_household(all_households, storage)
         elif option == 'V':
-            view_household(all_households,participants_each_household,chores_each_household)
+            view_household(all_households)
         elif option == 'L':
-            log_chores(all_households)
+            log_chores(all_households, storage)
         elif option == 'S':
             show_leaderboard(all_households)
             # print("\n\tNot implemented yet.\n")
 
+    storage.close()
+    print_instruments(sys.stdout)
     print("\n\nBye, bye.")
 
         
@@ -0,0 +1,411 @@
+##
+#  Durable storage for chore logs.
+#
+#  Completed chores are appended to a write-ahead log as they are logged, and
+#  the totals are written to a snapshot from time to time:
+#
+#  <name>.wal   the write-ahead log. Each event is a 4 byte length, a 4 byte
+#               CRC-32 and the event: a sequence number, a household name and
+#               one or more (participant, chore, number) rows.
+#  <name>.snap  the snapshot. The sequence number of the last event it
+#               includes, followed by the non-zero counts of every household.
+#
+#  A snapshot is written to a temporary file which is renamed over the old
+#  snapshot, and then the write-ahead log is emptied. Recovery loads the
+#  snapshot and replays only the events with a later sequence number. An
+#  event which was only partly written is discarded.
+#
+#  The write-ahead log can be synced to disk after every event, which loses
+#  nothing if the machine crashes, or after a group of events, which is much
+#  faster but can lose the events of the last group. A group which is not
+#  full is synced by a timer once the group interval has passed, so its
+#  events are not left waiting for the next event to be logged.
+
+import os
+import struct
+import threading
+import time
+import zlib
+
+from household_store_module import pack_string, unpack_string
+from household_file_module import sync_directory
+
+WAL_EXTENSION = ".wal"
+SNAPSHOT_EXTENSION = ".snap"
+
+SYNC_EVERY_EVENT = "event"
+SYNC_GROUP = "group"
+
+DEFAULT_GROUP_SIZE = 256
+DEFAULT_GROUP_INTERVAL = 0.05
+DEFAULT_SNAPSHOT_INTERVAL = 100000
+
+_EVENT_HEADER = struct.Struct("<II")
+_SEQUENCE = struct.Struct("<Q")
+_COUNT = struct.Struct("<I")
+_NUMBER = struct.Struct("<Q")
+
+
+## Encodes an event.
+#
+# @param sequence the sequence number of the event
+# @param household_name the name of the household
+# @param rows a list of (name, chore, number_completed) tuples
+# @return the event as bytes
+#
+def encode_event(sequence, household_name, rows) :
+    parts = [_SEQUENCE.pack(sequence)]
+    pack_string(parts, household_name)
+    parts.append(_COUNT.pack(len(rows)))
+    for name, chore, number_completed in rows :
+        pack_string(parts, name)
+        pack_string(parts, chore)
+        parts.append(_NUMBER.pack(number_completed))
+    payload = b"".join(parts)
+    return _EVENT_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+## Decodes the payload of an event.
+# @return a tuple containing the sequence number, the household name and a
+#         list of (name, chore, number_completed) tuples
+#
+def decode_event(payload) :
+    (sequence,) = _SEQUENCE.unpack_from(payload, 0)
+    household_name, offset = unpack_string(payload, _SEQUENCE.size)
+    (number_of_rows,) = _COUNT.unpack_from(payload, offset)
+    offset += _COUNT.size
+    rows = []
+    for row in range(number_of_rows) :
+        name, offset = unpack_string(payload, offset)
+        chore, offset = unpack_string(payload, offset)
+        (number_completed,) = _NUMBER.unpack_from(payload, offset)
+        offset += _NUMBER.size
+        rows.append((name, chore, number_completed))
+    return sequence, household_name, rows
+
+
+class ChoreJournal() :
+
+    ## Constructor for the ChoreJournal class. Recovers the totals from the
+    #  snapshot and the write-ahead log, creating them if they do not exist.
+    #
+    # @param journal_name the path of the journal without an extension
+    # @param sync_mode SYNC_EVERY_EVENT or SYNC_GROUP
+    # @param group_size the number of events in a group
+    # @param group_interval the longest time in seconds an event waits to be
+    #        synced
+    # @param snapshot_interval the number of events between snapshots, or None
+    #        to write snapshots only when snapshot is called
+    #
+    def __init__(self, journal_name, sync_mode = SYNC_GROUP, group_size = DEFAULT_GROUP_SIZE,
+                 group_interval = DEFAULT_GROUP_INTERVAL, snapshot_interval = DEFAULT_SNAPSHOT_INTERVAL) :
+        if sync_mode not in (SYNC_EVERY_EVENT, SYNC_GROUP) :
+            raise ValueError("The sync mode must be {} or {}.".format(SYNC_EVERY_EVENT, SYNC_GROUP))
+        self.wal_file_name = journal_name + WAL_EXTENSION
+        self.snapshot_file_name = journal_name + SNAPSHOT_EXTENSION
+        self.sync_mode = sync_mode
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.snapshot_interval = snapshot_interval
+
+        # the totals for each household: {household : {(name, chore) : number}}
+        self._totals = {}
+        self._sequence = 0
+        self._snapshot_sequence = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None
+        self._lock = threading.Lock()
+
+        self._read_snapshot()
+        self._wal_file = open(self.wal_file_name, "a+b")
+        self.replayed = self._replay_wal()
+
+
+    ## Return the sequence number of the last event.
+    #
+    @property
+    def sequence(self) :
+        return self._sequence
+
+
+    ## Return the number of events which have not been synced.
+    #
+    @property
+    def unsynced(self) :
+        return self._unsynced
+
+
+    ## Loads the totals from the snapshot file, if there is one.
+    #
+    def _read_snapshot(self) :
+        try :
+            with open(self.snapshot_file_name, "rb") as snapshot_file :
+                data = snapshot_file.read()
+        except FileNotFoundError :
+            return
+        (self._snapshot_sequence,) = _SEQUENCE.unpack_from(data, 0)
+        self._sequence = self._snapshot_sequence
+        offset = _SEQUENCE.size
+        while offset < len(data) :
+            household_name, offset = unpack_string(data, offset)
+            (number_of_cells,) = _COUNT.unpack_from(data, offset)
+            offset += _COUNT.size
+            cells = {}
+            for cell in range(number_of_cells) :
+                name, offset = unpack_string(data, offset)
+                chore, offset = unpack_string(data, offset)
+                (number_completed,) = _NUMBER.unpack_from(data, offset)
+                offset += _NUMBER.size
+                cells[(name, chore)] = number_completed
+            self._totals[household_name] = cells
+
+
+    ## Adds the events which follow the snapshot to the totals and removes an
+    #  event which was only partly written.
+    #
+    # @return the number of events replayed
+    #
+    def _replay_wal(self) :
+        self._wal_file.seek(0)
+        data = self._wal_file.read()
+        offset = 0
+        replayed = 0
+        while offset + _EVENT_HEADER.size <= len(data) :
+            length, checksum = _EVENT_HEADER.unpack_from(data, offset)
+            event_end = offset + _EVENT_HEADER.size + length
+            payload = data[offset + _EVENT_HEADER.size:event_end]
+            if event_end > len(data) or zlib.crc32(payload) != checksum :
+                break
+            sequence, household_name, rows = decode_event(payload)
+            if sequence > self._sequence :
+                self._add_to_totals(household_name, rows)
+                self._sequence = sequence
+                replayed += 1
+            offset = event_end
+        if offset < len(data) :
+            self._wal_file.truncate(offset)
+        return replayed
+
+
+    def _add_to_totals(self, household_name, rows) :
+        cells = self._totals.setdefault(household_name, {})
+        for name, chore, number_completed in rows :
+            cells[(name, chore)] = cells.get((name, chore), 0) + number_completed
+
+
+    ## Return the recovered totals for a household.
+    #
+    # @return a list of (name, chore, number_completed) tuples
+    #
+    def totals(self, household_name) :
+        return [(name, chore, number_completed) for (name, chore), number_completed
+                in self._totals.get(household_name, {}).items()]
+
+
+    ## Adds the recovered totals to a household's chore log. This should be
+    #  done once, when the household is loaded.
+    #
+    # @param household a Household object with an empty chore log
+    # @exception ValueError raised if a participant or chore in the totals is
+    #            no longer in the household
+    #
+    def restore(self, household) :
+        household.restore_log(self.totals(household.household_name))
+
+
+    ## Records completions which have been added to a household's chore log.
+    #  The rows are one event, so they are all recovered or none of them are.
+    #
+    # @param household_name the name of the household
+    # @param rows a list of (name, chore, number_completed) tuples
+    # @return the sequence number of the event
+    #
+    def record(self, household_name, rows) :
+        rows = [(name, chore, int(number_completed)) for name, chore, number_completed in rows]
+        with self._lock :
+            self._sequence += 1
+            self._wal_file.write(encode_event(self._sequence, household_name, rows))
+            self._add_to_totals(household_name, rows)
+            self._unsynced += 1
+            if self.sync_mode == SYNC_EVERY_EVENT or self._unsynced >= self.group_size or \
+                    time.monotonic() - self._last_sync >= self.group_interval :
+                self._sync()
+            if self.snapshot_interval is not None and \
+                    self._sequence - self._snapshot_sequence >= self.snapshot_interval :
+                self._write_snapshot()
+            if self._unsynced > 0 and self._sync_timer is None :
+                self._sync_timer = threading.Timer(self.group_interval, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+            return self._sequence
+
+
+    def _sync(self) :
+        self._wal_file.flush()
+        os.fsync(self._wal_file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        if self._sync_timer is not None :
+            self._sync_timer.cancel()
+            self._sync_timer = None
+
+
+    ## Syncs any events which are waiting for their group to be synced. This
+    #  is called by the timer once the group interval has passed.
+    #
+    def sync(self) :
+        with self._lock :
+            if self._unsynced > 0 and not self._wal_file.closed :
+                self._sync()
+
+
+    def _write_snapshot(self) :
+        if self._unsynced > 0 :
+            self._sync()
+        parts = [_SEQUENCE.pack(self._sequence)]
+        for household_name, cells in self._totals.items() :
+            pack_string(parts, household_name)
+            parts.append(_COUNT.pack(len(cells)))
+            for (name, chore), number_completed in cells.items() :
+                pack_string(parts, name)
+                pack_string(parts, chore)
+                parts.append(_NUMBER.pack(number_completed))
+
+        temporary_file_name = self.snapshot_file_name + ".tmp"
+        with open(temporary_file_name, "wb") as snapshot_file :
+            snapshot_file.write(b"".join(parts))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_file_name, self.snapshot_file_name)
+        sync_directory(os.path.dirname(self.snapshot_file_name))
+        self._snapshot_sequence = self._sequence
+
+        # every event in the log is now in the snapshot
+        self._wal_file.truncate(0)
+        os.fsync(self._wal_file.fileno())
+
+
+    ## Writes a snapshot of the totals and empties the write-ahead log.
+    #
+    def snapshot(self) :
+        with self._lock :
+            self._write_snapshot()
+
+
+    def close(self) :
+        with self._lock :
+            if not self._wal_file.closed :
+                if self._unsynced > 0 :
+                    self._sync()
+                self._wal_file.close()
+            if self._sync_timer is not None :
+                self._sync_timer.cancel()
+                self._sync_timer = None
+
+
+    def __enter__(self) :
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) :
+        self.close()
+
+
+## Measures how many events a second can be recorded.
+#
+# @param journal_name the path of a journal which is created and removed
+# @param number_of_events the number of events to record
+# @param sync_mode SYNC_EVERY_EVENT or SYNC_GROUP
+# @return the number of events recorded a second
+#
+def events_per_second(journal_name, number_of_events, sync_mode, group_size = DEFAULT_GROUP_SIZE) :
+    start = time.perf_counter()
+    with ChoreJournal(journal_name, sync_mode, group_size, snapshot_interval = None) as journal :
+        for number in range(number_of_events) :
+            journal.record("House{}".format(number % 100), [("personA", "wash up", 1)])
+    elapsed = time.perf_counter() - start
+    for extension in (WAL_EXTENSION, SNAPSHOT_EXTENSION) :
+        if os.path.exists(journal_name + extension) :
+            os.remove(journal_name + extension)
+    return number_of_events / elapsed
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import tempfile
+    from household_module import Household
+    from chores_list_module import Chore
+
+    def new_household() :
+        return Household("House1", {"personA","personB","personC"},
+                         {Chore("wash up", 4), Chore("dusting", 1)})
+
+    with tempfile.TemporaryDirectory() as directory :
+        journal_name = os.path.join(directory, "ChoreLog")
+
+        print("Test 1: Log chores, then recover them from the write-ahead log")
+        try:
+            household = new_household()
+            with ChoreJournal(journal_name) as journal :
+                household.update_log("personA", "wash up", 3)
+                journal.record("House1", [("personA", "wash up", 3)])
+                household.update_log_many([("personB", "dusting", 2), ("personA", "dusting", 1)])
+                journal.record("House1", [("personB", "dusting", 2), ("personA", "dusting", 1)])
+            household = new_household()
+            with ChoreJournal(journal_name) as journal :
+                journal.restore(household)
+                print("\n\tVALID: replayed", journal.replayed, household.leaderboard.top())
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 2: Write a snapshot, log more chores and recover")
+        try:
+            with ChoreJournal(journal_name) as journal :
+                journal.snapshot()
+                journal.record("House1", [("personC", "wash up", 5)])
+            household = new_household()
+            with ChoreJournal(journal_name) as journal :
+                journal.restore(household)
+                print("\n\tVALID: replayed", journal.replayed, household.leaderboard.top())
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 3: Recover from an event which was only partly written")
+        try:
+            with open(journal_name + WAL_EXTENSION, "ab") as wal_file :
+                wal_file.write(encode_event(99, "House1", [("personB", "wash up", 50)])[:-3])
+            household = new_household()
+            with ChoreJournal(journal_name) as journal :
+                journal.restore(household)
+                print("\n\tVALID: replayed", journal.replayed, household.leaderboard.top())
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 4: Compare syncing every event with group commit")
+        try:
+            benchmark_name = os.path.join(directory, "Benchmark")
+            every_event = events_per_second(benchmark_name, 500, SYNC_EVERY_EVENT)
+            group = events_per_second(benchmark_name, 20000, SYNC_GROUP)
+            print("\n\tVALID:  {:.0f} events/s syncing every event, {:.0f} events/s with group commit"
+                  .format(every_event, group))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 5: Sync a group which is not full once the group interval has passed")
+        try:
+            with ChoreJournal(journal_name, group_interval = 0.05) as journal :
+                journal.record("House1", [("personA", "wash up", 1)])
+                waiting = journal.unsynced
+                time.sleep(0.5)
+                print("\n\tVALID:  unsynced events {} after logging, {} after the interval"
+                      .format(waiting, journal.unsynced))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
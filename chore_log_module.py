@@ -0,0 +1,180 @@
+from array import array
+from collections.abc import Mapping
+
+## The log of chores done in a household.
+#
+# The number of times each participant has completed each chore is held in a
+# dense participants x chores matrix of counters stored row by row in an
+# array. Dictionaries map the participant and chore names to their positions.
+#
+# The log can be read like the nested dictionary
+#
+# {"fred" : {"chore1": 0, "chore2": 0}, walt : {"chore1": 0, "chore2": 0}}
+#
+# but it cannot be changed through that view. Use increment to add to a count.
+#
+class ChoreLog(Mapping) :
+
+    __slots__ = ("_participant_names", "_chore_names", "_participant_index", "_chore_index",
+                 "_number_of_chores", "_counts", "_version")
+
+    ## Constructor for the ChoreLog class. All the counts start at zero.
+    #
+    # @param participant_names a sequence of participant names, one per row
+    # @param chore_names a sequence of chore names, one per column
+    # @param chore_index an optional dictionary of the chore names and their
+    #        columns, for example ChoresList.positions. It is not copied.
+    #
+    def __init__(self, participant_names, chore_names, chore_index = None) :
+        self._participant_names = tuple(participant_names)
+        self._chore_names = tuple(chore_names)
+        if chore_index is None :
+            chore_index = {name : position for position, name in enumerate(self._chore_names)}
+        self._chore_index = chore_index
+        self._participant_index = {name : position for position, name in enumerate(self._participant_names)}
+        self._number_of_chores = len(self._chore_names)
+        self._counts = array("l", [0]) * (len(self._participant_names) * self._number_of_chores)
+        self._version = 0
+
+
+    ## Return the participant names in row order.
+    #
+    @property
+    def participant_names(self) :
+        return self._participant_names
+
+
+    ## Return the chore names in column order.
+    #
+    @property
+    def chore_names(self) :
+        return self._chore_names
+
+
+    ## Return the array of counts, stored row by row.
+    #
+    @property
+    def counts(self) :
+        return self._counts
+
+
+    ## Return a number which changes every time a count changes. It can be
+    #  used to tell whether something worked out from the log is out of date.
+    #
+    @property
+    def version(self) :
+        return self._version
+
+
+    ## Return the dictionary which maps participant names to rows.
+    #
+    @property
+    def participant_index(self) :
+        return self._participant_index
+
+
+    ## Return the dictionary which maps chore names to columns.
+    #
+    @property
+    def chore_index(self) :
+        return self._chore_index
+
+
+    ## Return the row of the matrix used for a participant.
+    #  @exception ValueError raised if the participant is not in the log
+    #
+    def participant_position(self, name) :
+        try :
+            return self._participant_index[name]
+        except KeyError :
+            raise ValueError("{} is not a participant in this household.".format(name))
+
+
+    ## Return the column of the matrix used for a chore.
+    #  @exception ValueError raised if the chore is not in the log
+    #
+    def chore_position(self, chore) :
+        try :
+            return self._chore_index[chore]
+        except KeyError :
+            raise ValueError("{} is not a chore in this household.".format(chore))
+
+
+    ## Return the number of times a participant has completed a chore.
+    #
+    def count(self, name, chore) :
+        return self._counts[self.participant_position(name) * self._number_of_chores
+                            + self.chore_position(chore)]
+
+
+    ## Adds to the number of times a participant has completed a chore.
+    #
+    # @param name the participant's name
+    # @param chore the chore name
+    # @param number_completed the number to add on to the existing total
+    # @return the new total
+    #
+    def increment(self, name, chore, number_completed) :
+        cell = self.participant_position(name) * self._number_of_chores + self.chore_position(chore)
+        self._counts[cell] += number_completed
+        self._version += 1
+        return self._counts[cell]
+
+
+    ## Adds to many counts at once.
+    #
+    # @param totals a dictionary where the keys are positions in the counts
+    #        array and the values are the numbers to add
+    #
+    def add_to_cells(self, totals) :
+        counts = self._counts
+        for cell, number_completed in totals.items() :
+            counts[cell] += number_completed
+        self._version += 1
+
+
+    def __getitem__(self, name) :
+        if name not in self._participant_index :
+            raise KeyError(name)
+        return _ChoreLogRow(self, self._participant_index[name])
+
+
+    def __iter__(self) :
+        return iter(self._participant_names)
+
+
+    def __len__(self) :
+        return len(self._participant_names)
+
+
+    def __repr__(self) :
+        return repr({name : dict(row) for name, row in self.items()})
+
+
+## A read-only view of one participant's row in a ChoreLog.
+#
+class _ChoreLogRow(Mapping) :
+
+    __slots__ = ("_chore_log", "_start")
+
+    def __init__(self, chore_log, row) :
+        self._chore_log = chore_log
+        self._start = row * chore_log._number_of_chores
+
+
+    def __getitem__(self, chore) :
+        if chore not in self._chore_log._chore_index :
+            raise KeyError(chore)
+        return self._chore_log._counts[self._start + self._chore_log._chore_index[chore]]
+
+
+    def __iter__(self) :
+        return iter(self._chore_log._chore_names)
+
+
+    def __len__(self) :
+        return self._chore_log._number_of_chores
+
+
+    def __repr__(self) :
+        return repr(dict(self))
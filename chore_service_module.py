@@ -0,0 +1,408 @@
+##
+#  A local asyncio service for the chore chart.
+#
+#  Clients connect over TCP and send one JSON object per line. Each request
+#  gets one JSON object per line in reply. The operations are:
+#
+#  {"op": "create", "household": "House1", "participants": ["fred", "walt"],
+#   "chores": [["wash up", 4], ["dusting", 1]]}
+#  {"op": "view", "household": "House1"}
+#  {"op": "log", "household": "House1", "name": "fred", "chore": "wash up", "number": 2}
+#  {"op": "log", "household": "House1", "rows": [["fred", "wash up", 2], ...]}
+#  {"op": "leaderboard", "household": "House1", "k": 3}
+#
+#  A reply is {"ok": true, ...} or {"ok": false, "error": "..."}.
+#
+#  The households and completed chores are kept in the same storage as the
+#  chore chart (see storage_module), so the service, the menu and the batch
+#  commands all see the same data. Storage is written by one writer thread,
+#  in the order the requests were carried out, so a slow write does not hold
+#  up the event loop. A request is replied to once its write has finished.
+#
+#  The module also contains a load generator which measures the throughput
+#  and latency of a running service:
+#
+#  python chore_service_module.py serve --port 8765
+#  python chore_service_module.py load --port 8765 --connections 2000
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from household_module import Household
+from chores_list_module import Chore
+from config_module import configure, limits_for
+from household_registry_module import HouseholdRegistry
+from storage_module import DEFAULT_STORAGE, STORAGE_KINDS, open_storage
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+LISTEN_BACKLOG = 4096
+MAXIMUM_REQUEST_LENGTH = 1024 * 1024
+
+
+## Reads and discards the rest of a line which is longer than the stream's
+#  limit, so that the next request can be read.
+#
+async def _discard_line(reader) :
+    while True :
+        try :
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as err :
+            # consumed is the length of the data before the separator, or of
+            # the data read so far if it has not been found
+            await reader.readexactly(err.consumed)
+
+
+class ChoreService() :
+
+    ## Constructor for the ChoreService class.
+    #
+    # @param registry the HouseholdRegistry which holds the households
+    # @param storage an optional Storage object which new households and
+    #        completed chores are recorded in
+    #
+    def __init__(self, registry = None, storage = None) :
+        if registry is None :
+            registry = HouseholdRegistry()
+        self.registry = registry
+        self.storage = storage
+        self._writer = None if storage is None else ThreadPoolExecutor(1, thread_name_prefix = "storage")
+        self._operations = {"create" : self.create, "view" : self.view,
+                            "log" : self.log, "leaderboard" : self.leaderboard}
+
+
+    ## Return the household named in a request.
+    # @exception ValueError raised if the household does not exist
+    #
+    def _household(self, request) :
+        household = self.registry.get(request.get("household"))
+        if household is None :
+            raise ValueError("Household {} does not exist.".format(request.get("household")))
+        return household
+
+
+    ## Writes to storage in the writer thread.
+    #
+    # @param function the Storage method
+    # @return an asyncio future which is done when the write has finished
+    #
+    def _write(self, function, *arguments) :
+        return asyncio.get_running_loop().run_in_executor(self._writer, function, *arguments)
+
+
+    async def create(self, request) :
+        household_name = request["household"]
+        if household_name in self.registry :
+            raise ValueError("Household {} already exists.".format(household_name))
+        chores = set()
+        for chore_name, frequency in request["chores"] :
+            chores.add(Chore(chore_name, int(frequency)))
+        household = Household(household_name, set(request["participants"]), chores,
+                              limits_for(household_name))
+        # the household is added before it is written, so that the name cannot
+        # be taken by another request while the write is waiting
+        self.registry.add(household)
+        if self.storage is not None :
+            try :
+                await self._write(self.storage.add, household)
+            except ValueError :
+                self.registry.remove(household_name)
+                raise
+        return {"household" : household_name}
+
+
+    async def view(self, request) :
+        household = self._household(request)
+        chores = household.chores
+        return {"household" : household.household_name,
+                "participants" : sorted(household.participants.participants),
+                "chores" : [[name, chores.get(name).frequency] for name in chores.names],
+                "chore_log" : {name : dict(row) for name, row in household.chore_log.items()}}
+
+
+    async def log(self, request) :
+        household = self._household(request)
+        if "rows" in request :
+            result = household.update_log_many(request["rows"])
+            if result.applied > 0 and self.storage is not None :
+                await self._write(self.storage.record, household.household_name, request["rows"])
+            return {"applied" : result.applied, "rejected" : result.rejected}
+        household.update_log(request["name"], request["chore"], request["number"])
+        if self.storage is not None :
+            await self._write(self.storage.record, household.household_name,
+                              [(request["name"], request["chore"], request["number"])])
+        return {"applied" : 1, "rejected" : 0}
+
+
+    async def leaderboard(self, request) :
+        household = self._household(request)
+        return {"leaderboard" : household.leaderboard.top(request.get("k"))}
+
+
+    ## Carries out one request.
+    #
+    # @param request a dictionary decoded from the JSON request
+    # @return a dictionary to be sent as the reply
+    #
+    async def handle_request(self, request) :
+        try :
+            operation = self._operations[request["op"]]
+        except (KeyError, TypeError) :
+            return {"ok" : False, "error" : "Unknown operation."}
+        try :
+            reply = await operation(request)
+        except (KeyError, TypeError, ValueError) as err :
+            return {"ok" : False, "error" : str(err).strip()}
+        reply["ok"] = True
+        return reply
+
+
+    ## Serves one client until it disconnects.
+    #
+    async def handle_connection(self, reader, writer) :
+        try :
+            while True :
+                try :
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as err :
+                    # the last request may not end with a newline
+                    line = err.partial
+                except asyncio.LimitOverrunError :
+                    await _discard_line(reader)
+                    writer.write(json.dumps({"ok" : False, "error" : "The request is longer than {} bytes."
+                                             .format(MAXIMUM_REQUEST_LENGTH)}).encode("utf-8") + b"\n")
+                    await writer.drain()
+                    continue
+                if not line :
+                    break
+                try :
+                    request = json.loads(line)
+                except (ValueError, RecursionError) :
+                    # a request which is nested too deeply cannot be decoded either
+                    reply = {"ok" : False, "error" : "The request is not valid JSON."}
+                else :
+                    reply = await self.handle_request(request)
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) :
+            pass
+        finally :
+            writer.close()
+            try :
+                await writer.wait_closed()
+            except ConnectionError :
+                pass
+
+
+    ## Starts the service.
+    # @return an asyncio Server object
+    #
+    async def start(self, host = DEFAULT_HOST, port = DEFAULT_PORT) :
+        return await asyncio.start_server(self.handle_connection, host, port,
+                                          backlog = LISTEN_BACKLOG, limit = MAXIMUM_REQUEST_LENGTH)
+
+
+    ## Waits for the writes which have been started and stops the writer
+    #  thread. This must be done before the storage is closed.
+    #
+    def close(self) :
+        if self._writer is not None :
+            self._writer.shutdown()
+
+
+## Return a percentile of a sorted list of numbers.
+#
+def _percentile(sorted_values, percent) :
+    if not sorted_values :
+        return 0.0
+    position = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[position]
+
+
+## Measures the throughput and latency of a running service. Every
+#  connection sends its requests one after another, logging chores and
+#  reading leaderboards for households which it creates first.
+#
+# @param host the host of the service
+# @param port the port of the service
+# @param connections the number of connections open at the same time
+# @param requests_per_connection the number of requests each connection sends
+# @return a dictionary containing the number of requests, the requests per
+#         second and the p50 and p99 latencies in milliseconds
+#
+async def run_load(host = DEFAULT_HOST, port = DEFAULT_PORT, connections = 100,
+                   requests_per_connection = 50) :
+    latencies = []
+    errors = 0
+
+    async def client(number) :
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port, limit = MAXIMUM_REQUEST_LENGTH)
+        household_name = "L{:07d}".format(number)
+        requests = [{"op" : "create", "household" : household_name,
+                     "participants" : ["personA", "personB", "personC"],
+                     "chores" : [["wash up", 4], ["dusting", 1]]}]
+        for request_number in range(requests_per_connection - 1) :
+            if request_number % 4 == 3 :
+                requests.append({"op" : "leaderboard", "household" : household_name, "k" : 3})
+            else :
+                requests.append({"op" : "log", "household" : household_name, "name" : "personB",
+                                 "chore" : "wash up", "number" : 1 + request_number % 5})
+        try :
+            for request in requests :
+                start = time.perf_counter()
+                writer.write(json.dumps(request).encode("utf-8") + b"\n")
+                await writer.drain()
+                reply = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - start)
+                if not reply["ok"] and request["op"] != "create" :
+                    errors += 1
+        finally :
+            writer.close()
+            await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {"requests" : len(latencies), "errors" : errors,
+            "requests_per_second" : len(latencies) / elapsed,
+            "p50_ms" : _percentile(latencies, 50) * 1000,
+            "p99_ms" : _percentile(latencies, 99) * 1000}
+
+
+async def _serve(host, port, storage_kind, store_name, journal_name) :
+    registry = HouseholdRegistry()
+    with open_storage(storage_kind, store_name, journal_name) as storage :
+        for household in storage.households() :
+            if household.household_name not in registry :
+                registry.add(household)
+                try :
+                    storage.restore(household)
+                except ValueError as err :
+                    print(err)
+        service = ChoreService(registry, storage)
+        try :
+            server = await service.start(host, port)
+            print("Serving {} households on {}:{}".format(len(registry), host, port))
+            async with server :
+                await server.serve_forever()
+        finally :
+            service.close()
+
+
+## Starts a service on a free port and runs the load generator against it.
+#
+async def _self_test(connections, requests_per_connection) :
+    service = ChoreService()
+    server = await service.start(DEFAULT_HOST, 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server :
+        results = await run_load(DEFAULT_HOST, port, connections, requests_per_connection)
+        reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+        for request in ({"op" : "view", "household" : "L0000000"},
+                        {"op" : "log", "household" : "L0000000", "name" : "personZ",
+                         "chore" : "wash up", "number" : 1},
+                        {"op" : "leaderboard", "household" : "Nowhere"}) :
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            print("\t", json.loads(await reader.readline()))
+        writer.write(b"[" + b"0," * MAXIMUM_REQUEST_LENGTH + b"0]\n")
+        writer.write(json.dumps({"op" : "leaderboard", "household" : "L0000000", "k" : 1}).encode("utf-8") + b"\n")
+        print("\t", json.loads(await reader.readline()), json.loads(await reader.readline()))
+        writer.write(b"[" * 100000 + b"]" * 100000 + b"\n")
+        print("\t", json.loads(await reader.readline()))
+        writer.close()
+        await writer.wait_closed()
+        # Let the service see that the connection has closed.
+        await asyncio.sleep(0.1)
+    return results
+
+
+## Runs a service with storage, then opens the storage again and returns the
+#  leaderboard it holds.
+#
+async def _storage_test(storage_kind, store_name) :
+    with open_storage(storage_kind, store_name, store_name) as storage :
+        service = ChoreService(HouseholdRegistry(), storage)
+        server = await service.start(DEFAULT_HOST, 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server :
+            reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+            for request in ({"op" : "create", "household" : "House1", "participants" : ["personA", "personB"],
+                             "chores" : [["wash up", 4], ["dusting", 1]]},
+                            {"op" : "log", "household" : "House1", "name" : "personA",
+                             "chore" : "wash up", "number" : 2},
+                            {"op" : "log", "household" : "House1", "rows" : [["personB", "dusting", 3]]}) :
+                writer.write(json.dumps(request).encode("utf-8") + b"\n")
+                await reader.readline()
+            writer.close()
+            await writer.wait_closed()
+            # Let the service see that the connection has closed.
+            await asyncio.sleep(0.1)
+        service.close()
+    with open_storage(storage_kind, store_name, store_name) as storage :
+        return storage.leaderboard("House1")
+
+
+## main method
+#
+# With no arguments this contains some simple tests.
+#
+def main():
+    parser = argparse.ArgumentParser(description = "Chore chart service")
+    subcommands = parser.add_subparsers(dest = "command")
+    serve_parser = subcommands.add_parser("serve", help = "run the service")
+    serve_parser.add_argument("--host", default = DEFAULT_HOST)
+    serve_parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    serve_parser.add_argument("--storage", choices = STORAGE_KINDS, default = DEFAULT_STORAGE)
+    serve_parser.add_argument("--store", default = "Households",
+                              help = "the households file, without its extension")
+    serve_parser.add_argument("--journal", default = None,
+                              help = "the chore journal, without its extension")
+    load_parser = subcommands.add_parser("load", help = "measure a running service")
+    load_parser.add_argument("--host", default = DEFAULT_HOST)
+    load_parser.add_argument("--port", type = int, default = DEFAULT_PORT)
+    load_parser.add_argument("--connections", type = int, default = 1000)
+    load_parser.add_argument("--requests", type = int, default = 50)
+    arguments = parser.parse_args()
+
+    if arguments.command == "serve" :
+        try :
+            # the size limits are read from the configuration file, as they are by the chart
+            configure()
+        except ValueError as err :
+            print(err)
+            print("Please correct the configuration file and start the service again.")
+            sys.exit(1)
+        asyncio.run(_serve(arguments.host, arguments.port, arguments.storage, arguments.store,
+                           arguments.journal))
+    elif arguments.command == "load" :
+        print(json.dumps(asyncio.run(run_load(arguments.host, arguments.port,
+                                              arguments.connections, arguments.requests))))
+    else :
+        print("Test 1: Run the load generator against a local service")
+        try:
+            print("\n\tVALID: ", asyncio.run(_self_test(200, 20)))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory :
+            for storage_kind in STORAGE_KINDS :
+                print("\nTest: Write to {} storage from the writer thread".format(storage_kind))
+                try:
+                    print("\n\tVALID: ", asyncio.run(_storage_test(storage_kind,
+                                                                   os.path.join(directory, storage_kind))))
+                except Exception as err:
+                    print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,61 @@
+import sys
+import weakref
+
+from validation_module import chore_name_error
+from rendering_module import render_chores
+
 class ChoresList() :
+
+    # Alongside the set of chores the list keeps:
+    #  _index      a dictionary of chore names and Chore objects
+    #  _names      the chore names in sorted order, which is the order of the
+    #              columns in the chore log
+    #  _positions  a dictionary of chore names and their position in _names
+    __slots__ = ("_chores", "_index", "_names", "_positions")
     
     MINIMUM_NUMBER_OF_CHORES = 2
     MAXIMUM_NUMBER_OF_CHORES = 5
 
-    def __init__(self, the_chores) :
-        self.chores = the_chores
+    # Lists with the same chore names share _names and _positions, which are
+    # never changed. At most MAXIMUM_SHARED_POSITIONS sets of names are shared.
+    MAXIMUM_SHARED_POSITIONS = 4096
+    _shared_positions = {}
+
+    ## Constructor for the ChoresList class.
+    #  @param the_chores a set of Chore objects
+    #  @param limits an optional Limits object used instead of the class
+    #         constants to check the number of chores
+    #
+    def __init__(self, the_chores, limits = None) :
+        if limits is None :
+            self.chores = the_chores
+        else :
+            self.valid_chores(the_chores, limits)
+            self._chores = the_chores
+            self._build_index()
+
+    ## Alternative constructor for chores which have already been validated,
+    #  for example by a loader. The chores are not checked again.
+    #  @param the_chores a set of Chore objects
+    #
+    @classmethod
+    def from_validated(cls, the_chores) :
+        chores_list = cls.__new__(cls)
+        chores_list._chores = the_chores
+        chores_list._build_index()
+        return chores_list
+
+    ## Rebuilds the index, the names and the positions from the set of chores.
+    #
+    def _build_index(self) :
+        self._index = {chore.chore_name : chore for chore in self._chores}
+        names = tuple(sorted(self._index))
+        shared = ChoresList._shared_positions.get(names)
+        if shared is None :
+            shared = (names, {name : position for position, name in enumerate(names)})
+            if len(ChoresList._shared_positions) < ChoresList.MAXIMUM_SHARED_POSITIONS :
+                ChoresList._shared_positions[names] = shared
+        self._names, self._positions = shared
 
     ## Return the chores attribute.
     #          
@@ -22,62 +73,101 @@ class ChoresList() :
         try :
             self.valid_chores(the_chores)
             self._chores = the_chores
+            self._build_index()
         except ValueError as err :
             raise
 
+    ## Return the chore names in the order of the columns of the chore log.
+    #
+    @property
+    def names(self):
+        return self._names
+
+    ## Return the dictionary of chore names and their positions in names.
+    #
+    @property
+    def positions(self):
+        return self._positions
+
+    ## Return the chore with a given name.
+    #
+    # @param chore_name the name of the chore
+    # @return the Chore object or None if there is no chore with that name
+    def get(self, chore_name) :
+        return self._index.get(chore_name)
+
+    ## Return the position of a chore in names.
+    #
+    # @param chore_name the name of the chore
+    # @exception ValueError raised if there is no chore with that name
+    def index(self, chore_name) :
+        try :
+            return self._positions[chore_name]
+        except KeyError :
+            raise ValueError("{} is not a chore in this household.".format(chore_name))
+
+    ## Check whether a chore, given as a Chore or its name, is in the list.
+    #
+    def __contains__(self, chore) :
+        if isinstance(chore, Chore) :
+            chore = chore.chore_name
+        return chore in self._index
+
+    def __len__(self) :
+        return len(self._chores)
+
+    def __iter__(self) :
+        return iter(self._chores)
+
     def __str__(self):
-        length = len(self.chores)
-        i = 1
-        chore_string = ""
-        for chore in self.chores :
-            chore_string = chore_string + str(chore)
-            if i < length :
-                chore_string = chore_string + ", "
-            i = i + 1
-            
-        return chore_string
+        return render_chores(self.chores)
 
     ## Check whether a chore name exists in the set of chores.
     #
     # @param chore_name
     # @return True if the chore name exists in the set, False if it does not.
     def chore_exists(self, chore_name) :
-        found = False
-        for chore in self.chores :
-            if chore_name == chore.chore_name :
-                found = True
-                
-        return found
+        return chore_name in self._index
 
 
     ## Check the set of chores.
     # Verifies that the set of chores is a valid length.
     # 
     # @param chores the set of chores to be validated
+    # @param limits an optional Limits object
     # @return True if the set conforms to the validation conditions
     #         and raise exception if it does not.
     #
     @staticmethod
-    def valid_chores(the_chores) :
+    def valid_chores(the_chores, limits = None) :
         # check that the_chores is a set
         if not isinstance(the_chores, set) :
             raise TypeError("List of chores is not a set.")
                 
         try :
-            ChoresList.is_valid_length(the_chores)
+            ChoresList.is_valid_length(the_chores, limits)
             ChoresList.is_valid_chores(the_chores)
         except ValueError as err :
             raise
         
         return True
         
+    ## Check the number of chores in the set is the right length.
+    #
+    # @param limits an optional Limits object used instead of the class constants
+    #
     @staticmethod        
-    def is_valid_length(the_chores) :    
-        if len(the_chores) < ChoresList.MINIMUM_NUMBER_OF_CHORES or \
-            len(the_chores) > ChoresList.MAXIMUM_NUMBER_OF_CHORES :
+    def is_valid_length(the_chores, limits = None) :    
+        if limits is None :
+            minimum = ChoresList.MINIMUM_NUMBER_OF_CHORES
+            maximum = ChoresList.MAXIMUM_NUMBER_OF_CHORES
+        else :
+            minimum = limits.minimum_number_of_chores
+            maximum = limits.maximum_number_of_chores
+        if len(the_chores) < minimum or len(the_chores) > maximum :
             raise ValueError(("\n\t\tThe number of chores" + 
                " must be more than {} and less than {}.")
-               .format(ChoresList.MINIMUM_NUMBER_OF_CHORES - 1, ChoresList.MAXIMUM_NUMBER_OF_CHORES + 1))
+               .format(minimum - 1, maximum + 1))
         # If we reached this point then the checks passed
         return True
     
@@ -94,22 +184,26 @@ class ChoresList() :
     ## Check whether a chore name exists in a set of chores.
     #
     # @param chore_name the name of the chore
-    # @param the_chores the set of chores
+    # @param the_chores the set of chores or a ChoresList. A ChoresList is
+    #        checked using its index.
     # @return True if the set does not contain a chore with the name chore_name
     #         and raise exception if it does.
     #
     @staticmethod    
     def is_unique(chore_name, the_chores) :
-        if not isinstance(the_chores, set) :
+        if isinstance(the_chores, ChoresList) :
+            found = the_chores.chore_exists(chore_name)
+        elif not isinstance(the_chores, set) :
             raise TypeError("The ChoreList is not a set.")
+        else :
+            found = False
         
-        found = False
-        
-        for chore in the_chores :
-            if not isinstance(chore, Chore) :
-                raise TypeError("The ChoreList does not contain objects which are Chores.")
-            if chore_name == chore.chore_name :
-                found = True
+            for chore in the_chores :
+                if not isinstance(chore, Chore) :
+                    raise TypeError("The ChoreList does not contain objects which are Chores.")
+                if chore_name == chore.chore_name :
+                    found = True
+                    break
 
         if found :
             raise ValueError("\t\tChore: {} already exists in the set".format(chore_name))
@@ -119,6 +213,13 @@ class ChoresList() :
         
 class Chore():
 
+    # Chores are shared between households, so the instances are kept small.
+    __slots__ = ("_chore_name", "_frequency", "__weakref__")
+
+    # The shared Chore objects, keyed by (name, frequency). An entry is
+    # removed when no household uses the chore any more.
+    _shared_chores = weakref.WeakValueDictionary()
+
     ## Constants used for validation
     MINIMUM_NAME_LENGTH = 3     # Used to validate team member's name, household name and chore name
     MAXIMUM_NAME_LENGTH = 20
@@ -130,6 +231,29 @@ class Chore():
         self.chore_name = the_chore_name
         self.frequency = the_frequency
 
+    ## Alternative constructor for a chore name and frequency which have
+    #  already been validated. They are not checked again.
+    #
+    @classmethod
+    def from_validated(cls, the_chore_name, the_frequency) :
+        chore = cls.__new__(cls)
+        chore._chore_name = sys.intern(the_chore_name)
+        chore._frequency = the_frequency
+        return chore
+
+    ## Return a shared Chore object for a chore name and frequency which have
+    #  already been validated. Households with the same chore use the same
+    #  object, so a shared chore must not be changed.
+    #
+    @classmethod
+    def shared(cls, the_chore_name, the_frequency) :
+        key = (the_chore_name, the_frequency)
+        chore = Chore._shared_chores.get(key)
+        if chore is None :
+            chore = cls.from_validated(the_chore_name, the_frequency)
+            Chore._shared_chores[key] = chore
+        return chore
+
     ## Return the chore name.
     #          
     @property
@@ -143,7 +267,7 @@ class Chore():
     def chore_name(self, the_chore_name) :
         try :
             self.is_valid_chore_name(the_chore_name)
-            self._chore_name = the_chore_name
+            self._chore_name = sys.intern(the_chore_name)
         except ValueError as err :
             raise 
 
@@ -190,19 +314,10 @@ class Chore():
     #
     @staticmethod
     def is_valid_chore_name(name) :
-        if len(name) < Chore.MINIMUM_NAME_LENGTH \
-            or len(name) > Chore.MAXIMUM_NAME_LENGTH :
-            raise ValueError(("Chore name: {}, is not valid. It should be: " +
-                         "more than {} characters long " +
-                         "and less than {} characters long.")
-                .format(name, Chore.MINIMUM_NAME_LENGTH, Chore.MAXIMUM_NAME_LENGTH))
-
-        name_list = name.split()    
-
-        for word in name_list :
-            if not word.isalnum():
-               raise ValueError(("{}, is not valid. All words in the chore name should be " +
-                                 "alphanumeric.").format(word)) 
+        message = chore_name_error(name, Chore.MINIMUM_NAME_LENGTH, Chore.MAXIMUM_NAME_LENGTH)
+        if message is not None :
+            raise ValueError(message)
+        return True
             
 
     ##  Checks whether the chore frequency is greater than or equal to the minimum frequency
@@ -264,7 +379,16 @@ def main() :
     except Exception as err:
         print("\tERROR: ", err)       
 
-    print("\nTest 4: Create a chore list with duplicate entries")    
+    print("\nTest 4: Look up chores by name")    
+    try:
+        cl1 = ChoresList(set([Chore("wash up", 4), Chore("vacuum stairs", 2), Chore("dusting", 1)]))
+        print("\n\tVALID: ", cl1.get("dusting"), "wash up" in cl1, Chore("mop", 1) in cl1,
+              cl1.index("vacuum stairs"), cl1.names)
+        ChoresList.is_unique("dusting", cl1)
+    except Exception as err:
+        print("\tERROR: ", err)    
+
+    print("\nTest 5: Create a chore list with duplicate entries")    
     try:
         c1 = Chore("wash up", 4)
         c2 = Chore("vacuum stairs", 2)
@@ -0,0 +1,220 @@
+##
+#  Thread-safe access to a registry of households.
+#
+#  Each household is guarded by one of a fixed number of locks, chosen by the
+#  hash of the household name (lock striping). Updates to households which
+#  use different locks do not wait for each other, and a reader holding a
+#  household's lock sees a consistent chore log and leaderboard.
+
+import threading
+
+from household_module import BatchResult
+from household_registry_module import HouseholdRegistry
+from scoring_module import score_households
+
+DEFAULT_NUMBER_OF_STRIPES = 64
+
+
+class ConcurrentRegistry() :
+
+    ## Constructor for the ConcurrentRegistry class.
+    #
+    # @param registry the HouseholdRegistry to guard. A new registry is
+    #        created if it is None.
+    # @param number_of_stripes the number of household locks
+    #
+    def __init__(self, registry = None, number_of_stripes = DEFAULT_NUMBER_OF_STRIPES) :
+        if registry is None :
+            registry = HouseholdRegistry()
+        self._registry = registry
+        self._registry_lock = threading.Lock()
+        self._stripes = [threading.Lock() for stripe in range(number_of_stripes)]
+
+
+    ## Return the lock which guards a household.
+    #
+    def lock_for(self, household_name) :
+        return self._stripes[hash(household_name) % len(self._stripes)]
+
+
+    def __len__(self) :
+        return len(self._registry)
+
+
+    def __contains__(self, household_name) :
+        return household_name in self._registry
+
+
+    ## Return the household with a given name, or None if it does not exist.
+    #  The household must only be changed while holding lock_for its name.
+    #
+    def get(self, household_name) :
+        return self._registry.get(household_name)
+
+
+    ## Return a list of the household names.
+    #
+    def names(self) :
+        with self._registry_lock :
+            return list(self._registry.names())
+
+
+    ## Adds a household.
+    # @exception ValueError raised if a household with the same name exists
+    #
+    def add(self, household) :
+        with self._registry_lock :
+            self._registry.add(household)
+
+
+    ## Removes a household.
+    # @exception KeyError raised if the household does not exist
+    #
+    def remove(self, household_name) :
+        with self._registry_lock, self.lock_for(household_name) :
+            return self._registry.remove(household_name)
+
+
+    ## Return the household with a given name.
+    # @exception ValueError raised if the household does not exist
+    #
+    def _household(self, household_name) :
+        household = self._registry.get(household_name)
+        if household is None :
+            raise ValueError("Household {} does not exist.".format(household_name))
+        return household
+
+
+    ## Logs a completion for one household.
+    #
+    # @exception ValueError raised if the household, participant or chore
+    #            does not exist or the number completed is out of range
+    #
+    def update_log(self, household_name, name, chore, number_completed) :
+        household = self._household(household_name)
+        with self.lock_for(household_name) :
+            household.update_log(name, chore, number_completed)
+
+
+    ## Logs completions for many households. Each household's rows are applied
+    #  together while holding its lock.
+    #
+    # @param rows an iterable of (household_name, name, chore, number_completed) tuples
+    # @return a dictionary of household names and BatchResult objects
+    #
+    def log_many(self, rows) :
+        rows_each_household = {}
+        for row in rows :
+            rows_each_household.setdefault(row[0], []).append(row[1:])
+
+        results = {}
+        for household_name, household_rows in rows_each_household.items() :
+            household = self._registry.get(household_name)
+            if household is None :
+                results[household_name] = BatchResult(0, len(household_rows))
+                continue
+            with self.lock_for(household_name) :
+                results[household_name] = household.update_log_many(household_rows)
+        return results
+
+
+    ## Return a copy of a household's leaderboard.
+    #
+    # @param k the number of leaders to return, or None for everyone
+    # @return a list of (name, points) tuples with the most points first
+    #
+    def leaderboard_snapshot(self, household_name, k = None) :
+        household = self._household(household_name)
+        with self.lock_for(household_name) :
+            return household.leaderboard.top(k)
+
+
+    ## Return a copy of a household's chore log as a dictionary of dictionaries.
+    #
+    def chore_log_snapshot(self, household_name) :
+        household = self._household(household_name)
+        with self.lock_for(household_name) :
+            return {name : dict(row) for name, row in household.chore_log.items()}
+
+
+    ## Scores every household while holding all the locks, so that the scores
+    #  are a consistent snapshot of every household at the same moment.
+    #
+    # @return a Scores object
+    #
+    def score_all(self) :
+        with self._registry_lock :
+            for lock in self._stripes :
+                lock.acquire()
+            try :
+                return score_households(self._registry)
+            finally :
+                for lock in reversed(self._stripes) :
+                    lock.release()
+
+
+## main method
+#
+# Contains a multithreaded stress test which checks that no completions are lost.
+#
+def main():
+    import random
+    from household_module import Household
+    from chores_list_module import Chore
+
+    number_of_threads = 16
+    updates_per_thread = 5000
+    registry = ConcurrentRegistry(number_of_stripes = 8)
+    for number in range(20) :
+        registry.add(Household("House{}".format(number), {"personA","personB","personC"},
+                               {Chore("wash up", 4), Chore("dusting", 1), Chore("empty bin", 2)}))
+    names = registry.names()
+    expected = {name : 0 for name in names}
+    expected_lock = threading.Lock()
+
+    def worker(seed) :
+        generator = random.Random(seed)
+        logged = {}
+        for update in range(updates_per_thread) :
+            household_name = generator.choice(names)
+            number_completed = generator.randint(1, 5)
+            if update % 10 == 0 :
+                registry.log_many([(household_name, "personB", "dusting", number_completed)])
+            else :
+                registry.update_log(household_name, generator.choice(["personA", "personB", "personC"]),
+                                    generator.choice(["wash up", "dusting", "empty bin"]), number_completed)
+            registry.leaderboard_snapshot(generator.choice(names), 1)
+            logged[household_name] = logged.get(household_name, 0) + number_completed
+        with expected_lock :
+            for household_name, total in logged.items() :
+                expected[household_name] += total
+
+    print("Test 1: Log chores from {} threads".format(number_of_threads))
+    try:
+        threads = [threading.Thread(target = worker, args = (seed,)) for seed in range(number_of_threads)]
+        for thread in threads :
+            thread.start()
+        for thread in threads :
+            thread.join()
+
+        lost = 0
+        for household_name in names :
+            chore_log = registry.chore_log_snapshot(household_name)
+            logged = sum(sum(row.values()) for row in chore_log.values())
+            lost += expected[household_name] - logged
+            household = registry.get(household_name)
+            weights = dict(zip(household.chore_log.chore_names, household.chore_weights))
+            points = {name : sum(count * weights[chore] for chore, count in row.items())
+                      for name, row in chore_log.items()}
+            if points != dict(registry.leaderboard_snapshot(household_name)) :
+                raise ValueError("The leaderboard for {} does not match its chore log.".format(household_name))
+        if lost != 0 :
+            raise ValueError("{} completions were lost.".format(lost))
+        print("\n\tVALID:  {} completions logged, none lost".format(sum(expected.values())))
+        print("\tVALID: ", registry.score_all().global_ranking(3))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
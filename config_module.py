@@ -0,0 +1,306 @@
+##
+#  Configurable size limits.
+#
+#  The limits are read from the [limits] section of an INI file, for example:
+#
+#  [limits]
+#  maximum_household_size = 1000
+#  maximum_number_of_chores = 100
+#
+#  [household Tower1]
+#  maximum_household_size = 400
+#
+#  The file is named by the CHORE_CHART_CONFIG environment variable, or is
+#  chore_chart.ini in the current directory. Any limit which is not in the
+#  [limits] section keeps the value of the class constant, and any limit
+#  which is not in a [household NAME] section keeps the deployment's value.
+#
+#  The [limits] section is applied to the whole deployment, which changes
+#  the class constants. The limits of a [household NAME] section are given
+#  to that household when it is created and stored with it, so it is loaded
+#  with them even if the section is removed later; while the section is
+#  there, its limits are used instead of the stored ones (see limits_for).
+
+import configparser
+import os
+
+CONFIG_FILE_VARIABLE = "CHORE_CHART_CONFIG"
+DEFAULT_CONFIG_FILE = "chore_chart.ini"
+LIMITS_SECTION = "limits"
+HOUSEHOLD_SECTION_PREFIX = "household "
+
+# the limits of each household which has a section in the configuration file
+_household_limits = {}
+
+
+class Limits() :
+
+    __slots__ = ("minimum_household_size", "maximum_household_size",
+                 "minimum_number_of_chores", "maximum_number_of_chores",
+                 "minimum_chores_done", "maximum_chores_done")
+
+    ## Constructor for the Limits class.
+    #  @exception ValueError raised if a minimum is less than 1 or more than
+    #             its maximum
+    #
+    def __init__(self, minimum_household_size, maximum_household_size,
+                 minimum_number_of_chores, maximum_number_of_chores,
+                 minimum_chores_done, maximum_chores_done) :
+        for minimum, maximum in ((minimum_household_size, maximum_household_size),
+                                 (minimum_number_of_chores, maximum_number_of_chores),
+                                 (minimum_chores_done, maximum_chores_done)) :
+            if minimum < 1 or minimum > maximum :
+                raise ValueError("Limits must be at least 1 and a minimum cannot be more than its maximum.")
+        self.minimum_household_size = minimum_household_size
+        self.maximum_household_size = maximum_household_size
+        self.minimum_number_of_chores = minimum_number_of_chores
+        self.maximum_number_of_chores = maximum_number_of_chores
+        self.minimum_chores_done = minimum_chores_done
+        self.maximum_chores_done = maximum_chores_done
+
+
+    ## Return the limits currently set by the class constants.
+    #
+    @staticmethod
+    def current() :
+        from participants_list_module import Participants
+        from chores_list_module import ChoresList
+        from household_module import Household
+
+        return Limits(Participants.MINIMUM_HOUSEHOLD_SIZE, Participants.MAXIMUM_HOUSEHOLD_SIZE,
+                      ChoresList.MINIMUM_NUMBER_OF_CHORES, ChoresList.MAXIMUM_NUMBER_OF_CHORES,
+                      Household.MINIMUM_CHORES_DONE, Household.MAXIMUM_CHORES_DONE)
+
+
+    ## Return a copy of these limits with some of them changed.
+    #
+    # @param changes the limits to change, given as keyword arguments
+    #
+    def replace(self, **changes) :
+        values = {name : getattr(self, name) for name in Limits.__slots__}
+        values.update(changes)
+        return Limits(**values)
+
+
+    ## Return the limits in the order of the constructor's parameters, so
+    #  that Limits(*limits.values()) is equal to them.
+    #
+    def values(self) :
+        return tuple(getattr(self, name) for name in Limits.__slots__)
+
+
+    ## Sets the class constants to these limits so that they apply to every
+    #  household in the deployment.
+    #
+    def apply(self) :
+        from participants_list_module import Participants
+        from chores_list_module import ChoresList
+        from household_module import Household
+
+        Participants.MINIMUM_HOUSEHOLD_SIZE = self.minimum_household_size
+        Participants.MAXIMUM_HOUSEHOLD_SIZE = self.maximum_household_size
+        Household.MINIMUM_HOUSEHOLD_SIZE = self.minimum_household_size
+        Household.MAXIMUM_HOUSEHOLD_SIZE = self.maximum_household_size
+        ChoresList.MINIMUM_NUMBER_OF_CHORES = self.minimum_number_of_chores
+        ChoresList.MAXIMUM_NUMBER_OF_CHORES = self.maximum_number_of_chores
+        Household.MINIMUM_CHORES_DONE = self.minimum_chores_done
+        Household.MAXIMUM_CHORES_DONE = self.maximum_chores_done
+
+
+    def __eq__(self, other_limits) :
+        return isinstance(other_limits, Limits) and \
+            all(getattr(self, name) == getattr(other_limits, name) for name in Limits.__slots__)
+
+
+    def __repr__(self) :
+        return "Limits({})".format(", ".join("{}={}".format(name, getattr(self, name))
+                                             for name in Limits.__slots__))
+
+
+## Return the name of the configuration file which is used when none is given.
+#
+def config_file_name() :
+    return os.environ.get(CONFIG_FILE_VARIABLE, DEFAULT_CONFIG_FILE)
+
+
+## Return the limits of one section of a configuration file.
+#
+# @param config a ConfigParser which the file has been read into
+# @param section the name of the section
+# @param limits the Limits object whose values are kept for the limits which
+#        are not in the section
+# @param file_name the name of the file, for the error messages
+# @exception ValueError raised if a limit is not a whole number or the
+#            limits are not valid
+#
+def _section_limits(config, section, limits, file_name) :
+    changes = {}
+    for name in Limits.__slots__ :
+        if config.has_option(section, name) :
+            try :
+                changes[name] = config.getint(section, name)
+            except ValueError :
+                raise ValueError("{} in the [{}] section of {} must be a whole number, not {}."
+                                 .format(name, section, file_name, config.get(section, name)))
+    try :
+        return limits.replace(**changes)
+    except ValueError as err :
+        raise ValueError("The [{}] section of {}: {}".format(section, file_name, err))
+
+
+## Loads the limits from a configuration file.
+#
+# @param file_name the name of the file. If it is None the file named by the
+#        CHORE_CHART_CONFIG environment variable or chore_chart.ini is used.
+# @return a Limits object. If the file does not exist the current limits are
+#         returned.
+# @exception ValueError raised if a limit in the file is not valid
+#
+def load_limits(file_name = None) :
+    if file_name is None :
+        file_name = config_file_name()
+    limits = Limits.current()
+
+    config = configparser.ConfigParser()
+    if not config.read(file_name) or not config.has_section(LIMITS_SECTION) :
+        return limits
+    return _section_limits(config, LIMITS_SECTION, limits, file_name)
+
+
+## Loads the limits of single households from the [household NAME] sections
+#  of a configuration file.
+#
+# @param file_name the name of the file, or None for the default file
+# @param limits the deployment's Limits, which each section changes. If it
+#        is None the current limits are used.
+# @return a dictionary where the keys are household names and the values are
+#         Limits objects
+# @exception ValueError raised if a limit in the file is not valid
+#
+def load_household_limits(file_name = None, limits = None) :
+    if file_name is None :
+        file_name = config_file_name()
+    if limits is None :
+        limits = Limits.current()
+
+    config = configparser.ConfigParser()
+    config.read(file_name)
+    return {section[len(HOUSEHOLD_SECTION_PREFIX):].strip() :
+            _section_limits(config, section, limits, file_name)
+            for section in config.sections() if section.startswith(HOUSEHOLD_SECTION_PREFIX)}
+
+
+## Sets the limits of the households which have a section in the
+#  configuration file.
+#
+# @param household_limits a dictionary of household names and Limits objects
+#
+def set_household_limits(household_limits) :
+    global _household_limits
+    _household_limits = dict(household_limits)
+
+
+## Return a dictionary of the households which have a section in the
+#  configuration file and their Limits.
+#
+def get_household_limits() :
+    return dict(_household_limits)
+
+
+## Return the limits of a household: those of its section in the
+#  configuration file if it has one, or else the limits it was stored with.
+#
+# @param household_name the name of the household
+# @param stored_limits the Limits the household was stored with, or None
+# @return a Limits object, or None if the household uses the deployment's limits
+#
+def limits_for(household_name, stored_limits = None) :
+    return _household_limits.get(household_name, stored_limits)
+
+
+## Loads the configuration file and applies the limits it holds, to the
+#  deployment and to single households.
+#
+# @param file_name the name of the file, or None for the default file
+# @exception ValueError raised if a limit in the file is not valid. Nothing
+#            is applied.
+#
+def configure(file_name = None) :
+    limits = load_limits(file_name)
+    household_limits = load_household_limits(file_name, limits)
+    limits.apply()
+    set_household_limits(household_limits)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import tempfile
+    from household_module import Household
+    from chores_list_module import Chore
+
+    large_limits = Limits.current().replace(maximum_household_size = 1000, maximum_number_of_chores = 100)
+    participants = {"person{:04d}".format(number) for number in range(1000)}
+    chores = {Chore("chore {:03d}".format(number), 1 + number % 20) for number in range(100)}
+
+    print("Test 1: Load limits from a file")
+    try:
+        with tempfile.NamedTemporaryFile("w", suffix = ".ini", delete = False) as config_file :
+            config_file.write("[limits]\nmaximum_household_size = 1000\nmaximum_number_of_chores = 100\n")
+        limits = load_limits(config_file.name)
+        os.remove(config_file.name)
+        print("\n\tVALID: ", limits, limits == large_limits)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Create a household of 1000 participants with the default limits")
+    try:
+        h = Household("House1", participants, chores)
+        print("\tVALID: ", h)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 3: Create a household of 1000 participants and 100 chores with its own limits")
+    try:
+        h = Household("House1", participants, chores, large_limits)
+        h.update_log("person0999", "chore 099", 50)
+        print("\n\tVALID: ", h, h.leaderboard.top(1), len(h.chore_log_string().splitlines()))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 4: Create limits where a minimum is more than its maximum")
+    try:
+        print("\tVALID: ", Limits.current().replace(minimum_chores_done = 60))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 5: Load the limits of a single household")
+    try:
+        with tempfile.NamedTemporaryFile("w", suffix = ".ini", delete = False) as config_file :
+            config_file.write("[household Tower1]\nmaximum_household_size = 1000\n"
+                              "maximum_number_of_chores = 100\n")
+        household_limits = load_household_limits(config_file.name)
+        os.remove(config_file.name)
+        set_household_limits(household_limits)
+        print("\n\tVALID: ", limits_for("Tower1") == large_limits, limits_for("House1"))
+        set_household_limits({})
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 6: Load a limit which is not a number")
+    try:
+        with tempfile.NamedTemporaryFile("w", suffix = ".ini", delete = False) as config_file :
+            config_file.write("[limits]\nmaximum_household_size = many\n")
+        try :
+            configure(config_file.name)
+        finally :
+            os.remove(config_file.name)
+        print("\tVALID: ", Limits.current())
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
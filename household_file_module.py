@@ -0,0 +1,867 @@
+##
+#  Streaming reader for the Households.txt file.
+#
+#  Each line of the file holds one household in the form:
+#
+#  name, number of participants, participant..., number of chores, chore, frequency, ...
+#
+#  A household with limits of its own (see config_module) has them at the end
+#  of its line, after the word limits, in the order of Limits.values().
+#
+#  The reader works through the file one line at a time so that only the
+#  current line is held in memory, and parses each line in a single pass.
+#
+#  Households are added to the file with a HouseholdWriter, which writes each
+#  line in one call and flushes according to a policy. A line which was only
+#  partly written when the program stopped is skipped by the reader and
+#  removed by the next writer.
+#
+#  A HouseholdLineIndex keeps the offset of each line by household name in a
+#  file beside Households.txt, so a household can be read without reading
+#  the lines before it.
+
+import os
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections import namedtuple
+
+from household_module import Household
+from chores_list_module import ChoresList, Chore
+from participants_list_module import Participants
+from config_module import Limits, limits_for
+
+## The classes of error found when a line is loaded.
+FORMAT_ERROR = "format"
+TORN_LINE_ERROR = "torn line"
+NAME_ERROR = "household name"
+PARTICIPANTS_ERROR = "participants"
+CHORES_ERROR = "chores"
+DUPLICATE_ERROR = "duplicate household"
+
+## What happens when a line cannot be loaded: stop loading, skip the line,
+#  or skip the line and copy it to a quarantine file.
+FAIL_FAST = "fail-fast"
+SKIP = "skip"
+QUARANTINE = "quarantine"
+ERROR_MODES = (FAIL_FAST, SKIP, QUARANTINE)
+MAXIMUM_SAMPLES = 10
+MAXIMUM_LINE_NUMBERS_SHOWN = 10
+
+FLUSH_ON_CREATE = "create"
+FLUSH_ON_QUIT = "quit"
+FLUSH_EVERY = "every"
+FLUSH_POLICIES = (FLUSH_ON_CREATE, FLUSH_ON_QUIT, FLUSH_EVERY)
+DEFAULT_FLUSH_EVERY = 1000
+
+## The field which comes before a household's own limits on its line.
+LIMITS_FIELD = "limits"
+
+## The extension added to the name of the households file for its line index.
+LINE_INDEX_EXTENSION = ".idx"
+# the indexed size, number of lines, number of entries and checksum of the
+# end of the indexed part, at the start of the line index file
+_LINE_INDEX_HEADER = struct.Struct("<QQQI")
+# the number of bytes at the end of the indexed part which are checksummed,
+# to find out whether the households file was replaced
+_CHECKED_TAIL = 4096
+
+## A parsed line of the households file.
+#  name          the household name
+#  participants  a tuple of participant names
+#  chores        a tuple of (chore name, frequency) pairs
+#  line_number   the line of the file the record came from
+#  limits        the household's own Limits, or None
+#
+HouseholdRecord = namedtuple("HouseholdRecord",
+                             ["name", "participants", "chores", "line_number", "limits"],
+                             defaults = (None,))
+
+
+## Keeps track of how quickly a file was loaded and how much memory it used.
+#
+class LoadStats() :
+
+    ## Constructor for the LoadStats class.
+    # @param trace_memory True if the peak memory use should be measured.
+    #        Tracing makes loading several times slower.
+    #
+    def __init__(self, trace_memory = False) :
+        self.trace_memory = trace_memory
+        self.lines = 0
+        self.households = 0
+        self.elapsed = 0.0
+        self.peak_memory = 0
+        self._start_time = 0.0
+        self._started_tracing = False
+
+    def start(self) :
+        if self.trace_memory and not tracemalloc.is_tracing() :
+            tracemalloc.start()
+            self._started_tracing = True
+        self._start_time = time.perf_counter()
+
+    def stop(self) :
+        self.elapsed = time.perf_counter() - self._start_time
+        if self.trace_memory and tracemalloc.is_tracing() :
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing :
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    ## Return the number of lines processed per second.
+    #
+    @property
+    def lines_per_second(self) :
+        if self.elapsed == 0 :
+            return 0.0
+        return self.lines / self.elapsed
+
+    def __str__(self) :
+        stats_string = ("Loaded {} households from {} lines in {:.3f}s ({:.0f} lines/s)"
+                        .format(self.households, self.lines, self.elapsed, self.lines_per_second))
+        if self.trace_memory :
+            stats_string = stats_string + ", peak memory {:.1f} KiB".format(self.peak_memory / 1024)
+        return stats_string
+
+
+## A line of the households file which could not be loaded.
+#
+class RecordError(ValueError) :
+
+    ## Constructor for the RecordError class.
+    # @param error_class the class of error, for example FORMAT_ERROR
+    # @param message a description of the error
+    #
+    def __init__(self, error_class, message) :
+        super().__init__(message)
+        self.error_class = error_class
+
+
+## Keeps count of the lines which could not be loaded.
+#
+class LoadReport() :
+
+    ## Constructor for the LoadReport class.
+    #
+    # @param mode FAIL_FAST, SKIP or QUARANTINE
+    # @param quarantine_file_name the file which rejected lines are appended
+    #        to in QUARANTINE mode
+    # @param maximum_samples the number of error messages kept
+    #
+    def __init__(self, mode = SKIP, quarantine_file_name = None, maximum_samples = MAXIMUM_SAMPLES) :
+        if mode not in ERROR_MODES :
+            raise ValueError("The error mode must be one of {}.".format(", ".join(ERROR_MODES)))
+        if mode == QUARANTINE and quarantine_file_name is None :
+            raise ValueError("A quarantine file is needed in {} mode.".format(QUARANTINE))
+        self.mode = mode
+        self.quarantine_file_name = quarantine_file_name
+        self.maximum_samples = maximum_samples
+        self.loaded = 0
+        self.rejected = 0
+        # the number of lines and their line numbers for each class of error
+        self.counts = {}
+        self.line_numbers = {}
+        # (line number, error class, message) tuples for the first errors
+        self.samples = []
+        # the line number and text of the household most recently read. The
+        # text is None if the household was not read from a text file.
+        self.line_number = 0
+        self.line = None
+        self._quarantine_file = None
+
+
+    ## Records a line which could not be loaded.
+    #
+    # @param line_number the number of the line in the file, or 0 if it is not known
+    # @param error_class the class of error, for example FORMAT_ERROR
+    # @param message a description of the error
+    # @param line the text of the line, which is copied to the quarantine file
+    # @exception RecordError raised in FAIL_FAST mode
+    #
+    def add_error(self, line_number, error_class, message, line = None) :
+        message = message.strip()
+        self.rejected += 1
+        self.counts[error_class] = self.counts.get(error_class, 0) + 1
+        self.line_numbers.setdefault(error_class, array("L")).append(line_number)
+        if len(self.samples) < self.maximum_samples :
+            self.samples.append((line_number, error_class, message))
+        if self.mode == FAIL_FAST :
+            raise RecordError(error_class, "Line {}: {}".format(line_number, message))
+        if self.mode == QUARANTINE and line is not None :
+            if self._quarantine_file is None :
+                self._quarantine_file = open(self.quarantine_file_name, "a")
+            self._quarantine_file.write(line if line.endswith("\n") else line + "\n")
+
+
+    ## Records a household which was read but not loaded because a household
+    #  with the same name was loaded first. Its line is copied to the
+    #  quarantine file as it was read, or written out again if the household
+    #  was not read from a text file.
+    #
+    # @param household the Household object which was not loaded
+    # @param message a description of the error
+    #
+    def add_duplicate(self, household, message) :
+        self.loaded -= 1
+        line = self.line
+        if line is None and self.mode == QUARANTINE :
+            line = format_household_line(household)
+        self.add_error(self.line_number, DUPLICATE_ERROR, message, line)
+
+
+    def close(self) :
+        if self._quarantine_file is not None :
+            self._quarantine_file.close()
+            self._quarantine_file = None
+
+
+    ## Return a summary of the load, with a line for each class of error and
+    #  the sample messages.
+    #
+    def __str__(self) :
+        summary = ["Kept {} households, rejected {} lines.".format(self.loaded, self.rejected)]
+        for error_class, count in self.counts.items() :
+            line_numbers = self.line_numbers[error_class][:MAXIMUM_LINE_NUMBERS_SHOWN]
+            summary.append("\t{}: {} (line {}{})".format(
+                error_class, count, ", ".join(map(str, line_numbers)),
+                ", ..." if count > len(line_numbers) else ""))
+        for line_number, error_class, message in self.samples :
+            summary.append("\t" + message if message.startswith("Line ")
+                           else "\tLine {}: {}".format(line_number, message))
+        if self.rejected > 0 :
+            if self.mode == QUARANTINE :
+                summary.append("The rejected lines were copied to {}.".format(self.quarantine_file_name))
+            summary.append("Please correct these lines of the text file.")
+        return "\n".join(summary)
+
+
+## Splits one line of the households file into a HouseholdRecord.
+#  The fields are separated by commas so chore names may contain spaces.
+#
+# @param line a string containing one line of the file
+# @param line_number the number of the line in the file
+# @return a HouseholdRecord
+#  @exception RecordError raised if the line does not have the expected fields
+#
+def parse_household_line(line, line_number = 0) :
+    fields = [field.strip() for field in line.split(",")]
+    try :
+        number_of_members = int(fields[1])
+        chores_at = number_of_members + 2
+        participants = tuple(fields[2:chores_at])
+        number_of_chores = int(fields[chores_at])
+        chores_end = chores_at + 1 + 2 * number_of_chores
+        chore_fields = fields[chores_at + 1:chores_end]
+        chores = tuple(zip(chore_fields[0::2], chore_fields[1::2]))
+        limits = None
+        if len(fields) == chores_end + 1 + len(Limits.__slots__) and fields[chores_end] == LIMITS_FIELD :
+            limits = Limits(*map(int, fields[chores_end + 1:]))
+            chores_end = len(fields)
+    except (IndexError, ValueError) :
+        raise RecordError(FORMAT_ERROR, "Line {} is not a valid household record.".format(line_number))
+
+    if len(participants) != number_of_members or len(chores) != number_of_chores \
+       or len(fields) != chores_end :
+        raise RecordError(FORMAT_ERROR, "Line {} is not a valid household record.".format(line_number))
+
+    return HouseholdRecord(fields[0], participants, chores, line_number, limits)
+
+
+## Formats a household as one line of the households file.
+#
+# @param household a Household object
+# @return a string ending in a newline
+#
+def format_household_line(household) :
+    fields = [household.household_name]
+    participants = household.participants.participants
+    fields.append(str(len(participants)))
+    fields.extend(participants)
+    chores = household.chores.chores
+    fields.append(str(len(chores)))
+    for chore in chores :
+        fields.append(chore.chore_name)
+        fields.append(str(chore.frequency))
+    if household.limits is not None :
+        fields.append(LIMITS_FIELD)
+        fields.extend(map(str, household.limits.values()))
+    return ", ".join(fields) + " \n"
+
+
+## Builds a validated Household from a record. Each part of the record is
+#  checked once and the Household is built without checking it again. The
+#  household is given the limits from limits_for.
+#
+# @param record a HouseholdRecord
+# @return a Household object
+#  @exception RecordError raised if any part of the record is invalid
+#
+def household_from_record(record) :
+    limits = limits_for(record.name, record.limits)
+    household_names, chores_list = validate_record(record, limits)
+    return Household.from_validated(record.name, household_names, chores_list, limits)
+
+
+## Checks every part of a record without building a Household. The checks
+#  stop at the first part which is not valid.
+#
+# @param record a HouseholdRecord
+# @param limits the household's Limits, or None for the class constants
+# @return a tuple containing the set of participant names and the set of
+#         Chore objects
+#  @exception RecordError raised if any part of the record is invalid. Its
+#             error_class is NAME_ERROR, PARTICIPANTS_ERROR or CHORES_ERROR.
+#
+def validate_record(record, limits = None) :
+    try :
+        Household.is_valid_name(record.name)
+    except ValueError as err :
+        raise RecordError(NAME_ERROR, str(err))
+
+    try :
+        household_names = set(map(sys.intern, record.participants))
+        if len(household_names) != len(record.participants) :
+            raise ValueError("\n\t\tThe household {} has a participant listed twice."
+                             .format(record.name))
+        Participants.is_valid_naming(record.participants)
+        Participants.is_valid_length(household_names, limits)
+    except (TypeError, ValueError) as err :
+        raise RecordError(PARTICIPANTS_ERROR, str(err))
+
+    try :
+        chores_each_name = {}
+        for chore_name, chore_frequency in record.chores :
+            Chore.is_valid_chore_name(chore_name)
+            Chore.is_valid_frequency(chore_frequency)
+            if chore_name in chores_each_name :
+                raise ValueError("\t\tChore: {} already exists in the set".format(chore_name))
+            chores_each_name[chore_name] = Chore.shared(chore_name, int(chore_frequency))
+        chores_list = set(chores_each_name.values())
+        ChoresList.is_valid_length(chores_list, limits)
+    except (TypeError, ValueError) as err :
+        raise RecordError(CHORES_ERROR, str(err))
+    return household_names, chores_list
+
+
+## Reads the households file and yields a validated Household for each line.
+#  Invalid lines are added to the report, or printed if there is no report.
+#
+# @param household_text_file a file object open for reading
+# @param stats an optional LoadStats object
+# @param report an optional LoadReport object
+# @return a generator of Household objects
+# @exception RecordError raised by the report in FAIL_FAST mode
+#
+def read_households(household_text_file, stats = None, report = None) :
+    line_number = 0
+    for line in household_text_file :
+        line_number += 1
+        if line.strip() == "" :
+            continue
+        if not line.endswith("\n") and not is_complete_line(line) :
+            message = "Line {} was only partly written and has been skipped.".format(line_number)
+            if report is None :
+                print(message)
+            else :
+                report.add_error(line_number, TORN_LINE_ERROR, message, line)
+            continue
+        household = read_household_line(line, line_number, report)
+        if household is None :
+            continue
+        if stats is not None :
+            stats.households += 1
+        if report is not None :
+            report.loaded += 1
+            report.line_number = line_number
+            report.line = line
+        yield household
+    if stats is not None :
+        stats.lines = line_number
+
+
+## Return the household name at the start of a line, without reading the
+#  rest of the line.
+#
+def household_line_name(line) :
+    return line.split(",", 1)[0].strip()
+
+
+## The byte offset and line number of each line of the households file, by
+#  the household name at the start of the line.
+#
+#  Only the names are read, so the lines are validated when their households
+#  are read (see TextStorage.get), and a name may be on lines which are not
+#  valid or on more than one line. The index is kept in a file beside the
+#  households file, with the size of the part of the file it covers and a
+#  checksum of the end of that part. When it is loaded again only the lines
+#  added since are read, and if the households file was replaced the whole
+#  file is read.
+#
+class HouseholdLineIndex() :
+
+    ## Constructor for the HouseholdLineIndex class. The index is empty until
+    #  load is called or lines are read through read_lines.
+    #
+    # @param text_file_name the name of the households file
+    #
+    def __init__(self, text_file_name) :
+        self.text_file_name = text_file_name
+        self.index_file_name = text_file_name + LINE_INDEX_EXTENSION
+        # the size of the part of the file which is indexed and its number of lines
+        self.size = 0
+        self.lines = 0
+        # the first line of each name, and the later lines of names which are
+        # on more than one, as (offset, line number) tuples
+        self._first = {}
+        self._later = {}
+        # every indexed line in file order, as they are saved
+        self._names = []
+        self._offsets = array("Q")
+        self._line_numbers = array("I")
+        self._changed = False
+
+
+    ## Return the names on the indexed lines, in the order of their first lines.
+    #
+    def names(self) :
+        return self._first.keys()
+
+
+    ## Return the (offset, line number) tuples of the lines a name is on, in
+    #  file order.
+    #
+    def positions(self, household_name) :
+        first = self._first.get(household_name)
+        if first is None :
+            return []
+        return [first] + self._later.get(household_name, [])
+
+
+    ## Adds a line to the index.
+    #
+    def add(self, household_name, offset, line_number) :
+        position = (offset, line_number)
+        if household_name in self._first :
+            self._later.setdefault(household_name, []).append(position)
+        else :
+            self._first[household_name] = position
+        self._names.append(household_name)
+        self._offsets.append(offset)
+        self._line_numbers.append(line_number)
+        self.lines = max(self.lines, line_number)
+        self._changed = True
+
+
+    ## Indexes lines of the households file as they are read, from the end
+    #  of the indexed part. A last line which was only partly written is not
+    #  indexed.
+    #
+    # @param household_binary_file a file object open for reading in binary
+    #        mode, positioned at the end of the indexed part
+    # @return a generator of the lines as strings
+    #
+    def read_lines(self, household_binary_file) :
+        offset = self.size
+        line_number = self.lines
+        for binary_line in household_binary_file :
+            line_number += 1
+            line = str(binary_line, "utf-8", "replace")
+            if binary_line.endswith(b"\n") or is_complete_line(line) :
+                if line.strip() != "" :
+                    self.add(household_line_name(line), offset, line_number)
+                offset += len(binary_line)
+                self.size = offset
+                self.lines = line_number
+            yield line
+
+
+    ## Return the checksum of the end of the indexed part of the file.
+    #
+    def _checksum(self, household_binary_file, size) :
+        household_binary_file.seek(max(0, size - _CHECKED_TAIL))
+        return zlib.crc32(household_binary_file.read(min(size, _CHECKED_TAIL)))
+
+
+    ## Reads the index file. The index is left empty if the file does not
+    #  exist, is incomplete or does not match the households file.
+    #
+    def _read_index_file(self, household_binary_file) :
+        try :
+            with open(self.index_file_name, "rb") as index_file :
+                data = index_file.read()
+        except OSError :
+            return
+        if len(data) < _LINE_INDEX_HEADER.size :
+            return
+        size, lines, entries, checksum = _LINE_INDEX_HEADER.unpack_from(data)
+        household_binary_file.seek(0, os.SEEK_END)
+        if household_binary_file.tell() < size or self._checksum(household_binary_file, size) != checksum :
+            return
+        offsets = array("Q")
+        line_numbers = array("I")
+        names_at = _LINE_INDEX_HEADER.size + entries * (offsets.itemsize + line_numbers.itemsize)
+        if len(data) < names_at :
+            return
+        line_numbers_at = _LINE_INDEX_HEADER.size + entries * offsets.itemsize
+        offsets.frombytes(data[_LINE_INDEX_HEADER.size:line_numbers_at])
+        line_numbers.frombytes(data[line_numbers_at:names_at])
+        names = str(data[names_at:], "utf-8").split("\n") if entries else []
+        if len(names) != entries :
+            return
+        for household_name, offset, line_number in zip(names, offsets, line_numbers) :
+            self.add(household_name, offset, line_number)
+        self.size = size
+        self.lines = lines
+        self._changed = False
+
+
+    ## Loads the index from its file and indexes the lines added to the
+    #  households file since it was saved.
+    #
+    def load(self) :
+        with open(self.text_file_name, "rb") as household_binary_file :
+            self._read_index_file(household_binary_file)
+            household_binary_file.seek(self.size)
+            for line in self.read_lines(household_binary_file) :
+                pass
+
+
+    ## Writes the index file if lines were indexed since it was loaded. It is
+    #  not written if the households file is not the size expected, as
+    #  another program has added to it.
+    #
+    # @param size the size of the households file, including the lines
+    #        added to the index by add
+    #
+    def save(self, size) :
+        if not self._changed :
+            return
+        with open(self.text_file_name, "rb") as household_binary_file :
+            household_binary_file.seek(0, os.SEEK_END)
+            if household_binary_file.tell() != size :
+                return
+            checksum = self._checksum(household_binary_file, size)
+        temporary_file_name = self.index_file_name + ".tmp"
+        with open(temporary_file_name, "wb") as index_file :
+            index_file.write(_LINE_INDEX_HEADER.pack(size, self.lines, len(self._names), checksum))
+            index_file.write(self._offsets.tobytes())
+            index_file.write(self._line_numbers.tobytes())
+            index_file.write("\n".join(self._names).encode("utf-8"))
+        os.replace(temporary_file_name, self.index_file_name)
+        self.size = size
+        self._changed = False
+
+
+## Removes the index file of a households file, if it has one.
+#
+def remove_line_index(text_file_name) :
+    try :
+        os.remove(text_file_name + LINE_INDEX_EXTENSION)
+    except FileNotFoundError :
+        pass
+
+
+## Reads the household on one line of the households file. An invalid line is
+#  reported in the same way as read_households.
+#
+# @param line a string containing one line of the file
+# @param line_number the number of the line in the file
+# @param report an optional LoadReport object
+# @return a Household object, or None if the line is not valid
+#
+def read_household_line(line, line_number, report = None) :
+    try :
+        return household_from_record(parse_household_line(line, line_number))
+    except RecordError as err :
+        if report is not None :
+            report.add_error(line_number, err.error_class, str(err), line)
+            return None
+        print(err)
+        print(("\n\nPlease correct line {} of the text file, first Quit the application")
+              .format(line_number))
+        return None
+
+
+## Checks whether a line holds a whole household record. Only the last line
+#  of the file can be missing its newline, and it is only partly written if
+#  it does not hold a whole record.
+#
+def is_complete_line(line) :
+    try :
+        parse_household_line(line)
+    except ValueError :
+        return False
+    return True
+
+
+## Syncs a directory so that a file renamed into it is not lost.
+#
+def sync_directory(directory) :
+    try :
+        directory_descriptor = os.open(directory or ".", os.O_RDONLY)
+    except OSError :
+        return
+    try :
+        os.fsync(directory_descriptor)
+    except OSError :
+        pass
+    finally :
+        os.close(directory_descriptor)
+
+
+class HouseholdWriter() :
+
+    ## Constructor for the HouseholdWriter class. Opens the households file
+    #  for appending, creating it if it does not exist. If the last line was
+    #  only partly written it is removed, and if it is whole but is missing
+    #  its newline the newline is added.
+    #
+    # @param text_file_name the name of the households file
+    # @param flush_policy FLUSH_ON_CREATE to write each household as it is
+    #        added, FLUSH_EVERY to write them in groups of flush_every, or
+    #        FLUSH_ON_QUIT to write them when the writer is closed
+    # @param flush_every the number of households in a group
+    #
+    def __init__(self, text_file_name, flush_policy = FLUSH_ON_CREATE, flush_every = DEFAULT_FLUSH_EVERY) :
+        if flush_policy not in FLUSH_POLICIES :
+            raise ValueError("The flush policy must be one of {}.".format(", ".join(FLUSH_POLICIES)))
+        self.text_file_name = text_file_name
+        self.flush_policy = flush_policy
+        self.flush_every = flush_every
+        self._file = open(text_file_name, "a+b")
+        self._pending = []
+        self._repair_tail()
+        self._file.seek(0, os.SEEK_END)
+        # the size of the file once the waiting households are written
+        self.size = self._file.tell()
+
+
+    def _repair_tail(self) :
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size == 0 :
+            return
+        self._file.seek(max(0, size - 4096))
+        tail = self._file.read()
+        if tail.endswith(b"\n") :
+            return
+        line_start = tail.rfind(b"\n") + 1
+        if line_start == 0 and size > len(tail) :
+            # the last line is longer than the tail which was read
+            self._file.seek(0)
+            tail = self._file.read()
+            line_start = tail.rfind(b"\n") + 1
+        if is_complete_line(str(tail[line_start:], "utf-8", "replace")) :
+            self._file.write(b"\n")
+        else :
+            self._file.truncate(size - (len(tail) - line_start))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+    ## Adds a household to the file. The line is built in memory and written
+    #  in one call when the flush policy says so.
+    #
+    # @param household a Household object
+    # @return the byte offset of the household's line in the file
+    #
+    def write(self, household) :
+        line = format_household_line(household).encode("utf-8")
+        offset = self.size
+        self._pending.append(line)
+        self.size += len(line)
+        if self.flush_policy == FLUSH_ON_CREATE or \
+                (self.flush_policy == FLUSH_EVERY and len(self._pending) >= self.flush_every) :
+            self.flush()
+        return offset
+
+
+    ## Writes the waiting households in one call and syncs them to disk.
+    #
+    def flush(self) :
+        if self._pending :
+            self._file.write(b"".join(self._pending))
+            self._pending = []
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+
+    def close(self) :
+        if not self._file.closed :
+            self.flush()
+            self._file.close()
+
+
+    def __enter__(self) :
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) :
+        self.close()
+
+
+## Rewrites the households file without its invalid lines and without any
+#  household which is on an earlier line. The new file is written beside the
+#  old one and renamed over it, so the file is never left half written.
+#
+# @param text_file_name the name of the households file
+# @return a tuple containing the number of lines kept and removed
+#
+def compact_household_file(text_file_name) :
+    temporary_file_name = text_file_name + ".tmp"
+    seen = set()
+    lines = 0
+    with open(text_file_name, "r") as household_text_file, \
+            open(temporary_file_name, "wb") as compacted_file :
+        for line in household_text_file :
+            lines += 1
+        household_text_file.seek(0)
+        for household in read_households(household_text_file) :
+            if household.household_name not in seen :
+                seen.add(household.household_name)
+                compacted_file.write(format_household_line(household).encode("utf-8"))
+        compacted_file.flush()
+        os.fsync(compacted_file.fileno())
+    os.replace(temporary_file_name, text_file_name)
+    sync_directory(os.path.dirname(text_file_name))
+    remove_line_index(text_file_name)
+    return len(seen), lines - len(seen)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    print("Test 1: Parse a valid line")
+    try:
+        record = parse_household_line("House1, 2, personA, personB, 2, wash up, 4, dusting, 1 \n", 1)
+        print("\n\tVALID: ", record)
+        print("\tVALID: ", household_from_record(record))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Parse a line with a missing chore frequency")
+    try:
+        record = parse_household_line("House1, 2, personA, personB, 2, wash up, 4, dusting \n", 2)
+        print("\tVALID: ", record)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 3: Validate a record with an invalid household name")
+    try:
+        record = parse_household_line("**, 2, personA, personB, 2, wash up, 4, dusting, 1 \n", 3)
+        print("\tVALID: ", household_from_record(record))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 4: Read a file of households")
+    try:
+        import io
+        text_file = io.StringIO("House1, 2, personA, personB, 2, wash up, 4, dusting, 1 \n"
+                                "\n"
+                                "**, 2, personA, personB, 2, wash up, 4, dusting, 1 \n"
+                                "House2, 2, personC, personD, 2, empty bin, 2, dusting, 1 \n")
+        stats = LoadStats(trace_memory = True)
+        stats.start()
+        households = list(read_households(text_file, stats))
+        stats.stop()
+        print("\n\tVALID: ", [str(h) for h in households])
+        print("\tVALID: ", stats)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    import tempfile
+    from benchmark_module import generate_records
+
+    with tempfile.TemporaryDirectory() as directory :
+        text_file_name = os.path.join(directory, "Households.txt")
+        households = [household_from_record(record) for record in generate_records(5000)]
+
+        print("\nTest 5: Write 5000 households, flushing on create and every 1000")
+        try:
+            timings = []
+            for flush_policy in (FLUSH_ON_CREATE, FLUSH_EVERY) :
+                if os.path.exists(text_file_name) :
+                    os.remove(text_file_name)
+                start = time.perf_counter()
+                with HouseholdWriter(text_file_name, flush_policy) as writer :
+                    for household in households :
+                        writer.write(household)
+                timings.append("{} {:.3f}s".format(flush_policy, time.perf_counter() - start))
+            print("\n\tVALID: ", ", ".join(timings))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 6: Reopen a file whose last line was only partly written")
+        try:
+            with open(text_file_name, "a") as text_file :
+                text_file.write("House1, 2, personA, personB, 2, wash up, 4, dus")
+            with open(text_file_name, "r") as text_file :
+                print("\n\tVALID:  read", len(list(read_households(text_file))))
+            with HouseholdWriter(text_file_name) as writer :
+                writer.write(Household("House1", {"personA","personB"}, {Chore("wash up", 4), Chore("dusting", 1)}))
+                writer.write(Household("House1", {"personA","personB"}, {Chore("wash up", 4), Chore("dusting", 1)}))
+            with open(text_file_name, "r") as text_file :
+                print("\tVALID:  read", len(list(read_households(text_file))))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 7: Compact the file")
+        try:
+            print("\n\tVALID:  kept and removed", compact_household_file(text_file_name))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 8: Load a file with invalid lines, quarantining them and failing fast")
+        lines = ("House1, 2, personA, personB, 2, wash up, 4, dusting, 1 \n"
+                 "**, 2, personA, personB, 2, wash up, 4, dusting, 1 \n"
+                 "House1, 2, personA, personB, 1, wash up, 4 \n"
+                 "House3, 2, personA, personA, 1, wash up, 4 \n"
+                 "House4, 2, personA\n"
+                 "House1,2,personB,personA,2,dusting,1,wash up,4\n")
+        try:
+            quarantine_file_name = os.path.join(directory, "Households.rejected")
+            report = LoadReport(QUARANTINE, quarantine_file_name)
+            names = set()
+            for household in read_households(io.StringIO(lines), report = report) :
+                if household.household_name in names :
+                    report.add_duplicate(household, "Household {} already exists."
+                                         .format(household.household_name))
+                names.add(household.household_name)
+            report.close()
+            print("\n\tVALID: ", report)
+            with open(quarantine_file_name) as quarantine_file :
+                quarantined = quarantine_file.readlines()
+            print("\tVALID:  quarantined", len(quarantined), "lines, the repeated one as it was written:",
+                  lines.splitlines(True)[5] in quarantined)
+        except Exception as err:
+            print("\tERROR: ", err)
+        try:
+            list(read_households(io.StringIO(lines), report = LoadReport(FAIL_FAST)))
+        except RecordError as err:
+            print("\tVALID: ", err.error_class, "-", err)
+
+        print("\nTest 9: Index the lines by name, save the index and load it with a line added")
+        try:
+            index_test_file_name = os.path.join(directory, "Indexed.txt")
+            with open(index_test_file_name, "w") as text_file :
+                text_file.write(lines)
+            index = HouseholdLineIndex(index_test_file_name)
+            index.load()
+            index.save(os.path.getsize(index_test_file_name))
+            with open(index_test_file_name, "a") as text_file :
+                text_file.write("House5, 2, personA, personB, 2, wash up, 4, dusting, 1 \n")
+            index = HouseholdLineIndex(index_test_file_name)
+            index.load()
+            print("\n\tVALID: ", list(index.names()), index.positions("House1"), index.positions("House5"))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
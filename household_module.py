@@ -1,8 +1,24 @@
+from collections import namedtuple
+
 from participants_list_module import Participants
 from chores_list_module import ChoresList, Chore
+from chore_log_module import ChoreLog
+from validation_module import household_name_error
+from rendering_module import render_chore_log
+from leaderboard_module import Leaderboard
+
+## The outcome of logging a batch of chores.
+#  applied   the number of rows added to the log
+#  rejected  the number of rows which were not valid
+#
+BatchResult = namedtuple("BatchResult", ["applied", "rejected"])
+
 
 class Household() :
 
+    __slots__ = ("_household_name", "_participants", "_chores", "_chore_log",
+                 "_chore_weights", "_leaderboard", "_chore_log_text", "_limits")
+
     ## Constants used for validation
     MINIMUM_NAME_LENGTH = 3     # Used to validate household name 
     MAXIMUM_NAME_LENGTH = 10
@@ -22,13 +38,37 @@ class Household() :
     # @param the_participants a Participants object containing
     #        a set of the participants' names
     # @param the_chores a ChoresList object containing a set of chores
+    # @param limits an optional Limits object for this household. If it is
+    #        None the class constants are used.
     #
-    def __init__(self, the_household_name, the_participants, the_chores) :
+    def __init__(self, the_household_name, the_participants, the_chores, limits = None) :
+        self._limits = limits
         self.household_name = the_household_name
         self.participants = the_participants
         self.chores = the_chores
         self.chore_log = {}   # This will still call the setter for the chore log
 
+
+    ## Alternative constructor for a household whose name, participants and
+    #  chores have already been validated, for example by a loader or the
+    #  household store. Nothing is checked again; only the chore log is
+    #  initialised.
+    #
+    # @param the_household_name a string containing the household name
+    # @param the_participants a set containing the participants' names
+    # @param the_chores a set of Chore objects
+    # @param limits an optional Limits object for this household
+    #
+    @classmethod
+    def from_validated(cls, the_household_name, the_participants, the_chores, limits = None) :
+        household = cls.__new__(cls)
+        household._limits = limits
+        household._household_name = the_household_name
+        household._participants = Participants.from_validated(the_participants)
+        household._chores = ChoresList.from_validated(the_chores)
+        household.chore_log = {}
+        return household
+
        
     ## Return the household_name.
     #          
@@ -61,7 +101,7 @@ class Household() :
     #  @param names a Participants object which is a set of the team names       
     @participants.setter
     def participants(self, the_participants) :
-        self._participants = Participants(the_participants)
+        self._participants = Participants(the_participants, self._limits)
  
         
     ## Return the chores.
@@ -76,36 +116,88 @@ class Household() :
     @chores.setter
     def chores(self, the_chores) :
         try :
-            self._chores = ChoresList(the_chores)
+            self._chores = ChoresList(the_chores, self._limits)
         except (ValueError, TypeError) as err :
             raise
 
-    ## Return the chore log.
+    ## Return the chore log, creating it the first time it is used.
     # 
     @property
     def chore_log(self):
+        if self._chore_log is None :
+            self._create_log()
         return self._chore_log
 
 
-    ## Setter for the dictionary containing the log of tasks done.
+    ## Setter for the log of tasks done. The log is a ChoreLog which can be
+    #  read like a dictionary:
     #  key : partcipant's name,
     #  value :  dictionary containing the chore name and the number of times completed.
+    #  The log, the chore weights and the leaderboard are created the first
+    #  time one of them is used, so households which are loaded but never
+    #  looked at do not need them.
     #  @param the_chore_log an empty dictionary       
     @chore_log.setter
     def chore_log(self, the_chore_log) :
+        self._chore_log = None
+        self._chore_weights = None
+        self._leaderboard = None
+        self._chore_log_text = None
+
+
+    ## Creates an empty chore log with the chore weights and leaderboard.
+    #
+    def _create_log(self) :
         self._chore_log = Household.initialise_log(self.participants.participants, \
-                                                  self.chores.chores)
+                                                  self.chores)
+        chores = self.chores
+        self._chore_weights = tuple(int(chores.get(chore).frequency) for chore in chores.names)
+        self._leaderboard = Leaderboard(self._chore_log.participant_names)
+
+
+    ## Return the limits for this household, or None if the class constants
+    #  are used.
+    #
+    @property
+    def limits(self):
+        return self._limits
+
+
+    ## Return the points each chore is worth, in the same order as the
+    #  columns of the chore log.
+    # 
+    @property
+    def chore_weights(self):
+        if self._chore_log is None :
+            self._create_log()
+        return self._chore_weights
+
+
+    ## Return the leaderboard. A chore is worth its weekly frequency in
+    #  points each time it is done.
+    # 
+    @property
+    def leaderboard(self):
+        if self._chore_log is None :
+            self._create_log()
+        return self._leaderboard
 
 
     def __str__(self):
         return self.household_name
     
 
-    ## Generate a string representation of the chore log.
+    ## Generate a string representation of the chore log. The string is a
+    #  table with a row for each participant and a column for each chore. It
+    #  is kept until the chore log changes.
     #
     #  @return a string containting the information in the chore log
     def chore_log_string(self) :
-        chore_log_string = "TO BE COMPLETED"
+        chore_log = self.chore_log
+        version = chore_log.version
+        if self._chore_log_text is None or self._chore_log_text[0] != version :
+            self._chore_log_text = (version, render_chore_log(chore_log))
+        chore_log_string = self._chore_log_text[1]
             
         return chore_log_string
 
@@ -114,14 +206,101 @@ class Household() :
     #   @param name a string containing the name of the participant.
     #   @param chore  a string containing the name of the chore.
     #   @param number_completed the number to add on to the existing total.
+    #   @exception ValueError raised if the participant or chore is not in the
+    #              household or the number completed is out of range
     #
     # The format of the chore log is:
     # 
     # {"fred" : {"chore1": 0, "chore2": 0}, walt : {"chore1": 0, "chore2": 0}}
     #
     def update_log(self, name, chore, number_completed ) :
-        return
+        Household.is_valid_chores_done(number_completed, self._limits)
+        number_completed = int(number_completed)
+        chore_log = self.chore_log
+        chore_log.increment(name, chore, number_completed)
+        self._leaderboard.add_points(name, number_completed * \
+                                     self._chore_weights[chore_log.chore_index[chore]])
         
+    ## Update the chore log with many completions at once. The rows are all
+    #  validated before any are applied: if any row is not valid then none
+    #  of them are added to the log.
+    #
+    #   @param rows an iterable of (name, chore, number_completed) tuples
+    #   @return a BatchResult containing the number of rows applied and rejected
+    #
+    def update_log_many(self, rows) :
+        if self._limits is None :
+            minimum = Household.MINIMUM_CHORES_DONE
+            maximum = Household.MAXIMUM_CHORES_DONE
+        else :
+            minimum = self._limits.minimum_chores_done
+            maximum = self._limits.maximum_chores_done
+        chore_log = self.chore_log
+        participant_index = chore_log.participant_index
+        chore_index = chore_log.chore_index
+        number_of_chores = len(chore_index)
+        chore_weights = self._chore_weights
+
+        totals = {}
+        points = {}
+        applied = 0
+        rejected = 0
+        for row in rows :
+            try :
+                name, chore, number_completed = row
+                number_completed = int(number_completed)
+                column = chore_index[chore]
+                cell = participant_index[name] * number_of_chores + column
+            except (KeyError, TypeError, ValueError) :
+                rejected += 1
+                continue
+            if number_completed < minimum or number_completed > maximum :
+                rejected += 1
+                continue
+            totals[cell] = totals.get(cell, 0) + number_completed
+            points[name] = points.get(name, 0) + number_completed * chore_weights[column]
+            applied += 1
+
+        if rejected > 0 :
+            return BatchResult(0, rejected)
+
+        chore_log.add_to_cells(totals)
+        for name, participant_points in points.items() :
+            self._leaderboard.add_points(name, participant_points)
+        return BatchResult(applied, 0)
+
+
+    ## Adds completions which were logged before, for example when the chore
+    #  log is recovered from a file. The numbers are not checked against the
+    #  limits because each one may be the total of many completions.
+    #
+    #   @param rows an iterable of (name, chore, number_completed) tuples
+    #   @exception ValueError raised if a participant or chore is not in the
+    #              household. No rows are added if this happens.
+    #
+    #   The chore log is not created when there are no rows.
+    #
+    def restore_log(self, rows) :
+        chore_log = None
+        totals = {}
+        points = {}
+        for name, chore, number_completed in rows :
+            if chore_log is None :
+                chore_log = self.chore_log
+                number_of_chores = len(chore_log.chore_index)
+                chore_weights = self._chore_weights
+            column = chore_log.chore_position(chore)
+            cell = chore_log.participant_position(name) * number_of_chores + column
+            totals[cell] = totals.get(cell, 0) + number_completed
+            points[name] = points.get(name, 0) + number_completed * chore_weights[column]
+
+        if chore_log is None :
+            return
+        chore_log.add_to_cells(totals)
+        for name, participant_points in points.items() :
+            self._leaderboard.add_points(name, participant_points)
+
+
     ## Check the name contains only characters from the alphabet and check that it is the right length.
     # 
     # @param name the string to be validated
@@ -130,28 +309,59 @@ class Household() :
     #
     @staticmethod
     def is_valid_name(name) :
-        h_name_length = len(name)
-        if (h_name_length < Household.MINIMUM_NAME_LENGTH) or (h_name_length > Household.MAXIMUM_NAME_LENGTH):
-            raise ValueError("The length of the name must be at least 3 characters and a maximum of 10 characters long")
-        else:
-            for i in name:
-                if not i.isalnum():
-                    raise ValueError("Your household name should be alphanumeric")    
+        message = household_name_error(name, Household.MINIMUM_NAME_LENGTH, Household.MAXIMUM_NAME_LENGTH)
+        if message is not None :
+            raise ValueError(message)
+        return True
+
+
+    ## Check the number of chores done is a whole number within the range allowed.
+    #
+    # @param number_completed the number to be validated
+    # @param limits an optional Limits object used instead of the class constants
+    # @return True if the number is valid, raise TypeError or ValueError if
+    #         it is not.
+    #
+    @staticmethod
+    def is_valid_chores_done(number_completed, limits = None) :
+        try :
+            number_completed = int(number_completed)
+        except (TypeError, ValueError) :
+            raise TypeError("The number of chores done must be an integer.")
+
+        if limits is None :
+            minimum = Household.MINIMUM_CHORES_DONE
+            maximum = Household.MAXIMUM_CHORES_DONE
+        else :
+            minimum = limits.minimum_chores_done
+            maximum = limits.maximum_chores_done
+        if number_completed < minimum or number_completed > maximum :
+            raise ValueError(("The number of chores done must be greater or equal to " +
+                              "{} and less than or equal to {}")
+                             .format(minimum, maximum))
         return True
 
 
+    ## Create the chore log.
+    #
+    # @param the_participants a set of participant names
+    # @param the_chores a ChoresList object or a set of Chore objects
+    # @return a ChoreLog with a row for each participant and a column for each chore
+    #
     @staticmethod
     def initialise_log(the_participants, the_chores) :
  
-        # Create a dictionary where the keys are the participant names
-        # and the values are another dictionary containing all the chore names
-        # as keys and the number of times completed as values.
+        # Create a ChoreLog where the rows are the participant names
+        # and the columns are the chore names. It reads like a dictionary
+        # with the number of times completed as values.
         #
         # Example:
         # 
         # {"fred" : {"chore1": 0, "chore2": 0}, walt : {"chore1": 0, "chore2": 0}}
         
-        household_log = {}
+        if not isinstance(the_chores, ChoresList) :
+            the_chores = ChoresList.from_validated(the_chores)
+        household_log = ChoreLog(sorted(the_participants), the_chores.names, the_chores.positions)
 
         return household_log
             
@@ -209,7 +419,39 @@ def main():
                       {Chore("wash up", 4), Chore("vacuum stairs", 2), Chore("dusting",1),
                        Chore("empty bin", 2)})
         h.update_log("personA", "wash up", 49)
-        print("\n\tVALID: ", h)
+        h.update_log("personB", "empty bin", 2)
+        print("\n\tVALID: ", h, h.chore_log)
+        print("\tVALID: ", h.leaderboard)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 7: Update the log with too many chores done")    
+    try:
+        h.update_log("personA", "wash up", 51)
+        print("\n\tVALID: ", h, h.chore_log)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 8: Update the log for a chore the household does not have")    
+    try:
+        h.update_log("personA", "gardening", 1)
+        print("\n\tVALID: ", h, h.chore_log)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 9: Update the log with a batch of valid rows")    
+    try:
+        result = h.update_log_many([("personB", "dusting", 3), ("personC", "wash up", 2),
+                                    ("personB", "dusting", 1)])
+        print("\n\tVALID: ", result, h.leaderboard)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 10: Update the log with a batch containing invalid rows")    
+    try:
+        result = h.update_log_many([("personB", "dusting", 3), ("personD", "wash up", 2),
+                                    ("personB", "dusting", 0)])
+        print("\n\tVALID: ", result, h.leaderboard)
     except Exception as err:
         print("\tERROR: ", err)
 
@@ -0,0 +1,165 @@
+from household_module import Household, BatchResult
+from chores_list_module import Chore
+from name_index_module import NameIndex, DEFAULT_SUGGESTIONS
+
+class HouseholdRegistry() :
+
+    ## Constructor for the HouseholdRegistry class.
+    #  The households are held in a dictionary keyed by household name, so
+    #  lookups, insertions and deletions take constant time and the households
+    #  are iterated in the order they were added.
+    #
+    # @param the_households an optional iterable of Household objects
+    #
+    def __init__(self, the_households = ()) :
+        self._households = {}
+        self._name_index = NameIndex(self._households.keys())
+        for household in the_households :
+            self.add(household)
+
+
+    def __len__(self) :
+        return len(self._households)
+
+
+    def __contains__(self, household_name) :
+        return household_name in self._households
+
+
+    ## Iterates over the Household objects in insertion order.
+    #
+    def __iter__(self) :
+        return iter(self._households.values())
+
+
+    def __str__(self) :
+        return ", ".join(self._households)
+
+
+    ## Return the household names in insertion order.
+    #
+    def names(self) :
+        return self._households.keys()
+
+
+    ## Return the household with a given name.
+    #
+    # @param household_name the name of the household
+    # @return the Household object or None if the household does not exist
+    #
+    def get(self, household_name) :
+        return self._households.get(household_name)
+
+
+    ## Adds a household to the registry.
+    #
+    # @param household a Household object
+    # @exception ValueError raised if a household with the same name exists
+    #
+    def add(self, household) :
+        household_name = household.household_name
+        if household_name in self._households :
+            raise ValueError("Household {} already exists.".format(household_name))
+        self._households[household_name] = household
+        self._name_index.add(household_name)
+
+
+    ## Return the names of the households which are most like a name which
+    #  does not exist, most alike first.
+    #
+    # @param household_name the name which was not found
+    # @param number the most names to return
+    #
+    def suggest(self, household_name, number = DEFAULT_SUGGESTIONS) :
+        return self._name_index.suggest(household_name, number)
+
+
+    ## Removes a household from the registry.
+    #
+    # @param household_name the name of the household
+    # @return the Household object which was removed
+    # @exception KeyError raised if the household does not exist
+    #
+    def remove(self, household_name) :
+        household = self._households.pop(household_name)
+        self._name_index.remove(household_name)
+        return household
+
+
+    ## Logs completions for many households at once. The rows are grouped by
+    #  household and each household's rows are applied all together or not at
+    #  all.
+    #
+    # @param rows an iterable of (household_name, name, chore, number_completed) tuples
+    # @return a dictionary where the keys are household names and the values
+    #         are BatchResult objects. Rows for a household which does not
+    #         exist are all rejected.
+    #
+    def log_many(self, rows) :
+        rows_each_household = {}
+        for row in rows :
+            household_name = row[0]
+            household_rows = rows_each_household.get(household_name)
+            if household_rows is None :
+                household_rows = rows_each_household[household_name] = []
+            household_rows.append(row[1:])
+
+        results = {}
+        for household_name, household_rows in rows_each_household.items() :
+            household = self._households.get(household_name)
+            if household is None :
+                results[household_name] = BatchResult(0, len(household_rows))
+            else :
+                results[household_name] = household.update_log_many(household_rows)
+        return results
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    print("Test 1: Add households and look them up")
+    try:
+        registry = HouseholdRegistry()
+        registry.add(Household("House1", {"personA","personB"}, {Chore("wash up", 4), Chore("dusting", 1)}))
+        registry.add(Household("House2", {"personC","personD"}, {Chore("empty bin", 2), Chore("dusting", 1)}))
+        print("\n\tVALID: ", registry, registry.get("House2"), "House3" in registry)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Add a household which already exists")
+    try:
+        registry.add(Household("House1", {"personE","personF"}, {Chore("wash up", 4), Chore("dusting", 1)}))
+        print("\tVALID: ", registry)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 3: Log chores for several households")
+    try:
+        results = registry.log_many([("House1", "personA", "wash up", 2),
+                                     ("House2", "personC", "dusting", 1),
+                                     ("House2", "personD", "empty bin", 3),
+                                     ("House9", "personA", "wash up", 1)])
+        print("\n\tVALID: ", results)
+        print("\tVALID: ", registry.get("House2").leaderboard)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 4: Remove a household")
+    try:
+        registry.remove("House1")
+        print("\n\tVALID: ", registry, len(registry))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 5: Suggest households for a name which does not exist")
+    try:
+        registry.add(Household("House10", {"personA","personB"}, {Chore("wash up", 4), Chore("dusting", 1)}))
+        print("\n\tVALID: ", registry.suggest("house1"), registry.suggest("Hoose2"))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
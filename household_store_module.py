@@ -0,0 +1,403 @@
+##
+#  Append-only binary store for household records.
+#
+#  The store is made of two files:
+#
+#  <name>.dat  the log. Each record is a 4 byte length followed by the record.
+#  <name>.idx  the index. Each entry is a household name and the offset of
+#              its record in the log.
+#
+#  Strings are stored as a 2 byte length followed by UTF-8 bytes so names may
+#  contain spaces. A household with limits of its own has them at the end of
+#  its record, which is otherwise where the record ends. The log is memory mapped when it is read so a household can
+#  be opened by name without decoding any of the other records.
+
+import mmap
+import os
+import struct
+import sys
+
+from household_module import Household
+from chores_list_module import Chore
+from household_file_module import read_households
+from config_module import Limits, limits_for
+
+LOG_EXTENSION = ".dat"
+INDEX_EXTENSION = ".idx"
+
+_RECORD_LENGTH = struct.Struct("<I")
+_COUNT = struct.Struct("<H")
+_OFFSET = struct.Struct("<Q")
+_LIMITS = struct.Struct("<{}I".format(len(Limits.__slots__)))
+
+
+## Appends a length-prefixed UTF-8 string to a list of byte strings.
+#
+def pack_string(parts, text) :
+    data = text.encode("utf-8")
+    parts.append(_COUNT.pack(len(data)))
+    parts.append(data)
+
+
+## Reads a length-prefixed UTF-8 string.
+# @return a tuple containing the string and the offset following it
+#
+def unpack_string(buffer, offset) :
+    (length,) = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    return str(buffer[offset:offset + length], "utf-8"), offset + length
+
+
+## Encodes a household as a length-prefixed record.
+#
+# @param household a Household object
+# @return the record as bytes
+#
+def encode_household(household) :
+    return encode_household_fields(household.household_name, household.participants.participants,
+                                   household.chores.chores, household.limits)
+
+
+## Encodes the parts of a household as a length-prefixed record.
+#
+# @param household_name the household name
+# @param participants a collection of participant names
+# @param chores a collection of Chore objects
+# @param limits the household's own Limits, or None
+# @return the record as bytes
+#
+def encode_household_fields(household_name, participants, chores, limits = None) :
+    parts = []
+    pack_string(parts, household_name)
+    parts.append(_COUNT.pack(len(participants)))
+    for participant in participants :
+        pack_string(parts, participant)
+    parts.append(_COUNT.pack(len(chores)))
+    for chore in chores :
+        pack_string(parts, chore.chore_name)
+        parts.append(_COUNT.pack(int(chore.frequency)))
+    if limits is not None :
+        parts.append(_LIMITS.pack(*limits.values()))
+    payload = b"".join(parts)
+    return _RECORD_LENGTH.pack(len(payload)) + payload
+
+
+## Reads the household name of the record at an offset.
+#
+def _record_name(buffer, offset) :
+    return unpack_string(buffer, offset + _RECORD_LENGTH.size)[0]
+
+
+## Decodes the record at an offset. Households are validated before they
+#  are written to the store so the record is not checked again. The
+#  household is given the limits from limits_for.
+#
+# @param buffer a bytes-like object containing the log
+# @param offset the offset of the record
+# @return a Household object
+#
+def decode_household(buffer, offset) :
+    (length,) = _RECORD_LENGTH.unpack_from(buffer, offset)
+    offset += _RECORD_LENGTH.size
+    record_end = offset + length
+    household_name, offset = unpack_string(buffer, offset)
+
+    (number_of_members,) = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    household_names = set()
+    for member in range(number_of_members) :
+        participant, offset = unpack_string(buffer, offset)
+        household_names.add(sys.intern(participant))
+
+    (number_of_chores,) = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    chores_list = set()
+    for chore_number in range(number_of_chores) :
+        chore_name, offset = unpack_string(buffer, offset)
+        (frequency,) = _COUNT.unpack_from(buffer, offset)
+        offset += _COUNT.size
+        chores_list.add(Chore.shared(chore_name, frequency))
+
+    stored_limits = None
+    if offset < record_end :
+        stored_limits = Limits(*_LIMITS.unpack_from(buffer, offset))
+    return Household.from_validated(household_name, household_names, chores_list,
+                                    limits_for(household_name, stored_limits))
+
+
+## Decodes records which were written one after another.
+#
+# @param buffer a bytes-like object containing the records
+# @return a generator of Household objects
+#
+def decode_households(buffer) :
+    offset = 0
+    while offset < len(buffer) :
+        (length,) = _RECORD_LENGTH.unpack_from(buffer, offset)
+        yield decode_household(buffer, offset)
+        offset += _RECORD_LENGTH.size + length
+
+
+class HouseholdStore() :
+
+    ## Constructor for the HouseholdStore class. Opens the log and the index,
+    #  creating them if they do not exist.
+    #
+    # @param store_name the path of the store without an extension
+    #
+    def __init__(self, store_name) :
+        self.log_file_name = store_name + LOG_EXTENSION
+        self.index_file_name = store_name + INDEX_EXTENSION
+        self._offsets = {}
+        self._map = None
+        self._log_file = open(self.log_file_name, "a+b")
+        self._index_file = open(self.index_file_name, "a+b")
+        self._read_index()
+        self._recover_log_tail()
+
+
+    ## Loads the index file into a dictionary of household names and offsets.
+    #  An entry which was only partly written is discarded.
+    #
+    def _read_index(self) :
+        self._index_file.seek(0)
+        data = self._index_file.read()
+        offset = 0
+        good_end = 0
+        try :
+            while offset < len(data) :
+                name, offset = unpack_string(data, offset)
+                (record_offset,) = _OFFSET.unpack_from(data, offset)
+                offset += _OFFSET.size
+                self._offsets[name] = record_offset
+                good_end = offset
+        except (struct.error, UnicodeDecodeError) :
+            pass
+        if good_end < len(data) :
+            self._index_file.truncate(good_end)
+
+
+    ## Indexes any records written to the log after the last index entry and
+    #  removes a record which was only partly written.
+    #
+    def _recover_log_tail(self) :
+        log_size = os.path.getsize(self.log_file_name)
+        offset = max(self._offsets.values(), default = None)
+        if offset is None :
+            offset = 0
+        elif offset + _RECORD_LENGTH.size <= log_size :
+            self._log_file.seek(offset)
+            (length,) = _RECORD_LENGTH.unpack(self._log_file.read(_RECORD_LENGTH.size))
+            offset = offset + _RECORD_LENGTH.size + length
+
+        while offset + _RECORD_LENGTH.size <= log_size :
+            self._log_file.seek(offset)
+            (length,) = _RECORD_LENGTH.unpack(self._log_file.read(_RECORD_LENGTH.size))
+            record_end = offset + _RECORD_LENGTH.size + length
+            if record_end > log_size :
+                break
+            record = _RECORD_LENGTH.pack(length) + self._log_file.read(length)
+            self._add_index_entry(_record_name(record, 0), offset)
+            offset = record_end
+
+        if offset < log_size :
+            self._log_file.truncate(offset)
+
+
+    def _add_index_entry(self, household_name, offset) :
+        parts = []
+        pack_string(parts, household_name)
+        parts.append(_OFFSET.pack(offset))
+        self._index_file.write(b"".join(parts))
+        self._index_file.flush()
+        self._offsets[household_name] = offset
+
+
+    ## Flushes the log and waits until it is on disk, so an index entry is
+    #  never on disk before the record it points to.
+    #
+    def _sync_log(self) :
+        self._log_file.flush()
+        os.fsync(self._log_file.fileno())
+
+
+    ## Return the memory map of the log, remapping it if the log has grown.
+    #
+    def _log_map(self, needed_end) :
+        if self._map is None or len(self._map) < needed_end :
+            if self._map is not None :
+                self._map.close()
+            self._map = mmap.mmap(self._log_file.fileno(), 0, access = mmap.ACCESS_READ)
+        return self._map
+
+
+    def __contains__(self, household_name) :
+        return household_name in self._offsets
+
+
+    def __len__(self) :
+        return len(self._offsets)
+
+
+    ## Return the names of the households in the order they were added.
+    #
+    def names(self) :
+        return iter(self._offsets)
+
+
+    ## Return the household with a given name, decoding only its record.
+    #
+    # @param household_name the name of the household
+    # @return a Household object or None if the household is not in the store
+    #
+    def get(self, household_name) :
+        offset = self._offsets.get(household_name)
+        if offset is None :
+            return None
+        buffer = self._log_map(offset + _RECORD_LENGTH.size)
+        (length,) = _RECORD_LENGTH.unpack_from(buffer, offset)
+        buffer = self._log_map(offset + _RECORD_LENGTH.size + length)
+        return decode_household(buffer, offset)
+
+
+    ## Appends a household to the log and the index.
+    #
+    # @param household a Household object
+    # @exception ValueError raised if the store already contains the household
+    #
+    def append(self, household) :
+        household_name = household.household_name
+        if household_name in self._offsets :
+            raise ValueError("Household {} already exists in the store.".format(household_name))
+        record = encode_household(household)
+        self._log_file.seek(0, os.SEEK_END)
+        offset = self._log_file.tell()
+        self._log_file.write(record)
+        self._sync_log()
+        self._add_index_entry(household_name, offset)
+
+
+    ## Appends records which were encoded by encode_household from validated
+    #  households. The records are written to the log in one call and then
+    #  to the index in one call.
+    #
+    # @param records a bytes-like object containing records one after another
+    # @return a list of the names of households which were already in the
+    #         store and were not added
+    #
+    def append_records(self, records) :
+        self._log_file.seek(0, os.SEEK_END)
+        log_offset = self._log_file.tell()
+        log_parts = []
+        index_parts = []
+        new_offsets = {}
+        skipped = []
+        offset = 0
+        while offset < len(records) :
+            (length,) = _RECORD_LENGTH.unpack_from(records, offset)
+            record_end = offset + _RECORD_LENGTH.size + length
+            household_name = _record_name(records, offset)
+            if household_name in self._offsets or household_name in new_offsets :
+                skipped.append(household_name)
+            else :
+                log_parts.append(records[offset:record_end])
+                pack_string(index_parts, household_name)
+                index_parts.append(_OFFSET.pack(log_offset))
+                new_offsets[household_name] = log_offset
+                log_offset += record_end - offset
+            offset = record_end
+
+        self._log_file.write(b"".join(log_parts))
+        self._sync_log()
+        self._index_file.write(b"".join(index_parts))
+        self._index_file.flush()
+        self._offsets.update(new_offsets)
+        return skipped
+
+
+    def close(self) :
+        if self._map is not None :
+            self._map.close()
+            self._map = None
+        self._log_file.close()
+        self._index_file.close()
+
+
+    def __enter__(self) :
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) :
+        self.close()
+
+
+## Converts a households text file into a binary store. Households which are
+#  already in the store are skipped.
+#
+# @param text_file_name the name of the households text file
+# @param store a HouseholdStore object
+# @return the number of households added to the store
+#
+def convert_text_file(text_file_name, store) :
+    converted = 0
+    with open(text_file_name, "r") as household_text_file :
+        for household in read_households(household_text_file) :
+            if household.household_name not in store :
+                store.append(household)
+                converted += 1
+    return converted
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory :
+        store_name = os.path.join(directory, "Households")
+
+        print("Test 1: Append and read back a household")
+        try:
+            with HouseholdStore(store_name) as store :
+                store.append(Household("House1", {"personA","personB"},
+                                       {Chore("wash up", 4), Chore("dusting", 1)}))
+                household = store.get("House1")
+                print("\n\tVALID: ", household, household.participants, household.chores)
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 2: Append a household which already exists")
+        try:
+            with HouseholdStore(store_name) as store :
+                store.append(Household("House1", {"personA","personB"},
+                                       {Chore("wash up", 4), Chore("dusting", 1)}))
+                print("\tVALID: ", store.get("House1"))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 3: Convert a text file")
+        try:
+            text_file_name = os.path.join(directory, "Households.txt")
+            with open(text_file_name, "w") as text_file :
+                text_file.write("House1, 2, personA, personB, 2, wash up, 4, dusting, 1 \n"
+                                "House2, 2, personC, personD, 2, empty bin, 2, dusting, 1 \n")
+            with HouseholdStore(store_name) as store :
+                print("\n\tVALID: converted", convert_text_file(text_file_name, store))
+                print("\tVALID: ", list(store.names()), store.get("House2").chores)
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 4: Reopen a store whose last record was only partly written")
+        try:
+            with open(store_name + LOG_EXTENSION, "ab") as log_file :
+                log_file.write(_RECORD_LENGTH.pack(100) + b"House3")
+            with HouseholdStore(store_name) as store :
+                print("\n\tVALID: ", len(store), store.get("House2"))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
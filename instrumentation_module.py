@@ -0,0 +1,324 @@
+##
+#  Timers and counters for the chore chart.
+#
+#  Instrumentation is off unless enable is called, which chore_chart does
+#  for --instrument or when the CHORE_CHART_INSTRUMENT environment variable
+#  is set. While it is off, timer returns one shared object which does
+#  nothing and count returns at once, and functions are only wrapped when it
+#  is turned on, so the hot paths run as they would without it.
+#
+#  When it is on, each operation's latencies are kept in a histogram with a
+#  bucket for each power of two microseconds. cProfile and tracemalloc can
+#  also be run, and their results are written to a file when the
+#  instrumentation is turned off:
+#
+#  python chore_chart.py --instrument
+#  python chore_chart.py --profile chart.prof --trace-memory chart.memory
+#  python -m pstats chart.prof
+
+import cProfile
+import functools
+import os
+import time
+import tracemalloc
+
+ENVIRONMENT_VARIABLE = "CHORE_CHART_INSTRUMENT"
+NUMBER_OF_BUCKETS = 40
+HISTOGRAM_WIDTH = 40
+# the number of lines written to the tracemalloc file
+MEMORY_STATISTICS = 30
+
+
+## Latencies in buckets of powers of two microseconds. Bucket n holds the
+#  latencies of at least 2 ** (n - 1) and less than 2 ** n microseconds.
+#
+class Histogram() :
+
+    def __init__(self) :
+        self.buckets = [0] * NUMBER_OF_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    ## Adds a latency.
+    # @param seconds the latency in seconds
+    #
+    def add(self, seconds) :
+        bucket = min(int(seconds * 1000000).bit_length(), NUMBER_OF_BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum :
+            self.maximum = seconds
+
+    ## Return an upper bound in seconds of a percentile of the latencies.
+    # @param percent the percentile, from 0 to 100
+    #
+    def percentile(self, percent) :
+        needed = self.count * percent / 100
+        seen = 0
+        for bucket, bucket_count in enumerate(self.buckets) :
+            seen += bucket_count
+            if seen >= needed and seen > 0 :
+                return min(2 ** bucket / 1000000, self.maximum)
+        return self.maximum
+
+    ## Return a line for each bucket which is not empty, with a bar for its count.
+    #
+    def __str__(self) :
+        largest = max(self.buckets)
+        lines = []
+        for bucket, bucket_count in enumerate(self.buckets) :
+            if bucket_count > 0 :
+                lines.append("\t\t< {:>10} us {:{}} {}".format(
+                    2 ** bucket, "#" * max(1, bucket_count * HISTOGRAM_WIDTH // largest),
+                    HISTOGRAM_WIDTH, bucket_count))
+        return "\n".join(lines)
+
+
+## Adds the time taken by a block of code to a histogram.
+#
+class _Timer() :
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram) :
+        self._histogram = histogram
+
+    def __enter__(self) :
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback) :
+        self._histogram.add(time.perf_counter() - self._start)
+        return False
+
+
+## A timer which does nothing, used while the instrumentation is off.
+#
+class _NullTimer() :
+
+    __slots__ = ()
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, exception_type, exception, traceback) :
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+## The histograms and counters of one run, and the profilers it started.
+#
+class Instruments() :
+
+    ## Constructor for the Instruments class.
+    #
+    # @param profile_file_name the file which cProfile statistics are written
+    #        to, or None to run without cProfile
+    # @param memory_file_name the file which the lines allocating the most
+    #        memory are written to, or None to run without tracemalloc
+    #
+    def __init__(self, profile_file_name = None, memory_file_name = None) :
+        self.profile_file_name = profile_file_name
+        self.memory_file_name = memory_file_name
+        self.histograms = {}
+        self.counters = {}
+        self._wrapped = []
+        self._profile = None
+        self._started_tracing = False
+
+    def _histogram(self, name) :
+        histogram = self.histograms.get(name)
+        if histogram is None :
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    ## Return a context manager which times a block of code.
+    # @param name the name of the operation
+    #
+    def timer(self, name) :
+        return _Timer(self._histogram(name))
+
+    ## Adds to a counter.
+    #
+    def count(self, name, number = 1) :
+        self.counters[name] = self.counters.get(name, 0) + number
+
+    ## Replaces a function with one which times each call. It is put back
+    #  when the instrumentation is turned off. Callers which imported the
+    #  function by name before it was wrapped are not timed.
+    #
+    # @param owner the module or class which has the function
+    # @param attribute the name of the function
+    # @param name the name of the operation, or None for the function's name
+    #
+    def wrap(self, owner, attribute, name = None) :
+        function = getattr(owner, attribute)
+        histogram = self._histogram(name or attribute)
+
+        @functools.wraps(function)
+        def timed(*arguments, **keywords) :
+            start = time.perf_counter()
+            try :
+                return function(*arguments, **keywords)
+            finally :
+                histogram.add(time.perf_counter() - start)
+
+        self._wrapped.append((owner, attribute, function))
+        setattr(owner, attribute, timed)
+
+    ## Starts cProfile and tracemalloc if they were asked for.
+    #
+    def start(self) :
+        if self.profile_file_name is not None :
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        if self.memory_file_name is not None and not tracemalloc.is_tracing() :
+            tracemalloc.start()
+            self._started_tracing = True
+
+    ## Stops the profilers, writes their results and puts back the wrapped
+    #  functions.
+    #
+    def stop(self) :
+        if self._profile is not None :
+            self._profile.disable()
+            self._profile.dump_stats(self.profile_file_name)
+            self._profile = None
+        if self.memory_file_name is not None and tracemalloc.is_tracing() :
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics("lineno")[:MEMORY_STATISTICS]
+            with open(self.memory_file_name, "w") as memory_file :
+                memory_file.write("Current {:.1f} KiB, peak {:.1f} KiB\n\n".format(current / 1024, peak / 1024))
+                for statistic in statistics :
+                    memory_file.write("{}\n".format(statistic))
+            if self._started_tracing :
+                tracemalloc.stop()
+                self._started_tracing = False
+        for owner, attribute, function in reversed(self._wrapped) :
+            setattr(owner, attribute, function)
+        self._wrapped = []
+
+    ## Return a table of the operations' latencies, with their histograms,
+    #  and the counters.
+    #
+    def __str__(self) :
+        lines = ["{:20} {:>8} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+            "Operation", "count", "total ms", "mean ms", "p50 ms", "p99 ms", "max ms")]
+        for name, histogram in self.histograms.items() :
+            if histogram.count == 0 :
+                continue
+            lines.append("{:20} {:8} {:12.3f} {:10.3f} {:10.3f} {:10.3f} {:10.3f}".format(
+                name, histogram.count, histogram.total * 1000, histogram.total * 1000 / histogram.count,
+                histogram.percentile(50) * 1000, histogram.percentile(99) * 1000, histogram.maximum * 1000))
+            lines.append(str(histogram))
+        if self.counters :
+            lines.append("Counters:")
+            for name, number in self.counters.items() :
+                lines.append("\t{:28} {}".format(name, number))
+        if self.profile_file_name is not None :
+            lines.append("Profile written to {}.".format(self.profile_file_name))
+        if self.memory_file_name is not None :
+            lines.append("Memory use written to {}.".format(self.memory_file_name))
+        return "\n".join(lines)
+
+
+_instruments = None
+
+
+## Return True if the environment variable asks for instrumentation.
+#
+def enabled_by_environment() :
+    return os.environ.get(ENVIRONMENT_VARIABLE, "") not in ("", "0")
+
+
+## Turns the instrumentation on.
+#
+# @param profile_file_name the file for cProfile statistics, or None
+# @param memory_file_name the file for tracemalloc statistics, or None
+# @return the Instruments object, whose wrap method times more functions
+# @exception ValueError raised if the instrumentation is already on
+#
+def enable(profile_file_name = None, memory_file_name = None) :
+    global _instruments
+    if _instruments is not None :
+        raise ValueError("The instrumentation is already on.")
+    _instruments = Instruments(profile_file_name, memory_file_name)
+    _instruments.start()
+    return _instruments
+
+
+## Turns the instrumentation off and writes the profilers' results.
+#
+# @return the Instruments object, or None if the instrumentation was off
+#
+def disable() :
+    global _instruments
+    instruments = _instruments
+    _instruments = None
+    if instruments is not None :
+        instruments.stop()
+    return instruments
+
+
+## Return a context manager which times a block of code while the
+#  instrumentation is on.
+#
+# @param name the name of the operation
+#
+def timer(name) :
+    if _instruments is None :
+        return _NULL_TIMER
+    return _instruments.timer(name)
+
+
+## Adds to a counter while the instrumentation is on.
+#
+def count(name, number = 1) :
+    if _instruments is not None :
+        _instruments.count(name, number)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import tempfile
+    import timeit
+    import household_file_module
+    from benchmark_module import generate_records
+
+    records = list(generate_records(20000))
+
+    print("Test 1: The cost of a timer while the instrumentation is off")
+    try:
+        def timed_block() :
+            with timer("block") :
+                pass
+        print("\n\tVALID:  {:.0f} ns a block".format(timeit.timeit(timed_block, number = 100000) * 10000))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Time validation, profiling and tracing memory")
+    with tempfile.TemporaryDirectory() as directory :
+        try:
+            original = household_file_module.validate_record
+            instruments = enable(os.path.join(directory, "chart.prof"), os.path.join(directory, "chart.memory"))
+            instruments.wrap(household_file_module, "validate_record", "validate")
+            with timer("load") :
+                households = [household_file_module.household_from_record(record) for record in records]
+            count("households", len(households))
+            disable()
+            print("\n\tVALID:  validate_record is put back", household_file_module.validate_record is original)
+            print(instruments)
+            print("\tVALID: ", sorted(os.listdir(directory)))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+##
+#  A registry which loads households from storage when they are first used.
+#
+#  Only the household names are kept when the registry is created. The text
+#  backend takes them from its saved line index without reading the lines,
+#  so a name whose lines are not valid is only found out, and forgotten, when
+#  its household is first looked up; until then it is counted and listed. A
+#  household's participants, chores and chore log are loaded the first time
+#  it is looked up and kept in a least recently used cache of a fixed size.
+#  A household which is evicted from the cache is loaded again, with its
+#  chore log restored from storage, the next time it is used.
+
+from collections import OrderedDict
+
+from household_module import BatchResult
+from name_index_module import NameIndex, DEFAULT_SUGGESTIONS
+
+DEFAULT_CACHE_SIZE = 128
+
+
+class LazyHouseholdRegistry() :
+
+    ## Constructor for the LazyHouseholdRegistry class.
+    #
+    # @param storage the Storage object the households are loaded from.
+    #        Completions must be recorded in the storage, as log_chores does,
+    #        or they are lost when their household is evicted.
+    # @param cache_size the number of households kept in memory
+    #
+    def __init__(self, storage, cache_size = DEFAULT_CACHE_SIZE) :
+        if cache_size < 1 :
+            raise ValueError("The cache size must be at least 1.")
+        self._storage = storage
+        self.cache_size = cache_size
+        self._names = dict.fromkeys(storage.names())
+        self._name_index = NameIndex(self._names.keys())
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self) :
+        return len(self._names)
+
+
+    def __contains__(self, household_name) :
+        return household_name in self._names
+
+
+    ## Iterates over the Household objects in insertion order, loading each
+    #  one in turn.
+    #
+    def __iter__(self) :
+        for household_name in list(self._names) :
+            household = self.get(household_name)
+            if household is not None :
+                yield household
+
+
+    def __str__(self) :
+        return ", ".join(self._names)
+
+
+    ## Return the household names in insertion order.
+    #
+    def names(self) :
+        return self._names.keys()
+
+
+    def _cache_household(self, household) :
+        self._cache[household.household_name] = household
+        if len(self._cache) > self.cache_size :
+            self._cache.popitem(last = False)
+
+
+    ## Return the household with a given name, loading it if it is not in the
+    #  cache.
+    #
+    # @param household_name the name of the household
+    # @return the Household object or None if the household does not exist.
+    #         A household whose record is not valid is reported and forgotten.
+    #
+    def get(self, household_name) :
+        household = self._cache.get(household_name)
+        if household is not None :
+            self.hits += 1
+            self._cache.move_to_end(household_name)
+            return household
+        if household_name not in self._names :
+            return None
+
+        self.misses += 1
+        household = self._storage.get(household_name)
+        if household is None :
+            del self._names[household_name]
+            return None
+        self._storage.restore(household)
+        self._cache_household(household)
+        return household
+
+
+    ## Adds a household to the registry. The household must also be added to
+    #  the storage so that it can be loaded again after it is evicted.
+    #
+    # @param household a Household object
+    # @exception ValueError raised if a household with the same name exists
+    #
+    def add(self, household) :
+        household_name = household.household_name
+        if household_name in self._names :
+            raise ValueError("Household {} already exists.".format(household_name))
+        self._names[household_name] = None
+        self._name_index.add(household_name)
+        self._cache_household(household)
+
+
+    ## Return the names of the households which are most like a name which
+    #  does not exist, most alike first. The households are not loaded.
+    #
+    # @param household_name the name which was not found
+    # @param number the most names to return
+    #
+    def suggest(self, household_name, number = DEFAULT_SUGGESTIONS) :
+        return self._name_index.suggest(household_name, number)
+
+
+    ## Removes a household from the registry. It is not removed from storage.
+    #
+    # @param household_name the name of the household
+    # @exception KeyError raised if the household does not exist
+    #
+    def remove(self, household_name) :
+        del self._names[household_name]
+        self._name_index.remove(household_name)
+        self._cache.pop(household_name, None)
+
+
+    ## Logs completions for many households at once and records them in the
+    #  storage. Each household's rows are applied all together or not at all.
+    #
+    # @param rows an iterable of (household_name, name, chore, number_completed) tuples
+    # @return a dictionary where the keys are household names and the values
+    #         are BatchResult objects
+    #
+    def log_many(self, rows) :
+        rows_each_household = {}
+        for row in rows :
+            rows_each_household.setdefault(row[0], []).append(row[1:])
+
+        results = {}
+        for household_name, household_rows in rows_each_household.items() :
+            household = self.get(household_name)
+            if household is None :
+                results[household_name] = BatchResult(0, len(household_rows))
+                continue
+            result = household.update_log_many(household_rows)
+            if result.applied > 0 :
+                self._storage.record(household_name, household_rows)
+            results[household_name] = result
+        return results
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import os
+    import tempfile
+    import time
+    from storage_module import TEXT_STORAGE, open_storage
+    from benchmark_module import generate_records
+    from household_file_module import household_from_record, format_household_line
+
+    with tempfile.TemporaryDirectory() as directory :
+        store_name = os.path.join(directory, "Households")
+        journal_name = os.path.join(directory, "ChoreLog")
+        with open(store_name + ".txt", "w") as text_file :
+            for record in generate_records(100000) :
+                text_file.write(format_household_line(household_from_record(record)))
+
+        print("Test 1: Open a registry of 100000 households, then open it again with the saved index")
+        try:
+            for attempt in ("indexed", "loaded") :
+                with open_storage(TEXT_STORAGE, store_name, journal_name) as storage :
+                    start = time.perf_counter()
+                    registry = LazyHouseholdRegistry(storage, cache_size = 2)
+                    first = registry.get("H0050000")
+                    print("\n\tVALID:  {} households {} in {:.3f}s".format(len(registry), attempt,
+                                                                         time.perf_counter() - start),
+                          first, sorted(first.participants.participants))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 2: Log chores, evict the household and load it again")
+        try:
+            with open_storage(TEXT_STORAGE, store_name, journal_name) as storage :
+                registry = LazyHouseholdRegistry(storage, cache_size = 2)
+                chore_log = registry.get("H0000007").chore_log
+                name, chore = chore_log.participant_names[0], chore_log.chore_names[0]
+                print("\n\tVALID: ", registry.log_many([("H0000007", name, chore, 3)]))
+                for household_name in ("H0000001", "H0000002", "H0000003") :
+                    registry.get(household_name)
+                household = registry.get("H0000007")
+                print("\tVALID: ", household.leaderboard.top(1), "hits", registry.hits,
+                      "misses", registry.misses)
+                print("\tVALID:  did you mean", registry.suggest("H00000O7"))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from bisect import bisect_left, insort
+
+## The leaderboard for a household.
+#
+# The points for each participant are cached and the ranking is kept sorted
+# as points are added, so reading the leaders does not need a sort. The
+# ranking is a sorted list of (-points, name) pairs: the most points come
+# first and ties are broken by name.
+#
+class Leaderboard() :
+
+    __slots__ = ("_points", "_ranking")
+
+    ## Constructor for the Leaderboard class. Everyone starts with no points.
+    #
+    # @param participant_names an iterable of participant names
+    #
+    def __init__(self, participant_names) :
+        self._points = dict.fromkeys(participant_names, 0)
+        self._ranking = sorted((0, name) for name in self._points)
+
+
+    ## Adds points to a participant's total and moves them in the ranking.
+    #
+    # @param name the participant's name
+    # @param points the number of points to add
+    # @return the participant's new total
+    # @exception ValueError raised if the participant is not on the leaderboard
+    #
+    def add_points(self, name, points) :
+        try :
+            old_points = self._points[name]
+        except KeyError :
+            raise ValueError("{} is not on the leaderboard.".format(name))
+        new_points = old_points + points
+        self._points[name] = new_points
+        del self._ranking[bisect_left(self._ranking, (-old_points, name))]
+        insort(self._ranking, (-new_points, name))
+        return new_points
+
+
+    ## Return the points a participant has earned.
+    #
+    def points(self, name) :
+        try :
+            return self._points[name]
+        except KeyError :
+            raise ValueError("{} is not on the leaderboard.".format(name))
+
+
+    ## Return a participant's position on the leaderboard, starting from 1.
+    #
+    def rank(self, name) :
+        return bisect_left(self._ranking, (-self.points(name), name)) + 1
+
+
+    ## Return the leaders.
+    #
+    # @param k the number of leaders to return, or None for everyone
+    # @return a list of (name, points) tuples with the most points first
+    #
+    def top(self, k = None) :
+        return [(name, -negative_points) for negative_points, name in self._ranking[:k]]
+
+
+    def __iter__(self) :
+        return iter(self.top())
+
+
+    def __len__(self) :
+        return len(self._ranking)
+
+
+    def __str__(self) :
+        return ", ".join("{} ({})".format(name, points) for name, points in self)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    print("Test 1: Add points and read the leaders")
+    try:
+        leaderboard = Leaderboard(["personA", "personB", "personC"])
+        leaderboard.add_points("personB", 8)
+        leaderboard.add_points("personC", 3)
+        leaderboard.add_points("personC", 6)
+        print("\n\tVALID: ", leaderboard, leaderboard.top(1), leaderboard.rank("personB"))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Add points for someone not on the leaderboard")
+    try:
+        leaderboard.add_points("personD", 1)
+        print("\tVALID: ", leaderboard)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+##
+#  Suggestions for a household name which does not exist.
+#
+#  The index holds the names in order of their lower case form, and in
+#  order of that form reversed, so the names which start with the longest
+#  matching prefix of the one entered, or end with its longest matching
+#  suffix, are found by binary search. When none of those is close to it, a
+#  list of names for each three letter sequence (trigram) finds names which
+#  share sequences anywhere, without looking at every name. The candidates
+#  are ranked by edit distance.
+#
+#  The trigrams of a name are indexed when the name is added, which takes a
+#  few microseconds, so the first suggestion does not have to index every
+#  name. Names the registry held when the index was created are indexed
+#  the first time they are needed. The sorted names are built the first
+#  time they are needed, about 0.5s for a million households, and are held
+#  in buckets of at most a few thousand so that a name is added or removed
+#  without moving the others.
+#
+#  A removed name is taken out of the sorted names and its trigram entries
+#  are marked as removed. The trigram lists are rebuilt from the remaining
+#  names once more entries are removed than remain.
+
+import bisect
+from array import array
+
+DEFAULT_SUGGESTIONS = 5
+# a trigram found in more names than this says little about which name was
+# meant, so its names are not counted
+MAXIMUM_POSTINGS = 10000
+# the most candidates from each search which are ranked by edit distance
+CANDIDATES_PER_SUGGESTION = 8
+# the trigrams are searched when no name found by prefix is this close
+CLOSE_DISTANCE = 1
+# the lower case form of a name is kept in front of the name, split by a
+# character which a household name cannot contain
+_KEY_SEPARATOR = "\0"
+
+
+## Return the number of single character insertions, deletions and
+#  substitutions which change one string into another.
+#
+def edit_distance(first, second) :
+    previous = list(range(len(second) + 1))
+    for first_position, first_character in enumerate(first, 1) :
+        current = [first_position]
+        for second_position, second_character in enumerate(second, 1) :
+            current.append(min(previous[second_position] + 1, current[-1] + 1,
+                               previous[second_position - 1] + (first_character != second_character)))
+        previous = current
+    return previous[-1]
+
+
+## Return the trigrams of a name, including those at its start and end.
+#
+def trigrams(name) :
+    padded = "^" + name.lower() + "$"
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+class SortedKeys() :
+
+    # a bucket is split in two when it holds twice this many keys
+    BUCKET_SIZE = 1000
+
+    ## Constructor for the SortedKeys class. The keys are held in sorted
+    #  buckets, with the largest key of each bucket, so a key is added or
+    #  removed by moving the keys of one bucket only.
+    #
+    # @param keys an iterable of strings
+    #
+    def __init__(self, keys = ()) :
+        keys = sorted(keys)
+        self._buckets = [keys[position:position + SortedKeys.BUCKET_SIZE]
+                         for position in range(0, len(keys), SortedKeys.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+
+
+    def add(self, key) :
+        if not self._buckets :
+            self._buckets.append([key])
+            self._maxes.append(key)
+            return
+        position = min(bisect.bisect_left(self._maxes, key), len(self._maxes) - 1)
+        bucket = self._buckets[position]
+        bisect.insort(bucket, key)
+        self._maxes[position] = bucket[-1]
+        if len(bucket) > 2 * SortedKeys.BUCKET_SIZE :
+            upper = bucket[SortedKeys.BUCKET_SIZE:]
+            del bucket[SortedKeys.BUCKET_SIZE:]
+            self._buckets.insert(position + 1, upper)
+            self._maxes.insert(position, bucket[-1])
+
+
+    ## Removes a key. Nothing is done if the key is not held.
+    #
+    def remove(self, key) :
+        position = bisect.bisect_left(self._maxes, key)
+        if position == len(self._maxes) :
+            return
+        bucket = self._buckets[position]
+        key_position = bisect.bisect_left(bucket, key)
+        if key_position == len(bucket) or bucket[key_position] != key :
+            return
+        del bucket[key_position]
+        if bucket :
+            self._maxes[position] = bucket[-1]
+        else :
+            del self._buckets[position]
+            del self._maxes[position]
+
+
+    ## Return the first keys, in order, which start with a prefix.
+    #
+    # @param prefix the string the keys start with
+    # @param limit the most keys to return
+    #
+    def starting_with(self, prefix, limit) :
+        matches = []
+        position = bisect.bisect_left(self._maxes, prefix)
+        if position == len(self._maxes) :
+            return matches
+        key_position = bisect.bisect_left(self._buckets[position], prefix)
+        for bucket in self._buckets[position:] :
+            for key in bucket[key_position:] :
+                if not key.startswith(prefix) or len(matches) == limit :
+                    return matches
+                matches.append(key)
+            key_position = 0
+        return matches
+
+
+class NameIndex() :
+
+    ## Constructor for the NameIndex class.
+    #
+    # @param names the names the registry already holds. They are copied,
+    #        and indexed the first time they are needed.
+    #
+    def __init__(self, names = ()) :
+        self._held_names = dict.fromkeys(names)
+        self._keys = None
+        self._reversed_keys = None
+        # the id of each indexed name, and the name with each id, or None if
+        # the name was removed
+        self._ids = {}
+        self._names = []
+        self._postings = {}
+        self._removed = 0
+
+
+    def _index(self, name) :
+        name_id = len(self._names)
+        self._ids[name] = name_id
+        self._names.append(name)
+        for trigram in trigrams(name) :
+            postings = self._postings.get(trigram)
+            if postings is None :
+                postings = self._postings[trigram] = array("L")
+            postings.append(name_id)
+
+
+    ## Indexes the trigrams of the names held when the index was created.
+    #
+    def _index_held_names(self) :
+        if self._held_names :
+            for name in self._held_names :
+                self._index(name)
+            self._held_names = {}
+
+
+    ## Rebuilds the trigram lists from the names which have not been removed.
+    #
+    def _rebuild_postings(self) :
+        names = list(self._ids)
+        self._ids = {}
+        self._names = []
+        self._postings = {}
+        self._removed = 0
+        for name in names :
+            self._index(name)
+
+
+    ## Adds a name which was added to the registry. Nothing is done if the
+    #  name is already in the index.
+    #
+    def add(self, name) :
+        if name in self._ids or name in self._held_names :
+            return
+        self._index(name)
+        if self._keys is not None :
+            self._keys.add(name.lower() + _KEY_SEPARATOR + name)
+            self._reversed_keys.add(name.lower()[::-1] + _KEY_SEPARATOR + name)
+
+
+    ## Removes a name which was removed from the registry. Nothing is done if
+    #  the name is not in the index.
+    #
+    def remove(self, name) :
+        if name in self._held_names :
+            del self._held_names[name]
+        else :
+            name_id = self._ids.pop(name, None)
+            if name_id is None :
+                return
+            self._names[name_id] = None
+            self._removed += 1
+            if self._removed > len(self._ids) :
+                self._rebuild_postings()
+        if self._keys is not None :
+            self._keys.remove(name.lower() + _KEY_SEPARATOR + name)
+            self._reversed_keys.remove(name.lower()[::-1] + _KEY_SEPARATOR + name)
+
+
+    ## Return the names whose keys start with the longest prefix of a string
+    #  that any key starts with.
+    #
+    @staticmethod
+    def _prefix_matches(keys, prefix, limit) :
+        while prefix :
+            matches = keys.starting_with(prefix, limit)
+            if matches :
+                return [key.split(_KEY_SEPARATOR)[1] for key in matches]
+            prefix = prefix[:-1]
+        return []
+
+
+    ## Return the names which share the longest prefix with a name and those
+    #  which share the longest suffix.
+    #
+    def _affix_matches(self, name, limit) :
+        if self._keys is None :
+            names = list(self._ids) + list(self._held_names)
+            self._keys = SortedKeys(name.lower() + _KEY_SEPARATOR + name for name in names)
+            self._reversed_keys = SortedKeys(name.lower()[::-1] + _KEY_SEPARATOR + name for name in names)
+        lower_name = name.lower()
+        return self._prefix_matches(self._keys, lower_name, limit) + \
+            self._prefix_matches(self._reversed_keys, lower_name[::-1], limit)
+
+
+    ## Return the names which share the most trigrams with a name, leaving
+    #  out the trigrams which are in too many names.
+    #
+    def _trigram_matches(self, name, limit) :
+        self._index_held_names()
+        shared = {}
+        for trigram in trigrams(name) :
+            postings = self._postings.get(trigram)
+            if postings is None or len(postings) > MAXIMUM_POSTINGS :
+                continue
+            for name_id in postings :
+                shared[name_id] = shared.get(name_id, 0) + 1
+        best = sorted((name_id for name_id in shared if self._names[name_id] is not None),
+                      key = shared.get, reverse = True)[:limit]
+        return [self._names[name_id] for name_id in best]
+
+
+    ## Return the names which are most like a name, most alike first.
+    #
+    # @param name the name which was not found
+    # @param number the most names to return
+    # @return a list of names which are in the registry
+    #
+    def suggest(self, name, number = DEFAULT_SUGGESTIONS) :
+        limit = number * CANDIDATES_PER_SUGGESTION
+        lower_name = name.lower()
+        distances = {}
+        for candidate in self._affix_matches(name, limit) :
+            if candidate != name :
+                distances[candidate] = edit_distance(lower_name, candidate.lower())
+        if not distances or min(distances.values()) > CLOSE_DISTANCE :
+            for candidate in self._trigram_matches(name, limit) :
+                if candidate != name and candidate not in distances :
+                    distances[candidate] = edit_distance(lower_name, candidate.lower())
+        return sorted(distances, key = lambda candidate : (distances[candidate], candidate))[:number]
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import time
+    from benchmark_module import generate_records
+
+    print("Test 1: Suggest names for names which are mistyped")
+    try:
+        names = dict.fromkeys(["House1", "House2", "Flat12", "Cottage", "Manor", "Bungalow"])
+        index = NameIndex(names.keys())
+        print("\n\tVALID: ", index.suggest("house3"), index.suggest("Cotage"), index.suggest("Bungalo"),
+              index.suggest("Fla"))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Add and remove names once the index is built, then add one again")
+    try:
+        index.add("Houseboat")
+        index.remove("House2")
+        removed = index.suggest("House2")
+        index.add("House2")
+        index.add("House2")
+        print("\n\tVALID: ", index.suggest("Housebot"), removed, index.suggest("House"),
+              index.suggest("Hse2"))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 3: Suggest names from 1000000 names which were added one at a time")
+    try:
+        names = [record.name for record in generate_records(1000000)]
+        index = NameIndex()
+        start = time.perf_counter()
+        for name in names :
+            index.add(name)
+        print("\n\tVALID:  added in {:.3f}s".format(time.perf_counter() - start))
+        for mistyped_name in ("H0500O01", "X0500001", "H05X0001", "Q9Z9Q9Z") :
+            start = time.perf_counter()
+            index.suggest(mistyped_name)
+            built = time.perf_counter() - start
+            start = time.perf_counter()
+            for attempt in range(100) :
+                suggestions = index.suggest(mistyped_name)
+            print("\n\tVALID:  {} first in {:.3f}s, then {:.3f} ms a suggestion".format(
+                mistyped_name, built, (time.perf_counter() - start) * 10), suggestions)
+        start = time.perf_counter()
+        for name in names[:600000] :
+            index.remove(name)
+        removed = time.perf_counter() - start
+        start = time.perf_counter()
+        index.add("H0000001")
+        print("\n\tVALID:  removed 600000 in {:.3f}s, added one in {:.3f} ms".format(
+            removed, (time.perf_counter() - start) * 1000), index.suggest("H050O001"), index.suggest("H0000O01"))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
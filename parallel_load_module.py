@@ -0,0 +1,421 @@
+##
+#  Parallel loading of the Households.txt file.
+#
+#  The file is split at line boundaries into byte ranges which are parsed and
+#  validated in separate processes. Each process returns its valid households
+#  as binary records (see household_store_module) together with the line
+#  numbers of the households and of the invalid lines, rather than pickled
+#  Household objects. The records are decoded in file order, so a household
+#  name which is repeated in another range is still found by the registry.
+#  In QUARANTINE mode each process also returns the text of its valid lines,
+#  so a repeated household is copied to the quarantine file as it was
+#  written.
+#
+#  read_households_parallel has to build the Household objects in this
+#  process, so its processes return each range as marshalled tuples of
+#  strings instead (see load_range), which are much quicker to adopt than
+#  binary records are to decode, and households with the same chores share
+#  one set of Chore objects while they are built.
+#  import_text_file_parallel adds the records to storage without building
+#  them, which the binary backend does without decoding them, so its time
+#  falls with the number of processes. Unless a number of processes greater
+#  than one is given, the ranges are read one after another in this process.
+#  Each range is read a line at a time, so a range is never held in memory
+#  as a whole, and in FAIL_FAST mode the ranges which have not been read are
+#  cancelled when the first invalid line is reported.
+
+import marshal
+import os
+import sys
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from config_module import Limits, limits_for, get_household_limits, set_household_limits
+from household_file_module import parse_household_line, validate_record, is_complete_line, \
+    RecordError, TORN_LINE_ERROR, DUPLICATE_ERROR, QUARANTINE
+from household_store_module import encode_household_fields, decode_households
+from household_module import Household
+from chores_list_module import Chore
+
+# Each process is given a few ranges so that a slow range does not hold up
+# the others.
+RANGES_PER_WORKER = 4
+MINIMUM_RANGE_SIZE = 1024 * 1024
+
+
+## Splits a file into byte ranges which start at the beginning of a line.
+#
+# @param file_name the name of the file
+# @param number_of_ranges the largest number of ranges to return
+# @return a list of (start, end) tuples covering the whole file
+#
+def split_file(file_name, number_of_ranges) :
+    size = os.path.getsize(file_name)
+    number_of_ranges = max(1, min(number_of_ranges, size // MINIMUM_RANGE_SIZE))
+    boundaries = [0]
+    with open(file_name, "rb") as household_binary_file :
+        for range_number in range(1, number_of_ranges) :
+            household_binary_file.seek(max(boundaries[-1], size * range_number // number_of_ranges))
+            household_binary_file.readline()
+            boundary = household_binary_file.tell()
+            if boundary < size and boundary > boundaries[-1] :
+                boundaries.append(boundary)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+## Reads the lines of a byte range one at a time, with universal newlines.
+#
+def _range_lines(file_name, start, end) :
+    with open(file_name, "rb") as household_binary_file :
+        household_binary_file.seek(start)
+        position = start
+        while position < end :
+            binary_line = household_binary_file.readline(end - position)
+            if not binary_line :
+                return
+            position += len(binary_line)
+            line = str(binary_line, "utf-8")
+            if line.endswith("\r\n") :
+                line = line[:-2] + "\n"
+            yield line
+
+
+## Parses and validates one range of the file. This runs in a worker process.
+#  The valid households are returned either as binary records, which storage
+#  can add without decoding them, or as rows, which are marshalled tuples of
+#  the household name, the participants, the (chore name, frequency) pairs
+#  and the values of the household's Limits or None (see adopt_rows).
+#
+# @param file_name the name of the households file
+# @param start the offset of the first line of the range
+# @param end the offset following the last line of the range
+# @param keep_lines True if the text of each valid line should be returned
+# @param as_rows True if the households should be returned as rows
+# @return a tuple containing the number of lines, the valid households as
+#         concatenated binary records or as rows, the line number of each
+#         household as bytes, a list of (line number, error class, message,
+#         line) tuples for the invalid lines, and a list of the valid lines
+#         or None if they were not kept. Line numbers are counted from the
+#         start of the range.
+#
+def load_range(file_name, start, end, keep_lines = False, as_rows = False) :
+    records = []
+    line_numbers = array("I")
+    errors = []
+    valid_lines = [] if keep_lines else None
+    line_number = 0
+    for line in _range_lines(file_name, start, end) :
+        line_number += 1
+        if line.strip() == "" :
+            continue
+        if not line.endswith("\n") and not is_complete_line(line) :
+            errors.append((line_number, TORN_LINE_ERROR, None, line))
+            continue
+        try :
+            record = parse_household_line(line, line_number)
+            limits = limits_for(record.name, record.limits)
+            household_names, chores_list = validate_record(record, limits)
+        except RecordError as err :
+            errors.append((line_number, err.error_class, str(err), line))
+            continue
+        if as_rows :
+            records.append((record.name, tuple(household_names),
+                            tuple((chore.chore_name, int(chore.frequency)) for chore in chores_list),
+                            None if limits is None else limits.values()))
+        else :
+            records.append(encode_household_fields(record.name, household_names, chores_list, limits))
+        line_numbers.append(line_number)
+        if keep_lines :
+            valid_lines.append(line)
+    records = marshal.dumps(records) if as_rows else b"".join(records)
+    return line_number, records, line_numbers.tobytes(), errors, valid_lines
+
+
+## Builds a Household for each row returned by load_range. The rows were
+#  validated by load_range so they are not checked again.
+#
+# @param rows the marshalled rows
+# @return a generator of Household objects
+#
+def adopt_rows(rows) :
+    intern = sys.intern
+    chore_sets = {}
+    for household_name, participants, chores, limits in marshal.loads(rows) :
+        chore_set = chore_sets.get(chores)
+        if chore_set is None :
+            chore_set = frozenset(Chore.shared(chore_name, frequency) for chore_name, frequency in chores)
+            chore_sets[chores] = chore_set
+        yield Household.from_validated(household_name, set(map(intern, participants)), set(chore_set),
+                                       None if limits is None else Limits(*limits))
+
+
+## Return the message for an invalid line, in the same words as read_households.
+#  The line number in a format error's message is counted from the start of
+#  its range, so the message is written again.
+#
+def error_message(line_number, error_class, message) :
+    if error_class == TORN_LINE_ERROR :
+        return "Line {} was only partly written and has been skipped.".format(line_number)
+    return "Line {} is not a valid household record.".format(line_number) \
+        if message.startswith("Line ") else message
+
+
+## Reports the invalid lines of one range, to the report if there is one or
+#  else in the same way as read_households.
+#
+def report_errors(first_line, errors, report) :
+    for line_number, error_class, message, line in errors :
+        line_number += first_line
+        message = error_message(line_number, error_class, message)
+        if report is not None :
+            report.add_error(line_number, error_class, message, line)
+        elif error_class == TORN_LINE_ERROR :
+            print(message)
+        else :
+            print("{}\n\n\nPlease correct line {} of the text file, first Quit the application"
+                  .format(message, line_number))
+
+
+## Adds the households of one range which storage skipped to the report. The
+#  storage skips the last occurrences of a repeated name, so the records are
+#  decoded to find their lines.
+#
+# @param valid_lines the text of each household's line, or None if the lines
+#        were not kept
+#
+def report_skipped(first_line, records, record_line_numbers, valid_lines, skipped, report) :
+    skipped_each_name = Counter(skipped)
+    households = list(decode_households(records))
+    occurrences = Counter(household.household_name for household in households)
+    seen = Counter()
+    for position, (household, line_number) in enumerate(zip(households, array("I", record_line_numbers))) :
+        household_name = household.household_name
+        if household_name not in skipped_each_name :
+            continue
+        seen[household_name] += 1
+        if seen[household_name] > occurrences[household_name] - skipped_each_name[household_name] :
+            report.add_error(first_line + line_number, DUPLICATE_ERROR,
+                             "Household {} already exists in the store.".format(household_name),
+                             None if valid_lines is None else valid_lines[position])
+
+
+## Gives a worker process the limits of this process, for the deployment
+#  and for single households.
+#
+def _use_limits(limits, household_limits) :
+    limits.apply()
+    set_household_limits(household_limits)
+
+
+## Parses and validates the households file using several processes.
+#
+# @param file_name the name of the households file
+# @param workers the number of processes. The file is read in this process
+#        if it is None or 1.
+# @param keep_lines True if the text of each valid line should be returned
+# @param as_rows True if the households should be returned as rows
+# @return a generator of tuples, in file order, containing the line number
+#         before the range, the number of lines in the range, the valid
+#         households as concatenated binary records or as rows, the line
+#         number of each household as bytes, a list of (line number, error
+#         class, message, line) tuples for the invalid lines, and a list of
+#         the valid lines or None. Line numbers are counted from the start
+#         of the range.
+#
+def read_ranges(file_name, workers = None, keep_lines = False, as_rows = False) :
+    if workers is None or workers <= 1 :
+        first_line = 0
+        for start, end in split_file(file_name, RANGES_PER_WORKER) :
+            lines, records, record_line_numbers, errors, valid_lines = \
+                load_range(file_name, start, end, keep_lines, as_rows)
+            yield first_line, lines, records, record_line_numbers, errors, valid_lines
+            first_line += lines
+        return
+    ranges = split_file(file_name, workers * RANGES_PER_WORKER)
+    first_line = 0
+    # the workers validate with the same limits as this process
+    executor = ProcessPoolExecutor(workers, initializer = _use_limits,
+                                   initargs = (Limits.current(), get_household_limits()))
+    try :
+        results = executor.map(load_range, [file_name] * len(ranges), [start for start, end in ranges],
+                               [end for start, end in ranges], [keep_lines] * len(ranges),
+                               [as_rows] * len(ranges))
+        for lines, records, record_line_numbers, errors, valid_lines in results :
+            yield first_line, lines, records, record_line_numbers, errors, valid_lines
+            first_line += lines
+    finally :
+        # the ranges which have not started are not read if the caller
+        # stopped early, for example when a FAIL_FAST report raised
+        executor.shutdown(cancel_futures = True)
+
+
+## Reads the households file using several processes and yields a validated
+#  Household for each line, in file order. Invalid lines are added to the
+#  report, or printed if there is no report.
+#
+# @param file_name the name of the households file
+# @param workers the number of processes. The file is read in this process
+#        if it is None or 1.
+# @param stats an optional LoadStats object
+# @param report an optional LoadReport object
+# @return a generator of Household objects
+# @exception RecordError raised by the report in FAIL_FAST mode
+#
+def read_households_parallel(file_name, workers = None, stats = None, report = None) :
+    keep_lines = report is not None and report.mode == QUARANTINE
+    for first_line, lines, rows, record_line_numbers, errors, valid_lines in \
+            read_ranges(file_name, workers, keep_lines, as_rows = True) :
+        report_errors(first_line, errors, report)
+        record_line_numbers = array("I", record_line_numbers)
+        for position, (household, line_number) in enumerate(zip(adopt_rows(rows),
+                                                                record_line_numbers)) :
+            if stats is not None :
+                stats.households += 1
+            if report is not None :
+                report.loaded += 1
+                report.line_number = first_line + line_number
+                report.line = None if valid_lines is None else valid_lines[position]
+            yield household
+        if stats is not None :
+            stats.lines = first_line + lines
+
+
+## Adds every valid household in the households file to storage, using
+#  several processes. The households are not built in this process, so with
+#  the binary backend the time taken falls with the number of processes.
+#
+# @param file_name the name of the households file
+# @param storage a Storage object
+# @param workers the number of processes. The file is read in this process
+#        if it is None or 1.
+# @param report an optional LoadReport object
+# @return a tuple containing the number of households added and the number
+#         of lines which were invalid or repeated a household
+# @exception RecordError raised by the report in FAIL_FAST mode
+#
+def import_text_file_parallel(file_name, storage, workers = None, report = None) :
+    added = 0
+    rejected = 0
+    keep_lines = report is not None and report.mode == QUARANTINE
+    for first_line, lines, records, record_line_numbers, errors, valid_lines in \
+            read_ranges(file_name, workers, keep_lines) :
+        report_errors(first_line, errors, report)
+        rejected += len(errors)
+        skipped = storage.add_records(records)
+        if report is not None and skipped :
+            report_skipped(first_line, records, record_line_numbers, valid_lines, skipped, report)
+        elif report is None :
+            for household_name in skipped :
+                print("Household {} already exists in the store.".format(household_name))
+        count = len(record_line_numbers) // array("I").itemsize
+        added += count - len(skipped)
+        rejected += len(skipped)
+        if report is not None :
+            report.loaded += count - len(skipped)
+    return added, rejected
+
+
+## main method
+#
+# Compares loading a generated file with one process and with several.
+#
+def main():
+    import tempfile
+    from benchmark_module import generate_records
+    from household_file_module import LoadStats, read_households, format_household_line, \
+        household_from_record
+    from household_registry_module import HouseholdRegistry
+
+    with tempfile.TemporaryDirectory() as directory :
+        text_file_name = os.path.join(directory, "Households.txt")
+        with open(text_file_name, "w") as text_file :
+            for record in generate_records(200000) :
+                text_file.write(format_household_line(household_from_record(record)))
+            text_file.write("H0000005, 2, personA, personB, 2, wash up, 4, dusting, 1 \n")
+            text_file.write("**, 2, personA, personB, 2, wash up, 4, dusting, 1 \n")
+
+        print("Test 1: Load 200002 lines with one process")
+        try:
+            stats = LoadStats(trace_memory = False)
+            stats.start()
+            with open(text_file_name, "r") as text_file :
+                serial = HouseholdRegistry()
+                for household in read_households(text_file, stats) :
+                    if household.household_name not in serial :
+                        serial.add(household)
+            stats.stop()
+            print("\n\tVALID: ", stats)
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 2: Load the same file with {} processes".format(os.cpu_count()))
+        try:
+            stats = LoadStats(trace_memory = False)
+            stats.start()
+            parallel = HouseholdRegistry()
+            for household in read_households_parallel(text_file_name, os.cpu_count(), stats) :
+                try :
+                    parallel.add(household)
+                except ValueError as err :
+                    print(err)
+            stats.stop()
+            print("\n\tVALID: ", stats, list(parallel.names()) == list(serial.names()))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 3: Import the file into a binary store with one process and with {}"
+              .format(os.cpu_count()))
+        try:
+            import time
+            from storage_module import BinaryStorage
+            from household_store_module import HouseholdStore, convert_text_file
+
+            start = time.perf_counter()
+            with HouseholdStore(os.path.join(directory, "Serial")) as store :
+                convert_text_file(text_file_name, store)
+            serial_time = time.perf_counter() - start
+            start = time.perf_counter()
+            store_name = os.path.join(directory, "Parallel")
+            with BinaryStorage(store_name, store_name) as storage :
+                added, rejected = import_text_file_parallel(text_file_name, storage, os.cpu_count())
+                print("\n\tVALID:  added {}, rejected {}, {:.3f}s with one process, {:.3f}s in parallel"
+                      .format(added, rejected, serial_time, time.perf_counter() - start),
+                      list(storage.names()) == list(serial.names()))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 4: Import the file, copying the rejected lines to a quarantine file")
+        try:
+            from household_file_module import LoadReport, QUARANTINE
+
+            quarantine_file_name = os.path.join(directory, "Households.rejected")
+            report = LoadReport(QUARANTINE, quarantine_file_name)
+            store_name = os.path.join(directory, "Quarantined")
+            with BinaryStorage(store_name, store_name) as storage :
+                import_text_file_parallel(text_file_name, storage, os.cpu_count(), report)
+            report.close()
+            with open(quarantine_file_name) as quarantine_file :
+                print("\n\tVALID: ", quarantine_file.read().splitlines())
+        except Exception as err:
+            print("\tERROR: ", err)
+
+        print("\nTest 5: Stop at the first invalid line in FAIL_FAST mode")
+        try:
+            from household_file_module import FAIL_FAST
+
+            with open(text_file_name, "r+") as text_file :
+                text_file.seek(0)
+                text_file.write("**")
+            start = time.perf_counter()
+            list(read_households_parallel(text_file_name, os.cpu_count(), report = LoadReport(FAIL_FAST)))
+            print("\tERROR:  the invalid first line was not reported")
+        except RecordError as err:
+            print("\n\tVALID: ", err, "after {:.3f}s".format(time.perf_counter() - start))
+        except Exception as err:
+            print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
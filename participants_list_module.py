@@ -1,4 +1,9 @@
+from validation_module import participant_name_error
+from rendering_module import render_participants
+
 class Participants():
+
+    __slots__ = ("_participants",)
  
     ## Constants used for validation
     MINIMUM_NAME_LENGTH = 3     # Used to validate team member's name
@@ -9,9 +14,25 @@ class Participants():
 
     ## Constructor for the set containing participant's names.
     # @param the_participants a set containing the names
+    # @param limits an optional Limits object used instead of the class
+    #        constants to check the number of participants
     #              
-    def __init__(self, the_participants) :
-        self.participants = the_participants
+    def __init__(self, the_participants, limits = None) :
+        if limits is None :
+            self.participants = the_participants
+        else :
+            self.valid_participants(the_participants, limits)
+            self._participants = the_participants
+
+    ## Alternative constructor for names which have already been validated,
+    #  for example by a loader. The names are not checked again.
+    # @param the_participants a set containing the names
+    #              
+    @classmethod
+    def from_validated(cls, the_participants) :
+        participants = cls.__new__(cls)
+        participants._participants = the_participants
+        return participants
 
     ## Return the participants' list.
     #          
@@ -35,16 +56,7 @@ class Participants():
 
 
     def __str__(self):
-        length = len(self.participants)
-        i = 1
-        participants_string = ""
-        for participant in self.participants :
-            participants_string = participants_string + str(participant)
-            if i < length :
-                participants_string = participants_string + ","
-            i = i + 1
-            
-        return participants_string
+        return render_participants(map(str, self.participants))
 
 
     ## Check the set of participants.
@@ -52,17 +64,18 @@ class Participants():
     # Verifies that each participants is valid.
     # 
     # @param the_participants the set of participants to be validated
+    # @param limits an optional Limits object
     # @return True if the set conforms to the validation conditions
     #         and raise exception if it does not.
     #
     @staticmethod
-    def  valid_participants(the_participants) :
+    def  valid_participants(the_participants, limits = None) :
         if not isinstance(the_participants, set) :
             raise TypeError("List of participants is not a set.")
         
         try :
             Participants.is_valid_naming(the_participants)
-            Participants.is_valid_length(the_participants)
+            Participants.is_valid_length(the_participants, limits)
         except ValueError as err :
             raise
         
@@ -70,13 +83,10 @@ class Participants():
 
     def is_valid_naming(the_participants):
         for member in the_participants:
-            if len(member) < Participants.MINIMUM_NAME_LENGTH or \
-               len(member) > Participants.MAXIMUM_NAME_LENGTH :
-                raise ValueError(("\n\t\t{} is not valid. The Participant's name must" +
-                   " be more than {} and less than {}.").format(member, Participants.MINIMUM_NAME_LENGTH - 1, Participants.MAXIMUM_NAME_LENGTH + 1))
-
-            if not member.isalnum():
-                raise ValueError(("\n\t\t{} is not valid. Names must be alphanumeric").format(member))
+            message = participant_name_error(member, Participants.MINIMUM_NAME_LENGTH,
+                                             Participants.MAXIMUM_NAME_LENGTH)
+            if message is not None :
+                raise ValueError(message)
         return True
 
 
@@ -84,14 +94,20 @@ class Participants():
 
     ## Check the number of participants in the set is the right length.
     # 
+    # @param limits an optional Limits object used instead of the class constants
     # @return True if valid and generate an exception if not.
     #           
     @staticmethod        
-    def is_valid_length(the_participants) :
-        if len(the_participants) < Participants.MINIMUM_HOUSEHOLD_SIZE or \
-           len(the_participants) > Participants.MAXIMUM_HOUSEHOLD_SIZE :
+    def is_valid_length(the_participants, limits = None) :
+        if limits is None :
+            minimum = Participants.MINIMUM_HOUSEHOLD_SIZE
+            maximum = Participants.MAXIMUM_HOUSEHOLD_SIZE
+        else :
+            minimum = limits.minimum_household_size
+            maximum = limits.maximum_household_size
+        if len(the_participants) < minimum or len(the_participants) > maximum :
             raise ValueError(("\n\t\tThe number of participants" +
-               " must be more than {} and less than {}.").format(Participants.MINIMUM_HOUSEHOLD_SIZE - 1, Participants.MAXIMUM_HOUSEHOLD_SIZE + 1))
+               " must be more than {} and less than {}.").format(minimum - 1, maximum + 1))
  
         # If we reached this point then the checks passed
         return True
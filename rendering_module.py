@@ -0,0 +1,125 @@
+##
+#  Text rendering for participants, chores, chore logs and leaderboards.
+#
+#  The strings are built with join or written straight to a file object, so
+#  the time taken grows linearly with the amount of text.
+
+import io
+
+COLUMN_GAP = "  "
+
+
+## Return the participants' names separated by commas.
+#
+# @param the_participants an iterable of names
+#
+def render_participants(the_participants) :
+    return ",".join(the_participants)
+
+
+## Return the chores separated by commas, for example "wash up (4), dusting (1)".
+#
+# @param the_chores an iterable of Chore objects
+#
+def render_chores(the_chores) :
+    return ", ".join(map(str, the_chores))
+
+
+## Writes the chore log as a table with a row for each participant and a
+#  column for each chore. Each row is written as soon as it is formatted.
+#
+# @param chore_log a ChoreLog object
+# @param file a file object open for writing
+#
+def write_chore_log(chore_log, file) :
+    chore_names = chore_log.chore_names
+    counts = chore_log.counts
+    number_of_chores = len(chore_names)
+    name_width = max([len("Name")] + [len(name) for name in chore_log.participant_names])
+    widths = [max(len(name), len(str(max(counts[column::number_of_chores], default = 0))))
+              for column, name in enumerate(chore_names)]
+
+    file.write(COLUMN_GAP.join(["Name".ljust(name_width)] +
+                               [name.rjust(width) for name, width in zip(chore_names, widths)]))
+    file.write("\n")
+    start = 0
+    for name in chore_log.participant_names :
+        row = counts[start:start + number_of_chores]
+        file.write(COLUMN_GAP.join([name.ljust(name_width)] +
+                                   [str(count).rjust(width) for count, width in zip(row, widths)]))
+        file.write("\n")
+        start += number_of_chores
+
+
+## Return the chore log as a table.
+#
+# @param chore_log a ChoreLog object
+#
+def render_chore_log(chore_log) :
+    text = io.StringIO()
+    write_chore_log(chore_log, text)
+    return text.getvalue()
+
+
+## Writes a leaderboard, one numbered line for each participant.
+#
+# @param leaderboard a Leaderboard object
+# @param file a file object open for writing
+# @param k the number of leaders to write, or None for everyone
+#
+def write_leaderboard(leaderboard, file, k = None) :
+    position = 0
+    for name, points in leaderboard.top(k) :
+        position += 1
+        file.write("{}. \t{} \t{} points\n".format(position, name, points))
+
+
+## Return a leaderboard as numbered lines.
+#
+# @param leaderboard a Leaderboard object
+# @param k the number of leaders to include, or None for everyone
+#
+def render_leaderboard(leaderboard, k = None) :
+    text = io.StringIO()
+    write_leaderboard(leaderboard, text, k)
+    return text.getvalue()
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import sys
+    from household_module import Household
+    from chores_list_module import Chore
+
+    h = Household("House1", {"personA","personB","personC"},
+                  {Chore("wash up", 4), Chore("vacuum stairs", 2), Chore("dusting",1)})
+    h.update_log("personA", "wash up", 49)
+    h.update_log("personC", "dusting", 3)
+
+    print("Test 1: Render the participants and chores")
+    try:
+        print("\n\tVALID: ", render_participants(sorted(h.participants.participants)),
+              "|", render_chores(sorted(h.chores.chores, key = lambda chore : chore.chore_name)))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Render the chore log")
+    try:
+        print()
+        print(h.chore_log_string())
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("Test 3: Write the leaderboard to a file")
+    try:
+        print()
+        write_leaderboard(h.leaderboard, sys.stdout)
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
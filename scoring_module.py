@@ -0,0 +1,173 @@
+##
+#  Computes the leaderboards for many households in one pass.
+#
+#  The chore logs of all the households are joined into one array of counts,
+#  with a matching array holding the points each cell is worth (the chore
+#  frequency). The points for every participant are then the sums of the
+#  weighted rows. NumPy is used when it is installed; otherwise the same
+#  calculation is done with the array module.
+
+from array import array
+
+try :
+    import numpy
+except ImportError :
+    numpy = None
+
+
+class Scores() :
+
+    ## Constructor for the Scores class.
+    #
+    # @param household_names a list of household names
+    # @param participant_names a list of participant names, grouped by household
+    # @param owners a list giving the household position of each participant
+    # @param points a list giving the points of each participant
+    # @param household_order the participant positions ordered by household
+    #        and then by points
+    # @param global_order the participant positions ordered by points
+    #
+    def __init__(self, household_names, participant_names, owners, points,
+                 household_order, global_order) :
+        self._household_names = household_names
+        self._household_position = {name : position for position, name in enumerate(household_names)}
+        self._participant_names = participant_names
+        self._owners = owners
+        self._points = points
+        self._household_order = household_order
+        self._global_order = global_order
+        self._household_start = [0] * (len(household_names) + 1)
+        for owner in owners :
+            self._household_start[owner + 1] += 1
+        for position in range(len(household_names)) :
+            self._household_start[position + 1] += self._household_start[position]
+
+
+    ## Return the household names in the order they were scored.
+    #
+    @property
+    def household_names(self) :
+        return self._household_names
+
+
+    ## Return the leaderboard for a household.
+    #
+    # @param household_name the name of the household
+    # @return a list of (name, points) tuples with the most points first
+    # @exception ValueError raised if the household was not scored
+    #
+    def leaderboard(self, household_name) :
+        try :
+            position = self._household_position[household_name]
+        except KeyError :
+            raise ValueError("Household {} was not scored.".format(household_name))
+        start = self._household_start[position]
+        end = self._household_start[position + 1]
+        return [(self._participant_names[participant], int(self._points[participant]))
+                for participant in self._household_order[start:end]]
+
+
+    ## Return the leaders across all the households.
+    #
+    # @param k the number of leaders to return, or None for everyone
+    # @return a list of (household name, name, points) tuples with the most points first
+    #
+    def global_ranking(self, k = None) :
+        return [(self._household_names[self._owners[participant]],
+                 self._participant_names[participant],
+                 int(self._points[participant]))
+                for participant in self._global_order[:k]]
+
+
+## Computes every household's leaderboard and a ranking across households.
+#  A chore is worth its frequency in points each time it is done. Ties are
+#  broken by household order and then by name.
+#
+# @param households an iterable of Household objects
+# @return a Scores object
+#
+def score_households(households) :
+    household_names = []
+    participant_names = []
+    owners = array("l")
+    row_lengths = array("l")
+    counts = array("l")
+    weights = array("l")
+    for household in households :
+        chore_log = household.chore_log
+        number_of_participants = len(chore_log.participant_names)
+        owners.extend(array("l", [len(household_names)]) * number_of_participants)
+        row_lengths.extend(array("l", [len(chore_log.chore_names)]) * number_of_participants)
+        household_names.append(household.household_name)
+        participant_names.extend(chore_log.participant_names)
+        counts.extend(chore_log.counts)
+        weights.extend(array("l", household.chore_weights) * number_of_participants)
+
+    if len(owners) == 0 :
+        return Scores(household_names, participant_names, [], [], [], [])
+    if numpy is not None :
+        return _score_numpy(household_names, participant_names, owners, row_lengths, counts, weights)
+    return _score_python(household_names, participant_names, owners, row_lengths, counts, weights)
+
+
+def _score_numpy(household_names, participant_names, owners, row_lengths, counts, weights) :
+    long_type = numpy.dtype("l")
+    owners = numpy.frombuffer(owners, dtype = long_type)
+    row_lengths = numpy.frombuffer(row_lengths, dtype = long_type)
+    cells = numpy.frombuffer(counts, dtype = long_type) * numpy.frombuffer(weights, dtype = long_type)
+
+    row_starts = numpy.cumsum(row_lengths) - row_lengths
+    points = numpy.add.reduceat(cells, row_starts)
+    household_order = numpy.lexsort((-points, owners))
+    global_order = numpy.argsort(-points, kind = "stable")
+    return Scores(household_names, participant_names, owners.tolist(), points.tolist(),
+                  household_order.tolist(), global_order.tolist())
+
+
+def _score_python(household_names, participant_names, owners, row_lengths, counts, weights) :
+    points = []
+    start = 0
+    for row_length in row_lengths :
+        end = start + row_length
+        points.append(sum(map(int.__mul__, counts[start:end], weights[start:end])))
+        start = end
+
+    participants = range(len(points))
+    household_order = sorted(participants, key = lambda participant : (owners[participant], -points[participant]))
+    global_order = sorted(participants, key = lambda participant : -points[participant])
+    return Scores(household_names, participant_names, owners.tolist(), points,
+                  household_order, global_order)
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    from household_module import Household
+    from chores_list_module import Chore
+
+    print("Test 1: Score two households")
+    try:
+        h1 = Household("House1", {"personA","personB","personC"}, {Chore("wash up", 4), Chore("dusting", 1)})
+        h2 = Household("House2", {"personD","personE"}, {Chore("empty bin", 2), Chore("dusting", 1), Chore("vacuum", 3)})
+        h1.update_log("personB", "wash up", 2)
+        h1.update_log("personC", "dusting", 3)
+        h2.update_log("personE", "vacuum", 5)
+        h2.update_log("personD", "empty bin", 1)
+        scores = score_households([h1, h2])
+        print("\n\tVALID: ", scores.leaderboard("House1"), h1.leaderboard.top())
+        print("\tVALID: ", scores.leaderboard("House2"), h2.leaderboard.top())
+        print("\tVALID: ", scores.global_ranking(3))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Read the leaderboard of a household which was not scored")
+    try:
+        print("\tVALID: ", scores.leaderboard("House3"))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
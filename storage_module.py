@@ -0,0 +1,587 @@
+##
+#  Storage backends for households and their chore logs.
+#
+#  Every backend has the same methods, so the chore chart can keep its data
+#  in any of them:
+#
+#  TextStorage    households in Households.txt, completions in a ChoreJournal
+#  BinaryStorage  households in a HouseholdStore, completions in a ChoreJournal
+#  SQLiteStorage  households, participants, chores and completions in a
+#                 SQLite database
+#
+#  The SQLite backend answers leaderboard queries in the database, so
+#  households with millions of completions do not have to be loaded.
+
+import sqlite3
+import sys
+from abc import ABC, abstractmethod
+
+from household_module import Household
+from chores_list_module import Chore
+from household_file_module import FLUSH_ON_CREATE, DEFAULT_FLUSH_EVERY, HouseholdWriter, HouseholdLineIndex, \
+    LINE_INDEX_EXTENSION, RecordError, read_households, parse_household_line, household_from_record, \
+    compact_household_file
+from household_store_module import HouseholdStore, decode_households
+from chore_journal_module import ChoreJournal
+from config_module import Limits, limits_for
+
+TEXT_STORAGE = "text"
+BINARY_STORAGE = "binary"
+SQLITE_STORAGE = "sqlite"
+STORAGE_KINDS = (TEXT_STORAGE, BINARY_STORAGE, SQLITE_STORAGE)
+# the backend used by the menu and the batch subcommands unless --storage is given,
+# so that both see the same households and chore journal
+DEFAULT_STORAGE = TEXT_STORAGE
+
+TEXT_EXTENSION = ".txt"
+SQLITE_EXTENSION = ".db"
+TEXT_JOURNAL_NAME = "ChoreLog"
+
+
+class Storage(ABC) :
+
+    ## Return the names of the households, in the order they were added.
+    #  The households are not read, so the text backend returns the names on
+    #  lines which may not be valid, and get returns None for those.
+    #
+    @abstractmethod
+    def names(self) :
+        pass
+
+    ## Return a generator of every household, in the order they were added.
+    #
+    # @param stats an optional LoadStats object which the households are counted in
+    # @param report an optional LoadReport object which the households which
+    #        could not be loaded are added to
+    #
+    @abstractmethod
+    def households(self, stats = None, report = None) :
+        pass
+
+    ## Return the household with a given name, or None if it does not exist.
+    #  Its chore log is empty until restore is called.
+    #
+    @abstractmethod
+    def get(self, household_name) :
+        pass
+
+    ## Adds a household, with its own limits if it has any.
+    # @exception ValueError raised if the household already exists
+    #
+    @abstractmethod
+    def add(self, household) :
+        pass
+
+    ## Adds households which were encoded by encode_household from validated
+    #  households, for example by read_ranges in parallel_load_module.
+    #
+    # @param records a bytes-like object containing records one after another
+    # @return a list of the names of households which already existed and
+    #         were not added
+    #
+    def add_records(self, records) :
+        skipped = []
+        for household in decode_households(records) :
+            try :
+                self.add(household)
+            except ValueError :
+                skipped.append(household.household_name)
+        return skipped
+
+    ## Adds the stored completions to a household's chore log.
+    #
+    @abstractmethod
+    def restore(self, household) :
+        pass
+
+    ## Records completions which have been added to a household's chore log.
+    #
+    # @param rows a list of (name, chore, number_completed) tuples
+    #
+    @abstractmethod
+    def record(self, household_name, rows) :
+        pass
+
+    ## Removes records which are no longer needed. Only the text backend has
+    #  any to remove.
+    #
+    # @return the number of records removed
+    #
+    def compact(self) :
+        return 0
+
+    ## Return a household's leaderboard.
+    #
+    # @param k the number of leaders to return, or None for everyone
+    # @return a list of (name, points) tuples with the most points first, or
+    #         None if the household does not exist
+    #
+    def leaderboard(self, household_name, k = None) :
+        household = self.get(household_name)
+        if household is None :
+            return None
+        self.restore(household)
+        return household.leaderboard.top(k)
+
+    def close(self) :
+        pass
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) :
+        self.close()
+
+
+class TextStorage(Storage) :
+
+    ## Constructor for the TextStorage class.
+    #
+    # @param text_file_name the name of the households text file, which is
+    #        created if it does not exist
+    # @param journal_name the path of the chore journal without an extension
+    # @param flush_policy when new households are written to the file, see
+    #        HouseholdWriter
+    # @param flush_every the number of households written together
+    #
+    def __init__(self, text_file_name, journal_name, flush_policy = FLUSH_ON_CREATE,
+                 flush_every = DEFAULT_FLUSH_EVERY) :
+        self.text_file_name = text_file_name
+        self._writer = HouseholdWriter(text_file_name, flush_policy, flush_every)
+        self._journal = ChoreJournal(journal_name)
+        # the line of each household by name, once the file has been read or
+        # the index loaded
+        self._index = None
+
+    ## Return the line index, loading it from its file the first time.
+    #
+    def _line_index(self) :
+        if self._index is None :
+            self._writer.flush()
+            self._index = HouseholdLineIndex(self.text_file_name)
+            self._index.load()
+        return self._index
+
+    ## Return the names at the start of the lines of the file, from the
+    #  line index, without reading the households.
+    #
+    def names(self) :
+        return self._line_index().names()
+
+    ## Return a generator of the households on valid lines. If the file has
+    #  not been indexed, it is indexed as it is read, so adding a household
+    #  after a full load does not read the file again.
+    #
+    def households(self, stats = None, report = None) :
+        self._writer.flush()
+        index = HouseholdLineIndex(self.text_file_name) if self._index is None else None
+        with open(self.text_file_name, "rb") as household_binary_file :
+            if index is None :
+                lines = (str(binary_line, "utf-8", "replace") for binary_line in household_binary_file)
+            else :
+                lines = index.read_lines(household_binary_file)
+            yield from read_households(lines, stats, report)
+        if index is not None and self._index is None :
+            self._index = index
+
+    ## Return the household with a given name. Only the household's lines
+    #  are read, and the first valid one is used, as it is when the file is
+    #  loaded.
+    #
+    def get(self, household_name) :
+        positions = self._line_index().positions(household_name)
+        if not positions :
+            return None
+        self._writer.flush()
+        with open(self.text_file_name, "rb") as household_binary_file :
+            for offset, line_number in positions :
+                household_binary_file.seek(offset)
+                line = str(household_binary_file.readline(), "utf-8", "replace")
+                try :
+                    return household_from_record(parse_household_line(line, line_number))
+                except RecordError :
+                    continue
+        return None
+
+    ## Adds a household. Only the lines the name is already on are read.
+    # @exception ValueError raised if the household already exists
+    #
+    def add(self, household) :
+        household_name = household.household_name
+        index = self._line_index()
+        if household_name in index.names() and self.get(household_name) is not None :
+            raise ValueError("Household {} already exists in the store.".format(household_name))
+        offset = self._writer.write(household)
+        index.add(household_name, offset, index.lines + 1)
+
+    def restore(self, household) :
+        self._journal.restore(household)
+
+    def record(self, household_name, rows) :
+        self._journal.record(household_name, rows)
+
+    ## Rewrites the text file without invalid or repeated lines.
+    #
+    def compact(self) :
+        self._writer.close()
+        kept, removed = compact_household_file(self.text_file_name)
+        self._writer = HouseholdWriter(self.text_file_name, self._writer.flush_policy,
+                                       self._writer.flush_every)
+        self._index = None
+        return removed
+
+    ## Writes the waiting households and saves the line index.
+    #
+    def close(self) :
+        self._writer.close()
+        if self._index is not None :
+            self._index.save(self._writer.size)
+        self._journal.close()
+
+
+class BinaryStorage(Storage) :
+
+    ## Constructor for the BinaryStorage class.
+    #
+    # @param store_name the path of the HouseholdStore without an extension
+    # @param journal_name the path of the chore journal without an extension
+    #
+    def __init__(self, store_name, journal_name) :
+        self._store = HouseholdStore(store_name)
+        self._journal = ChoreJournal(journal_name)
+
+    def names(self) :
+        return self._store.names()
+
+    def households(self, stats = None, report = None) :
+        for household_name in list(self._store.names()) :
+            if stats is not None :
+                stats.lines += 1
+                stats.households += 1
+            if report is not None :
+                report.loaded += 1
+            yield self._store.get(household_name)
+
+    def get(self, household_name) :
+        return self._store.get(household_name)
+
+    def add(self, household) :
+        self._store.append(household)
+
+    ## Adds encoded households without decoding them.
+    #
+    def add_records(self, records) :
+        return self._store.append_records(records)
+
+    def restore(self, household) :
+        self._journal.restore(household)
+
+    def record(self, household_name, rows) :
+        self._journal.record(household_name, rows)
+
+    def close(self) :
+        self._store.close()
+        self._journal.close()
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS households (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    limits TEXT
+);
+CREATE TABLE IF NOT EXISTS participants (
+    id INTEGER PRIMARY KEY,
+    household_id INTEGER NOT NULL REFERENCES households(id),
+    name TEXT NOT NULL,
+    UNIQUE (household_id, name)
+);
+CREATE TABLE IF NOT EXISTS chores (
+    id INTEGER PRIMARY KEY,
+    household_id INTEGER NOT NULL REFERENCES households(id),
+    name TEXT NOT NULL,
+    frequency INTEGER NOT NULL,
+    UNIQUE (household_id, name)
+);
+CREATE TABLE IF NOT EXISTS completions (
+    id INTEGER PRIMARY KEY,
+    participant_id INTEGER NOT NULL REFERENCES participants(id),
+    chore_id INTEGER NOT NULL REFERENCES chores(id),
+    number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_by_participant
+    ON completions (participant_id, chore_id, number);
+"""
+
+# The completions of each participant are read from the completions index,
+# which also holds the chore and the number, so the table is not visited.
+_LEADERBOARD_QUERY = """
+SELECT participants.name, COALESCE(SUM(completions.number * chores.frequency), 0) AS points
+FROM participants
+LEFT JOIN completions ON completions.participant_id = participants.id
+LEFT JOIN chores ON chores.id = completions.chore_id
+WHERE participants.household_id = ?
+GROUP BY participants.id
+ORDER BY points DESC, participants.name
+LIMIT ?
+"""
+
+_TOTALS_QUERY = """
+SELECT participants.name, chores.name, SUM(completions.number)
+FROM participants
+JOIN completions ON completions.participant_id = participants.id
+JOIN chores ON chores.id = completions.chore_id
+WHERE participants.household_id = ?
+GROUP BY completions.participant_id, completions.chore_id
+"""
+
+
+class SQLiteStorage(Storage) :
+
+    ## Constructor for the SQLiteStorage class. The database is created if it
+    #  does not exist and uses write-ahead logging.
+    #
+    # @param database_file_name the name of the database file
+    #
+    def __init__(self, database_file_name) :
+        self.database_file_name = database_file_name
+        # the service writes from its writer thread, one write at a time
+        self._connection = sqlite3.connect(database_file_name, check_same_thread = False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(_SQLITE_SCHEMA)
+        # databases created before households had their own limits have no limits column
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(households)")]
+        if "limits" not in columns :
+            self._connection.execute("ALTER TABLE households ADD COLUMN limits TEXT")
+        # the participant and chore ids of recently used households
+        self._ids = {}
+
+    def _household_id(self, household_name) :
+        row = self._connection.execute("SELECT id FROM households WHERE name = ?",
+                                       (household_name,)).fetchone()
+        return None if row is None else row[0]
+
+    ## Return a household's own limits as stored in the limits column, which
+    #  holds Limits.values() separated by commas.
+    #
+    @staticmethod
+    def _stored_limits(limits_text) :
+        if limits_text is None :
+            return None
+        return Limits(*map(int, limits_text.split(",")))
+
+    def __contains__(self, household_name) :
+        return self._household_id(household_name) is not None
+
+    def __len__(self) :
+        return self._connection.execute("SELECT COUNT(*) FROM households").fetchone()[0]
+
+    def names(self) :
+        return [name for (name,) in self._connection.execute("SELECT name FROM households ORDER BY id")]
+
+    def _household(self, household_id, household_name, limits_text) :
+        participants = {sys.intern(name) for (name,) in self._connection.execute(
+            "SELECT name FROM participants WHERE household_id = ?", (household_id,))}
+        chores = {Chore.shared(name, frequency) for name, frequency in self._connection.execute(
+            "SELECT name, frequency FROM chores WHERE household_id = ?", (household_id,))}
+        return Household.from_validated(household_name, participants, chores,
+                                        limits_for(household_name, self._stored_limits(limits_text)))
+
+    def households(self, stats = None, report = None) :
+        for household_id, household_name, limits_text in self._connection.execute(
+                "SELECT id, name, limits FROM households ORDER BY id").fetchall() :
+            if stats is not None :
+                stats.lines += 1
+                stats.households += 1
+            if report is not None :
+                report.loaded += 1
+            yield self._household(household_id, household_name, limits_text)
+
+    def get(self, household_name) :
+        row = self._connection.execute("SELECT id, limits FROM households WHERE name = ?",
+                                       (household_name,)).fetchone()
+        if row is None :
+            return None
+        return self._household(row[0], household_name, row[1])
+
+    def add(self, household) :
+        household_name = household.household_name
+        try :
+            with self._connection :
+                limits = household.limits
+                cursor = self._connection.execute(
+                    "INSERT INTO households (name, limits) VALUES (?, ?)",
+                    (household_name, None if limits is None else ",".join(map(str, limits.values()))))
+                household_id = cursor.lastrowid
+                self._connection.executemany(
+                    "INSERT INTO participants (household_id, name) VALUES (?, ?)",
+                    [(household_id, name) for name in household.participants.participants])
+                self._connection.executemany(
+                    "INSERT INTO chores (household_id, name, frequency) VALUES (?, ?, ?)",
+                    [(household_id, chore.chore_name, int(chore.frequency))
+                     for chore in household.chores.chores])
+        except sqlite3.IntegrityError :
+            raise ValueError("Household {} already exists in the store.".format(household_name))
+
+    def restore(self, household) :
+        household_id = self._household_id(household.household_name)
+        if household_id is not None :
+            household.restore_log(self._connection.execute(_TOTALS_QUERY, (household_id,)))
+
+    ## Return dictionaries of the participant and chore ids of a household.
+    #  @exception ValueError raised if the household does not exist
+    #
+    def _ids_for(self, household_name) :
+        ids = self._ids.get(household_name)
+        if ids is None :
+            household_id = self._household_id(household_name)
+            if household_id is None :
+                raise ValueError("Household {} does not exist.".format(household_name))
+            participant_ids = dict((name, row_id) for row_id, name in self._connection.execute(
+                "SELECT id, name FROM participants WHERE household_id = ?", (household_id,)))
+            chore_ids = dict((name, row_id) for row_id, name in self._connection.execute(
+                "SELECT id, name FROM chores WHERE household_id = ?", (household_id,)))
+            ids = (participant_ids, chore_ids)
+            self._ids[household_name] = ids
+        return ids
+
+    def record(self, household_name, rows) :
+        participant_ids, chore_ids = self._ids_for(household_name)
+        with self._connection :
+            self._connection.executemany(
+                "INSERT INTO completions (participant_id, chore_id, number) VALUES (?, ?, ?)",
+                [(participant_ids[name], chore_ids[chore], int(number_completed))
+                 for name, chore, number_completed in rows])
+
+    def leaderboard(self, household_name, k = None) :
+        household_id = self._household_id(household_name)
+        if household_id is None :
+            return None
+        return self._connection.execute(_LEADERBOARD_QUERY,
+                                        (household_id, -1 if k is None else k)).fetchall()
+
+    def close(self) :
+        self._connection.close()
+
+
+## Opens a storage backend.
+#
+# @param kind TEXT_STORAGE, BINARY_STORAGE or SQLITE_STORAGE
+# @param store_name the path of the households file without an extension
+# @param journal_name the path of the chore journal without an extension,
+#        used by the text and binary backends. If it is None the text backend
+#        uses ChoreLog and the binary backend uses the store name, so the two
+#        backends do not share a journal.
+# @param flush_policy when new households are written, used by the text backend
+# @param flush_every the number of households written together with FLUSH_EVERY
+# @return a Storage object
+#
+def open_storage(kind, store_name, journal_name = None, flush_policy = FLUSH_ON_CREATE,
+                 flush_every = DEFAULT_FLUSH_EVERY) :
+    if kind == TEXT_STORAGE :
+        return TextStorage(store_name + TEXT_EXTENSION, journal_name or TEXT_JOURNAL_NAME,
+                           flush_policy, flush_every)
+    elif kind == BINARY_STORAGE :
+        return BinaryStorage(store_name, journal_name or store_name)
+    elif kind == SQLITE_STORAGE :
+        return SQLiteStorage(store_name + SQLITE_EXTENSION)
+    raise ValueError("The storage must be one of {}.".format(", ".join(STORAGE_KINDS)))
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    import os
+    import random
+    import tempfile
+    import time
+
+    def new_household(household_name) :
+        return Household(household_name, {"personA","personB","personC"},
+                         {Chore("wash up", 4), Chore("dusting", 1)})
+
+    with tempfile.TemporaryDirectory() as directory :
+        store_name = os.path.join(directory, "Households")
+        journal_name = os.path.join(directory, "ChoreLog")
+
+        for kind in STORAGE_KINDS :
+            print("Test: Add a household, log chores and read them back ({})".format(kind))
+            try:
+                with open_storage(kind, store_name, journal_name) as storage :
+                    storage.add(new_household("House1"))
+                    storage.record("House1", [("personA", "wash up", 3), ("personB", "dusting", 2)])
+                with open_storage(kind, store_name, journal_name) as storage :
+                    household = storage.get("House1")
+                    storage.restore(household)
+                    print("\n\tVALID: ", [str(h) for h in storage.households()],
+                          household.leaderboard.top(), storage.leaderboard("House1", 2))
+                    storage.add(new_household("House1"))
+            except Exception as err:
+                print("\tERROR: ", err)
+            for extension in (".wal", ".snap") :
+                if os.path.exists(journal_name + extension) :
+                    os.remove(journal_name + extension)
+            print()
+
+        large_limits = Limits.current().replace(maximum_household_size = 1000, maximum_number_of_chores = 100)
+        for kind in STORAGE_KINDS :
+            print("Test: Store a household with its own limits and load it with the deployment's ({})"
+                  .format(kind))
+            try:
+                large_store_name = os.path.join(directory, "Large" + kind)
+                with open_storage(kind, large_store_name, journal_name) as storage :
+                    storage.add(Household("Tower1", {"person{:04d}".format(number) for number in range(1000)},
+                                          {Chore("chore {:03d}".format(number), 1) for number in range(100)},
+                                          large_limits))
+                with open_storage(kind, large_store_name, journal_name) as storage :
+                    household = storage.get("Tower1")
+                    print("\n\tVALID: ", len(household.participants.participants), household.limits == large_limits,
+                          [h.limits == large_limits for h in storage.households()])
+            except Exception as err:
+                print("\tERROR: ", err)
+            print()
+
+        print("Test: Add a household after loading 20000 from a text file without a line index")
+        try:
+            text_store_name = os.path.join(directory, "Loaded")
+            with open_storage(TEXT_STORAGE, text_store_name, journal_name) as storage :
+                for number in range(20000) :
+                    storage.add(new_household("House{}".format(number)))
+            os.remove(text_store_name + TEXT_EXTENSION + LINE_INDEX_EXTENSION)
+            with open_storage(TEXT_STORAGE, text_store_name, journal_name) as storage :
+                start = time.perf_counter()
+                loaded = sum(1 for household in storage.households())
+                load_time = time.perf_counter() - start
+                start = time.perf_counter()
+                storage.add(new_household("House20000"))
+                print("\n\tVALID:  loaded {} in {:.3f}s, added one in {:.4f}s using the index built by the load"
+                      .format(loaded, load_time, time.perf_counter() - start))
+        except Exception as err:
+            print("\tERROR: ", err)
+        print()
+
+        print("Test: Query the leaderboard of 1000000 completions in SQLite")
+        try:
+            with SQLiteStorage(os.path.join(directory, "Large.db")) as storage :
+                storage.add(new_household("House1"))
+                generator = random.Random(1)
+                rows = [(generator.choice(["personA", "personB", "personC"]),
+                         generator.choice(["wash up", "dusting"]), generator.randint(1, 5))
+                        for row in range(1000000)]
+                start = time.perf_counter()
+                storage.record("House1", rows)
+                inserted = time.perf_counter() - start
+                start = time.perf_counter()
+                leaderboard = storage.leaderboard("House1")
+                queried = time.perf_counter() - start
+                print("\n\tVALID:  inserted in {:.2f}s, queried in {:.3f}s".format(inserted, queried),
+                      leaderboard)
+        except Exception as err:
+            print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+##
+#  Cached validators for household, participant and chore names.
+#
+#  Each validator returns None for a valid name or the error message for an
+#  invalid one, so that the result can be cached. The names are checked with
+#  compiled regular expressions and the results for the most recently seen
+#  names are kept in a bounded LRU cache, so names which are read again and
+#  again (for example from the households file) are only checked once.
+
+import re
+from functools import lru_cache
+
+VALIDATION_CACHE_SIZE = 8192
+
+# One or more letters or digits. This matches the strings for which
+# str.isalnum() is True.
+_ALPHANUMERIC = re.compile(r"[^\W_]+")
+
+# Words of letters and digits separated by whitespace.
+_ALPHANUMERIC_WORDS = re.compile(r"\s*(?:[^\W_]+(?:\s+[^\W_]+)*)?\s*")
+
+
+## Checks a household name.
+#
+# @param name the name to check
+# @param minimum_length the minimum length of the name
+# @param maximum_length the maximum length of the name
+# @return None if the name is valid or a string containing the error message
+#
+@lru_cache(maxsize = VALIDATION_CACHE_SIZE)
+def household_name_error(name, minimum_length, maximum_length) :
+    if len(name) < minimum_length or len(name) > maximum_length :
+        return ("The length of the name must be at least {} characters and a maximum of {} characters long"
+                .format(minimum_length, maximum_length))
+    if _ALPHANUMERIC.fullmatch(name) is None :
+        return "Your household name should be alphanumeric"
+    return None
+
+
+## Checks a participant's name.
+#
+# @param name the name to check
+# @param minimum_length the minimum length of the name
+# @param maximum_length the maximum length of the name
+# @return None if the name is valid or a string containing the error message
+#
+@lru_cache(maxsize = VALIDATION_CACHE_SIZE)
+def participant_name_error(name, minimum_length, maximum_length) :
+    if len(name) < minimum_length or len(name) > maximum_length :
+        return ("\n\t\t{} is not valid. The Participant's name must" +
+                " be more than {} and less than {}.").format(name, minimum_length - 1, maximum_length + 1)
+    if _ALPHANUMERIC.fullmatch(name) is None :
+        return ("\n\t\t{} is not valid. Names must be alphanumeric").format(name)
+    return None
+
+
+## Checks a chore name.
+#
+# @param name the name to check
+# @param minimum_length the minimum length of the name
+# @param maximum_length the maximum length of the name
+# @return None if the name is valid or a string containing the error message
+#
+@lru_cache(maxsize = VALIDATION_CACHE_SIZE)
+def chore_name_error(name, minimum_length, maximum_length) :
+    if len(name) < minimum_length or len(name) > maximum_length :
+        return ("Chore name: {}, is not valid. It should be: " +
+                "more than {} characters long " +
+                "and less than {} characters long.").format(name, minimum_length, maximum_length)
+    if _ALPHANUMERIC_WORDS.fullmatch(name) is None :
+        # Only work out which word is wrong when there is an error.
+        for word in name.split() :
+            if _ALPHANUMERIC.fullmatch(word) is None :
+                return ("{}, is not valid. All words in the chore name should be " +
+                        "alphanumeric.").format(word)
+    return None
+
+
+## Checks many names at once. Each distinct name is only checked once.
+#
+# @param error_function one of the validators in this module
+# @param names an iterable of names
+# @param minimum_length the minimum length of a name
+# @param maximum_length the maximum length of a name
+# @return a dictionary where the keys are the invalid names and the values
+#         are the error messages. The dictionary is empty if every name is valid.
+#
+def validate_many(error_function, names, minimum_length, maximum_length) :
+    errors = {}
+    for name in dict.fromkeys(names) :
+        message = error_function(name, minimum_length, maximum_length)
+        if message is not None :
+            errors[name] = message
+    return errors
+
+
+## main method
+#
+# Contains some simple tests
+#
+def main():
+    print("Test 1: Check valid names")
+    try:
+        print("\n\tVALID: ", household_name_error("House1", 3, 10),
+              participant_name_error("personA", 3, 10), chore_name_error("wash up", 3, 20))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 2: Check invalid names")
+    try:
+        print("\n\tVALID: ", household_name_error("Hou_se", 3, 10))
+        print("\tVALID: ", participant_name_error("a", 3, 10))
+        print("\tVALID: ", chore_name_error("wash up!", 3, 20))
+    except Exception as err:
+        print("\tERROR: ", err)
+
+    print("\nTest 3: Check many names")
+    try:
+        names = ["personA", "personB", "**", "personA"] * 1000
+        print("\n\tVALID: ", validate_many(participant_name_error, names, 3, 10))
+        print("\tVALID: ", participant_name_error.cache_info())
+    except Exception as err:
+        print("\tERROR: ", err)
+
+
+if __name__ == "__main__":
+    main()